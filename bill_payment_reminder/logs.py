@@ -0,0 +1,116 @@
+"""
+Logging pipeline (see LOGGING in settings).
+
+Records are handed to a queue by ``QueuedStreamHandler`` on the thread that
+logs them and written out by a ``QueueListener`` thread, so a slow stdout or
+log shipper never holds up a request. When the queue is full, records are
+dropped and counted rather than blocking.
+
+``JsonFormatter`` writes one JSON object per line, including the ``extra``
+attributes passed to the logging call. ``SampledFilter`` rate-limits
+high-frequency debug events: each message template, or each ``sample_key``
+passed in ``extra`` (one per view for request metrics), may be logged
+``rate`` times per ``per`` seconds, and the next record that gets through
+carries the number suppressed in between.
+"""
+import json
+import logging
+import queue
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+
+# Attributes every LogRecord has; anything else came in through ``extra``
+_RECORD_FIELDS = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        entry.update((key, value) for key, value in vars(record).items() if key not in _RECORD_FIELDS)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        if record.stack_info:
+            entry['stack'] = self.formatStack(record.stack_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class SampledFilter(logging.Filter):
+    """
+    Let each message template (or ``sample_key``) at or below ``level``
+    through at most ``rate`` times per ``per`` seconds
+    """
+
+    def __init__(self, rate=10, per=60.0, level='DEBUG'):
+        super().__init__()
+        self.rate = rate
+        self.per = per
+        self.level = logging.getLevelName(level) if isinstance(level, str) else level
+        self.windows = {}
+        self.lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno > self.level:
+            return True
+        key = (record.name, getattr(record, 'sample_key', record.msg))
+        now = time.monotonic()
+        with self.lock:
+            started, count, suppressed = self.windows.get(key, (now, 0, 0))
+            if now - started >= self.per:
+                started, count = now, 0
+            if count >= self.rate:
+                self.windows[key] = (started, count, suppressed + 1)
+                return False
+            self.windows[key] = (started, count + 1, 0)
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+class QueuedStreamHandler(QueueHandler):
+    """Queue records and write them to ``stream`` from a background thread"""
+
+    def __init__(self, stream=None, maxsize=10000):
+        super().__init__(queue.Queue(maxsize))
+        self.dropped = 0
+        target = logging.StreamHandler(stream or sys.stderr)
+        # Formatting happens on the listener thread, with this handler's formatter
+        target.format = self.format
+        self.listener = QueueListener(self.queue, target)
+        self.listener.start()
+
+    def prepare(self, record):
+        # Freeze everything that may change or hold frames once the caller moves on;
+        # the JSON is built later, on the listener thread
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        dropped, self.dropped = self.dropped, 0
+        if dropped:
+            record.dropped_before = dropped
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped = dropped + 1
+
+    def close(self):
+        # Called by logging.shutdown at exit: write out what is still queued
+        if self.listener._thread is not None:
+            self.listener.stop()
+        super().close()
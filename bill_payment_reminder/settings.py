@@ -46,11 +46,7 @@ STORAGES = {
 # Also set for backwards compatibility
 DEFAULT_FILE_STORAGE = 'cloudinary_storage.storage.MediaCloudinaryStorage'
 
-# Debug logging
-if os.environ.get('CLOUDINARY_CLOUD_NAME'):
-    print(f"[CLOUDINARY] ✓ Using Cloudinary storage: {os.environ.get('CLOUDINARY_CLOUD_NAME')}")
-else:
-    print("[CLOUDINARY] ✗ WARNING: CLOUDINARY_CLOUD_NAME not set!")
+# Whether Cloudinary is configured is logged at startup (bills.apps)
 
 # ------------------------------
 # INSTALLED APPS
@@ -74,6 +70,7 @@ INSTALLED_APPS = [
 # MIDDLEWARE
 # ------------------------------
 MIDDLEWARE = [
+    'bills.instrumentation.QueryInstrumentationMiddleware',  # Per-view query count and latency
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # WhiteNoise for static files
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -82,8 +79,17 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'bills.profiling.ProfilingMiddleware',  # cProfile requests carrying a staff-signed token
 ]
 
+# A query shape repeated more than this many times in one request is logged as a likely N+1
+QUERY_N_PLUS_ONE_THRESHOLD = int(os.environ.get('QUERY_N_PLUS_ONE_THRESHOLD', '10'))
+# Requests slower than this are logged at INFO; the rest at DEBUG, sampled (bills.instrumentation)
+SLOW_REQUEST_MS = float(os.environ.get('SLOW_REQUEST_MS', '500'))
+
+# Seconds a profiling token issued from the admin panel stays valid
+PROFILING_TOKEN_MAX_AGE = int(os.environ.get('PROFILING_TOKEN_MAX_AGE', '900'))
+
 ROOT_URLCONF = 'bill_payment_reminder.urls'
 
 # ------------------------------
@@ -96,8 +102,15 @@ TEMPLATES = [
             BASE_DIR / 'templates',
             BASE_DIR / 'security_management' / 'templates',
         ],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Compiled templates are kept in memory; reminder emails and
+            # exports render the same few templates thousands of times.
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -109,6 +122,15 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'bill_payment_reminder.wsgi.application'
+ASGI_APPLICATION = 'bill_payment_reminder.asgi.application'
+
+# ------------------------------
+# NOTIFICATION PUSH (SSE)
+# ------------------------------
+# In-process fan-out is enough for a single ASGI worker. With several workers,
+# or to pick up notifications created by cron jobs, use the database broker.
+NOTIFICATION_BROKER = os.environ.get('NOTIFICATION_BROKER', 'bills.events.InProcessBroker')
+NOTIFICATION_BROKER_INTERVAL = int(os.environ.get('NOTIFICATION_BROKER_INTERVAL', '5'))
 
 # ------------------------------
 # DATABASE
@@ -127,6 +149,82 @@ else:
         }
     }
 
+# ------------------------------
+# CACHE
+# ------------------------------
+# Local memory by default (per process). With several worker processes use a
+# shared backend: CACHE_BACKEND=file (CACHE_DIR) or set REDIS_URL (needs the
+# redis package), so per-user data versions and counters are seen by all.
+REDIS_URL = os.environ.get('REDIS_URL')
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'redis' if REDIS_URL else 'locmem')
+if CACHE_BACKEND == 'redis':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+elif CACHE_BACKEND == 'file':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('CACHE_DIR', os.path.join(BASE_DIR, 'cache', 'django')),
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'bill-payment-reminder',
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    }
+
+# ------------------------------
+# LOGGING
+# ------------------------------
+# JSON lines on stdout, written by a background thread (bill_payment_reminder.logs).
+# One policy for every logger:
+# - INFO and above are never sampled; LOG_LEVEL (default INFO) is the floor.
+# - DEBUG records are sampled: each message, or each sample_key, at most
+#   LOG_SAMPLE_RATE times a minute, with a count of what was suppressed.
+# - Request metrics (bills.instrumentation): requests slower than SLOW_REQUEST_MS
+#   at INFO, every other request at DEBUG, sampled per URL name, and only
+#   written when REQUEST_LOG_LEVEL=DEBUG. N+1 warnings are always written.
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'json': {'()': 'bill_payment_reminder.logs.JsonFormatter'},
+    },
+    'filters': {
+        'sampled': {
+            '()': 'bill_payment_reminder.logs.SampledFilter',
+            'rate': int(os.environ.get('LOG_SAMPLE_RATE', '10')),
+            'per': 60,
+        },
+    },
+    'handlers': {
+        'queue': {
+            '()': 'bill_payment_reminder.logs.QueuedStreamHandler',
+            'stream': 'ext://sys.stdout',
+            'formatter': 'json',
+            'filters': ['sampled'],
+        },
+    },
+    'root': {'handlers': ['queue'], 'level': LOG_LEVEL},
+    'loggers': {
+        # Replaces Django's own console/mail handlers; records propagate to root
+        'django': {'level': os.environ.get('DJANGO_LOG_LEVEL', 'INFO')},
+        'django.db.backends': {'level': 'WARNING'},
+        'bills': {'level': os.environ.get('BILLS_LOG_LEVEL', LOG_LEVEL)},
+        'bills.instrumentation': {'level': os.environ.get('REQUEST_LOG_LEVEL', LOG_LEVEL)},
+        'security_management': {'level': LOG_LEVEL},
+    },
+}
+
 # ------------------------------
 # AUTH & VALIDATION
 # ------------------------------
@@ -181,6 +279,14 @@ STATICFILES_STORAGE = 'django.contrib.staticfiles.storage.StaticFilesStorage'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Generated PDF reports, reused until the user's bills change (bills.reports)
+REPORT_CACHE_DIR = os.environ.get('REPORT_CACHE_DIR', os.path.join(BASE_DIR, 'cache', 'reports'))
+
+# Recurring bills (bills.recurrence): occurrences are stored this far ahead by
+# manage.py materialize_recurrences, and get their bill this long before they are due
+RECURRENCE_HORIZON_DAYS = int(os.environ.get('RECURRENCE_HORIZON_DAYS', '366'))
+RECURRENCE_BILL_LEAD_DAYS = int(os.environ.get('RECURRENCE_BILL_LEAD_DAYS', '7'))
+
 # Cloudinary storage config (Django cloudinary_storage package config)
 CLOUDINARY_STORAGE = {
     'CLOUD_NAME': os.environ.get('CLOUDINARY_CLOUD_NAME', ''),
@@ -1,6 +1,21 @@
+import logging
+
 from django.apps import AppConfig
 
 
+logger = logging.getLogger(__name__)
+
+
 class BillsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'bills'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from django.conf import settings
+        
+        cloud_name = settings.CLOUDINARY_STORAGE.get('CLOUD_NAME')
+        if cloud_name:
+            logger.info('Using Cloudinary storage: %s', cloud_name)
+        else:
+            logger.warning('CLOUDINARY_CLOUD_NAME not set; Cloudinary storage is not configured')
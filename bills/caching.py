@@ -0,0 +1,131 @@
+"""
+Per-user response cache.
+
+Each user has a data version in the cache. Every write to their bills,
+budgets, payment methods or notifications replaces it (``bump_data_version``,
+called from ``bills.signals`` and from the code paths that write with
+``update()``/``bulk_create``). Cache keys embed the version, so a write makes
+all of the user's cached entries unreachable at once, and they then expire
+without having to be found and deleted. Search results (``bills.search``) and
+the forecast (``bills.forecast``) key their caches on the same version.
+
+``cache_user_json`` caches a JSON view's response per user, version and query
+string; ``cached_for_user`` does the same for any picklable value. Entries
+also expire after ``timeout`` seconds, which bounds how stale values that
+depend on the clock (due soon, overdue) can get.
+
+Hits and misses are counted per cache name in the cache itself (shared when
+the backend is, approximate on the file backend, whose ``incr`` is not
+atomic). ``cache_stats`` reads them; cached views also answer with an
+``X-Cache: hit|miss`` header.
+"""
+import time
+from functools import wraps
+from hashlib import md5
+
+from django.core.cache import cache
+from django.http import HttpResponse
+
+
+RESPONSE_CACHE_TIMEOUT = 5 * 60
+# Names passed to cached_for_user / cache_user_json, for cache_stats
+CACHE_NAMES = set()
+
+
+def _version_key(user_id):
+    return f'bills:data-version:{user_id}'
+
+
+def get_data_version(user_id):
+    return cache.get_or_set(_version_key(user_id), time.time_ns, None)
+
+
+def bump_data_version(*user_ids):
+    """Invalidate everything cached for ``user_ids``"""
+    version = time.time_ns()
+    cache.set_many({_version_key(user_id): version for user_id in set(user_ids)}, None)
+
+
+def _stats_key(name, outcome):
+    return f'bills:cache-stats:{name}:{outcome}'
+
+
+def _count(name, outcome):
+    key = _stats_key(name, outcome)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # First count, or evicted; add() keeps a racing first count
+        if not cache.add(key, 1, None):
+            cache.incr(key)
+
+
+def cache_stats():
+    """``{name: {'hits', 'misses', 'hit_rate'}}`` for every cache name used by this process"""
+    keys = {(name, outcome): _stats_key(name, outcome) for name in CACHE_NAMES for outcome in ('hit', 'miss')}
+    counts = cache.get_many(keys.values())
+    stats = {}
+    for name in sorted(CACHE_NAMES):
+        hits = counts.get(keys[name, 'hit'], 0)
+        misses = counts.get(keys[name, 'miss'], 0)
+        stats[name] = {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / (hits + misses), 3) if hits + misses else None,
+        }
+    return stats
+
+
+def reset_cache_stats():
+    cache.delete_many([_stats_key(name, outcome) for name in CACHE_NAMES for outcome in ('hit', 'miss')])
+
+
+def _user_key(user_id, name, parts):
+    digest = md5(repr(parts).encode()).hexdigest()
+    return f'bills:cached:{name}:{user_id}:{get_data_version(user_id)}:{digest}'
+
+
+def cached_for_user(user, name, build, *parts, timeout=RESPONSE_CACHE_TIMEOUT):
+    """``build()``, cached per user, data version and ``parts``"""
+    CACHE_NAMES.add(name)
+    key = _user_key(user.pk, name, parts)
+    value = cache.get(key)
+    if value is not None:
+        _count(name, 'hit')
+        return value
+    _count(name, 'miss')
+    value = build()
+    cache.set(key, value, timeout)
+    return value
+
+
+def cache_user_json(name, timeout=RESPONSE_CACHE_TIMEOUT):
+    """
+    Cache a JSON view's successful GET responses per user, data version and
+    query string. Put it under ``login_required``.
+    """
+    CACHE_NAMES.add(name)
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method != 'GET':
+                return view(request, *args, **kwargs)
+            parts = (args, sorted(kwargs.items()), sorted(request.GET.lists()))
+            key = _user_key(request.user.pk, name, parts)
+            stored = cache.get(key)
+            if stored is not None:
+                _count(name, 'hit')
+                content, content_type = stored
+                response = HttpResponse(content, content_type=content_type)
+                response['X-Cache'] = 'hit'
+                return response
+
+            _count(name, 'miss')
+            response = view(request, *args, **kwargs)
+            if response.status_code == 200 and not response.streaming:
+                cache.set(key, (response.content, response['Content-Type']), timeout)
+            response['X-Cache'] = 'miss'
+            return response
+        return wrapper
+    return decorator
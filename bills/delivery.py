@@ -0,0 +1,134 @@
+"""
+Threaded email delivery for bulk sends such as ``send_reminders``.
+
+A ``DeliveryPool`` runs a fixed number of worker threads. Each worker opens one
+backend connection with ``get_connection()`` on its first batch and keeps it for
+the lifetime of the pool, so an SMTP session is set up once per worker instead of once per
+email. Work is handed out in batches; inside a batch every message goes through
+``send_messages`` on the already-open connection, which lets a failure be
+retried (with exponential backoff and a fresh connection) for that recipient
+alone without re-sending the rest of the batch.
+"""
+import queue
+import threading
+import time
+
+from django.core.mail import get_connection
+
+
+class DeliveryResult:
+    """Outcome of one ``DeliveryPool.deliver`` call"""
+
+    def __init__(self):
+        self.sent = []
+        self.failed = []
+        self.elapsed = 0.0
+
+    @property
+    def throughput(self):
+        """Messages sent per second"""
+        if self.elapsed <= 0:
+            return 0.0
+        return len(self.sent) / self.elapsed
+
+
+class DeliveryPool:
+    """Bounded pool of worker threads, each holding one persistent mail connection.
+
+    Use as a context manager::
+
+        with DeliveryPool(workers=4, batch_size=50) as pool:
+            result = pool.deliver(messages)
+    """
+
+    def __init__(self, workers=4, batch_size=50, retries=2, backoff=0.5, connection_factory=None):
+        self.workers = max(1, workers)
+        self.batch_size = max(1, batch_size)
+        self.retries = max(0, retries)
+        self.backoff = backoff
+        self.connection_factory = connection_factory or get_connection
+        self._tasks = queue.Queue()
+        self._lock = threading.Lock()
+        self._threads = []
+        self._result = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def start(self):
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f'mail-delivery-{index}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        for _ in self._threads:
+            self._tasks.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def deliver(self, messages):
+        """Send ``messages`` across the workers and block until every batch is done"""
+        result = DeliveryResult()
+        self._result = result
+        started = time.perf_counter()
+
+        for i in range(0, len(messages), self.batch_size):
+            self._tasks.put(messages[i:i + self.batch_size])
+        self._tasks.join()
+
+        result.elapsed = time.perf_counter() - started
+        self._result = None
+        return result
+
+    def _work(self):
+        connection = None
+        try:
+            while True:
+                batch = self._tasks.get()
+                try:
+                    if batch is None:
+                        return
+                    connection = self._send_batch(connection, batch)
+                finally:
+                    self._tasks.task_done()
+        finally:
+            if connection is not None:
+                connection.close()
+
+    def _send_batch(self, connection, batch):
+        """Send ``batch``; returns the connection to keep using (``None`` if none could be made)"""
+        result = self._result
+        for message in batch:
+            error = None
+            for attempt in range(self.retries + 1):
+                try:
+                    # Made lazily, so a backend that cannot be loaded fails
+                    # these messages instead of the worker thread.
+                    if connection is None:
+                        connection = self.connection_factory(fail_silently=False)
+                    # Opening up front keeps send_messages from closing the
+                    # connection after each call.
+                    connection.open()
+                    sent = connection.send_messages([message])
+                except Exception as e:
+                    error = e
+                    if connection is not None:
+                        connection.close()
+                    if attempt < self.retries:
+                        time.sleep(self.backoff * (2 ** attempt))
+                    continue
+                error = None if sent else 'Backend accepted no messages'
+                break
+
+            with self._lock:
+                if error is None:
+                    result.sent.append(message)
+                else:
+                    result.failed.append((message, error))
+        return connection
@@ -0,0 +1,80 @@
+"""
+Reminder email rendering.
+
+Templates live under ``bills/templates/bills/emails/``. A ``ReminderEmails``
+instance resolves them (and the sender address) once, so a run that builds
+thousands of messages only pays for rendering, not for template lookup and
+compilation. Display values are formatted in Python before rendering, which
+keeps per-render work to plain variable lookups.
+"""
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives
+from django.template.loader import get_template
+from django.utils import timezone
+
+
+def get_from_email():
+    return getattr(settings, 'DEFAULT_FROM_EMAIL', None) or 'noreply@billreminder.com'
+
+
+class ReminderEmails:
+    """Builds single-bill reminder and per-user digest emails from precompiled templates"""
+
+    def __init__(self):
+        self.from_email = get_from_email()
+        self.reminder_templates = (
+            get_template('bills/emails/reminder.txt'),
+            get_template('bills/emails/reminder.html'),
+        )
+        self.digest_templates = (
+            get_template('bills/emails/reminder_digest.txt'),
+            get_template('bills/emails/reminder_digest.html'),
+        )
+
+    def _build(self, subject, templates, context, recipient):
+        text_template, html_template = templates
+        email = EmailMultiAlternatives(
+            subject=subject,
+            body=text_template.render(context),
+            from_email=self.from_email,
+            to=[recipient],
+        )
+        email.attach_alternative(html_template.render(context), 'text/html')
+        return email
+
+    def _item(self, bill, days_until_due):
+        return {
+            'name': bill.name,
+            'amount': str(bill.amount),
+            'due_date': timezone.localtime(bill.due_date).strftime('%B %d, %Y'),
+            'days_until_due': days_until_due,
+            'category': bill.get_category_display(),
+        }
+
+    def reminder(self, bill, days_until_due):
+        """Reminder email for one bill"""
+        context = {
+            'greeting_name': bill.user.first_name or bill.user.username,
+            'item': self._item(bill, days_until_due),
+        }
+        return self._build(
+            f"Bill Reminder: {bill.name} due in {days_until_due} day(s)",
+            self.reminder_templates,
+            context,
+            bill.user.email,
+        )
+
+    def digest(self, items):
+        """One email covering several ``(bill, days_until_due)`` pairs for the same user"""
+        user = items[0][0].user
+        context = {
+            'greeting_name': user.first_name or user.username,
+            'items': [self._item(bill, days) for bill, days in items],
+            'total': str(sum(bill.amount for bill, _ in items)),
+        }
+        return self._build(
+            f"Bill Reminder: {len(items)} bills due soon",
+            self.digest_templates,
+            context,
+            user.email,
+        )
@@ -0,0 +1,122 @@
+"""
+Push channel for new notifications.
+
+New ``Notification`` rows are handed to a broker with ``publish_notifications``;
+the ``notification_stream`` view (served through the ASGI app) listens on the
+broker and forwards them to the browser as Server-Sent Events.
+
+The broker is chosen with ``settings.NOTIFICATION_BROKER``:
+
+* ``bills.events.InProcessBroker`` (default) fans out in memory to the
+  listeners of the current process. Enough for a single ASGI worker.
+* ``bills.events.DatabaseBroker`` is a stand-in for a shared broker in
+  multi-worker setups, or when notifications are created by another process
+  (``send_reminders`` under cron): each open stream looks for new rows with
+  one small indexed query every few seconds.
+
+A broker only needs ``publish(user_id, payload)`` and an async generator
+``listen(user_id, heartbeat)`` that yields payloads, or ``None`` after
+``heartbeat`` idle seconds.
+"""
+import asyncio
+import threading
+from collections import defaultdict
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+from .models import Notification
+
+
+def serialize_notification(notification):
+    """JSON-ready representation shared by the polling and streaming endpoints"""
+    return {
+        'id': notification.id,
+        'title': notification.title,
+        'message': notification.message,
+        'type': notification.notification_type,
+        'icon': notification.icon,
+        'color': notification.color,
+        'is_read': notification.is_read,
+        'created_at': notification.created_at.strftime('%b %d, %H:%M'),
+    }
+
+
+class InProcessBroker:
+    """Fans notifications out to the streams open in this process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._listeners = defaultdict(set)
+
+    def publish(self, user_id, payload):
+        # Called from request threads and the event loop alike
+        with self._lock:
+            listeners = list(self._listeners.get(user_id, ()))
+        for loop, queue in listeners:
+            loop.call_soon_threadsafe(queue.put_nowait, payload)
+
+    async def listen(self, user_id, heartbeat=15):
+        listener = (asyncio.get_running_loop(), asyncio.Queue())
+        with self._lock:
+            self._listeners[user_id].add(listener)
+        try:
+            while True:
+                try:
+                    yield await asyncio.wait_for(listener[1].get(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield None
+        finally:
+            with self._lock:
+                self._listeners[user_id].discard(listener)
+                if not self._listeners[user_id]:
+                    del self._listeners[user_id]
+
+
+class DatabaseBroker:
+    """Reads new notifications back from the database; works across processes"""
+
+    def __init__(self, interval=None):
+        self.interval = interval or getattr(settings, 'NOTIFICATION_BROKER_INTERVAL', 5)
+
+    def publish(self, user_id, payload):
+        # Rows are already committed; listeners pick them up on their next check
+        pass
+
+    async def listen(self, user_id, heartbeat=15):
+        notifications = Notification.objects.filter(user_id=user_id)
+        latest = await notifications.order_by('-id').values_list('id', flat=True).afirst() or 0
+        idle = 0
+        while True:
+            await asyncio.sleep(self.interval)
+            found = False
+            async for notification in notifications.filter(id__gt=latest).order_by('id'):
+                latest = notification.id
+                found = True
+                yield serialize_notification(notification)
+            idle = 0 if found else idle + self.interval
+            if idle >= heartbeat:
+                idle = 0
+                yield None
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    path = getattr(settings, 'NOTIFICATION_BROKER', 'bills.events.InProcessBroker')
+    return import_string(path)()
+
+
+def publish_notifications(notifications):
+    """Push freshly created notifications to any open streams of their owners, once committed"""
+    payloads = [(n.user_id, serialize_notification(n)) for n in notifications]
+    if not payloads:
+        return
+
+    def publish():
+        broker = get_broker()
+        for user_id, payload in payloads:
+            broker.publish(user_id, payload)
+
+    transaction.on_commit(publish)
@@ -0,0 +1,228 @@
+"""
+Spending forecast from a user's paid-bill history.
+
+The history is read with one ``values_list`` query (payment date, category
+and amount) into NumPy arrays; payment dates become local month indexes with
+one ``searchsorted`` against the month boundaries, and amounts are summed into
+a categories x months matrix with ``bincount``. Everything after that works on whole arrays:
+
+* the moving average is the mean of each category's last ``WINDOW`` complete
+  months;
+* the trend is the least-squares slope over the last ``TREND_MONTHS``;
+* seasonality is each calendar month's mean over the category's overall
+  monthly mean, used once ``SEASONAL_MIN_MONTHS`` of history exist;
+* projection = (average + slope * months ahead) * seasonal factor, never
+  below zero.
+
+Recurring payments come from the user's active ``RecurringSeries``: each
+series is expanded once over the horizon (its stored occurrences decide
+which dates are skipped or already paid), however many of its bills are
+pending. Since those payments are already part of the history, the projected amount of a category is the larger of its trend
+projection and its scheduled recurring bills, not their sum.
+
+The current month is incomplete and left out of the model. Results are
+cached per user until their data version changes (``bills.caching``) or
+the month turns.
+"""
+from datetime import datetime
+
+import numpy as np
+from django.core.cache import cache
+from django.utils import timezone
+
+from . import recurrence
+from .caching import get_data_version
+from .models import Bill, RecurrenceOccurrence, RecurringSeries
+
+
+WINDOW = 3
+TREND_MONTHS = 12
+SEASONAL_MIN_MONTHS = 24
+HORIZON = 3
+MAX_HORIZON = 12
+FORECAST_CACHE_TIMEOUT = 24 * 60 * 60
+
+
+def _month_index(year, month):
+    return year * 12 + month - 1
+
+
+def _month_label(index):
+    return f'{index // 12:04d}-{index % 12 + 1:02d}'
+
+
+def _local_months(moments):
+    """Month indexes of the aware datetimes ``moments`` in the site time zone"""
+    epochs = np.fromiter((moment.timestamp() for moment in moments), dtype=np.float64, count=len(moments))
+    first = timezone.localtime(min(moments))
+    last = timezone.localtime(max(moments))
+    first_month = _month_index(first.year, first.month)
+    # Instants at which each month from the first one starts locally; exact across DST changes
+    boundaries = np.array([
+        timezone.make_aware(datetime(index // 12, index % 12 + 1, 1)).timestamp()
+        for index in range(first_month, _month_index(last.year, last.month) + 1)
+    ])
+    return first_month + np.searchsorted(boundaries, epochs, side='right') - 1
+
+
+def load_history(user_id):
+    """``(month_index, category, amount)`` arrays of the user's paid bills"""
+    # Months are worked out here rather than with Extract*/Trunc*, which run
+    # as per-row Python functions on SQLite
+    rows = list(
+        Bill.objects.filter(user_id=user_id, status='paid', payment_date__isnull=False)
+        .values_list('payment_date', 'category', 'amount')
+        .order_by()
+    )
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=object), np.empty(0)
+    paid, categories, amounts = zip(*rows)
+    return (
+        _local_months(paid),
+        np.array(categories, dtype=object),
+        np.array(amounts, dtype=np.float64),
+    )
+
+
+def spending_matrix(month_index, categories, amounts, first_month, last_month):
+    """``(category names, matrix)``, matrix[c, m] = spend of category c in month first_month + m"""
+    keep = (month_index >= first_month) & (month_index <= last_month)
+    names, codes = np.unique(categories[keep].astype(str), return_inverse=True)
+    width = last_month - first_month + 1
+    flat = np.bincount(
+        codes * width + (month_index[keep] - first_month), weights=amounts[keep], minlength=len(names) * width,
+    )
+    return names, flat.reshape(len(names), width)
+
+
+def project(matrix, first_month, horizon):
+    """Moving average, slope, seasonal factors and a ``horizon``-month projection per category row"""
+    categories, months = matrix.shape
+    window = matrix[:, -WINDOW:]
+    average = window.mean(axis=1)
+
+    recent = matrix[:, -TREND_MONTHS:]
+    if recent.shape[1] > 1:
+        x = np.arange(recent.shape[1], dtype=np.float64)
+        x -= x.mean()
+        slope = (recent - recent.mean(axis=1, keepdims=True)) @ x / (x @ x)
+    else:
+        slope = np.zeros(categories)
+
+    # Mean spend per calendar month / mean spend per month
+    seasonal = np.ones((categories, 12))
+    if months >= SEASONAL_MIN_MONTHS:
+        calendar_month = (first_month + np.arange(months)) % 12
+        per_month = matrix @ np.eye(12)[calendar_month]
+        occurrences = np.bincount(calendar_month, minlength=12)
+        overall = matrix.mean(axis=1, keepdims=True)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            seasonal = np.where(overall > 0, per_month / occurrences / overall, 1.0)
+
+    steps = np.arange(1, horizon + 1)
+    # Months ahead are counted from the middle of the averaging window
+    ahead = steps + (window.shape[1] - 1) / 2
+    target_months = (first_month + months - 1 + steps) % 12
+    projection = (average[:, None] + slope[:, None] * ahead) * seasonal[:, target_months]
+    return average, slope, seasonal, np.maximum(projection, 0)
+
+
+def scheduled_recurring(user_id, first_month, horizon):
+    """``{category: array of amounts per month}`` of the user's active recurring series over the horizon"""
+    start = timezone.make_aware(datetime(first_month // 12, first_month % 12 + 1, 1))
+    end_month = first_month + horizon
+    end = timezone.make_aware(datetime(end_month // 12, end_month % 12 + 1, 1))
+    series_list = list(RecurringSeries.objects.filter(user_id=user_id, is_active=True))
+    if not series_list:
+        return {}
+    # Stored occurrences override the schedule: skipped or already paid ones
+    # are not due, and a pending bill's own amount wins over the series amount
+    stored = {
+        (series_id, index): (skipped, status, amount)
+        for series_id, index, skipped, status, amount in RecurrenceOccurrence.objects.filter(
+            series__in=series_list, due_date__gte=start, due_date__lt=end,
+        ).values_list('series_id', 'index', 'skipped', 'bill__status', 'bill__amount')
+    }
+
+    due, categories, amounts = [], [], []
+    for series in series_list:
+        # Dates are computed, so the horizon may reach past materialized_until
+        index = max(recurrence.index_on_or_after(series, start), series.anchor_index)
+        while (moment := recurrence.due_date_of(series, index)) < end:
+            skipped, status, amount = stored.get((series.pk, index), (False, None, None))
+            if not skipped and status != 'paid':
+                due.append(moment)
+                categories.append(series.category)
+                amounts.append(series.amount if amount is None else amount)
+            index += 1
+    if not due:
+        return {}
+
+    names, codes = np.unique(np.array(categories, dtype=str), return_inverse=True)
+    flat = np.bincount(
+        codes * horizon + (_local_months(due) - first_month),
+        weights=np.array(amounts, dtype=np.float64), minlength=len(names) * horizon,
+    )
+    return dict(zip(names.tolist(), flat.reshape(len(names), horizon)))
+
+
+def compute_forecast(user_id, horizon=HORIZON, now=None):
+    now = timezone.localtime(now or timezone.now())
+    current = _month_index(now.year, now.month)
+    month_index, categories, amounts = load_history(user_id)
+    first = int(month_index.min()) if len(month_index) else current - 1
+    last = current - 1
+    first = min(first, last)
+
+    names, matrix = spending_matrix(month_index, categories, amounts, first, last)
+    average, slope, seasonal, projection = project(matrix, first, horizon)
+    scheduled = scheduled_recurring(user_id, current + 1, horizon)
+
+    labels = dict(Bill.CATEGORY_CHOICES)
+    rows = {}
+    for i, name in enumerate(names.tolist()):
+        rows[name] = {
+            'moving_average': average[i],
+            'trend_per_month': slope[i],
+            'projected': projection[i],
+        }
+    for name, amounts_due in scheduled.items():
+        row = rows.setdefault(name, {
+            'moving_average': 0.0, 'trend_per_month': 0.0, 'projected': np.zeros(horizon),
+        })
+        row['recurring'] = amounts_due
+        row['projected'] = np.maximum(row['projected'], amounts_due)
+
+    months = [_month_label(current + step) for step in range(1, horizon + 1)]
+    result = {
+        'months': months,
+        'history_months': last - first + 1 if len(month_index) else 0,
+        'categories': [
+            {
+                'category': name,
+                'label': labels.get(name, name),
+                'moving_average': round(float(row['moving_average']), 2),
+                'trend_per_month': round(float(row['trend_per_month']), 2),
+                'recurring': [round(float(v), 2) for v in row.get('recurring', np.zeros(horizon))],
+                'projected': [round(float(v), 2) for v in row['projected']],
+            }
+            for name, row in sorted(rows.items())
+        ],
+    }
+    result['total'] = [
+        round(sum(category['projected'][step] for category in result['categories']), 2) for step in range(horizon)
+    ]
+    return result
+
+
+# ---- caching -------------------------------------------------------------
+
+def get_forecast(user, horizon=HORIZON):
+    """The user's forecast, from the cache unless their bills changed or the month turned"""
+    now = timezone.localtime()
+    key = f'bills:forecast:{user.pk}:{get_data_version(user.pk)}:{now:%Y-%m}:{horizon}'
+    forecast = cache.get(key)
+    if forecast is None:
+        forecast = compute_forecast(user.pk, horizon, now)
+        cache.set(key, forecast, FORECAST_CACHE_TIMEOUT)
+    return forecast
@@ -0,0 +1,195 @@
+"""
+Per-view database cost and latency.
+
+``QueryInstrumentationMiddleware`` wraps every request in a
+``QueryRecorder``, which counts queries and their time through
+``connection.execute_wrapper``. Per request it logs to the
+``bills.instrumentation`` logger the URL name, query count, database time,
+time outside the database ("render": view code, templates, serialization) and
+response size: at DEBUG, sampled per URL name (``sample_key``, see
+``bill_payment_reminder.logs.SampledFilter``), or at INFO when the request
+took longer than ``settings.SLOW_REQUEST_MS``. It also keeps the last
+``SAMPLE_SIZE`` requests of each URL name in memory for ``query_stats`` (p50/p95, per process), which staff
+can read at ``admin-panel/query-stats/``.
+
+Queries are grouped by shape: the SQL before parameters are bound, with
+``IN (%s, %s, ...)`` lists collapsed. A shape run more than
+``settings.QUERY_N_PLUS_ONE_THRESHOLD`` times in one request is reported as a
+likely N+1 query (a warning, and a count in the stats).
+
+Streaming responses are measured up to the point the response is returned;
+queries made while the body streams are not counted.
+"""
+import logging
+import re
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+
+
+logger = logging.getLogger(__name__)
+
+# Requests kept per URL name for the percentiles
+SAMPLE_SIZE = 1000
+DEFAULT_N_PLUS_ONE_THRESHOLD = 10
+DEFAULT_SLOW_REQUEST_MS = 500
+
+_PLACEHOLDER_LIST = re.compile(r'\((?:\s*%s\s*,)+\s*%s\s*\)')
+
+
+def sql_shape(sql):
+    return _PLACEHOLDER_LIST.sub('(%s, ...)', sql)
+
+
+class QueryRecorder:
+    """
+    Count queries and database time on every connection while active; with
+    ``capture``, also keep the first ``capture`` queries as
+    ``(sql, params, seconds)``.
+    """
+
+    def __init__(self, capture=0):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+        self.capture = capture
+        self.queries = []
+        self._stack = ExitStack()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.duration += elapsed
+            self.count += 1
+            self.shapes[sql_shape(sql)] += 1
+            if len(self.queries) < self.capture:
+                self.queries.append((sql, params, elapsed))
+
+    def __enter__(self):
+        for connection in connections.all():
+            self._stack.enter_context(connection.execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+
+    def repeated(self, threshold):
+        """``[(shape, count)]`` of shapes run more than ``threshold`` times"""
+        return [(shape, count) for shape, count in self.shapes.most_common() if count > threshold]
+
+
+def _percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class _Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self._clear()
+
+    def _clear(self):
+        self.samples = defaultdict(lambda: deque(maxlen=SAMPLE_SIZE))
+        self.requests = Counter()
+        self.n_plus_one = Counter()
+
+    def reset(self):
+        with self.lock:
+            self._clear()
+
+    def add(self, name, sample, flagged):
+        with self.lock:
+            self.samples[name].append(sample)
+            self.requests[name] += 1
+            if flagged:
+                self.n_plus_one[name] += 1
+
+    def summary(self):
+        with self.lock:
+            samples = {name: list(values) for name, values in self.samples.items()}
+            requests, n_plus_one = dict(self.requests), dict(self.n_plus_one)
+        result = {}
+        for name in sorted(samples):
+            row = {'requests': requests[name], 'n_plus_one': n_plus_one.get(name, 0)}
+            for index, field in enumerate(('queries', 'db_ms', 'render_ms', 'total_ms', 'bytes')):
+                values = sorted(sample[index] for sample in samples[name] if sample[index] is not None)
+                row[field] = {
+                    'p50': _percentile(values, 0.5), 'p95': _percentile(values, 0.95),
+                } if values else None
+            result[name] = row
+        return result
+
+
+_stats = _Stats()
+
+
+def query_stats():
+    """``{url_name: {'requests', 'n_plus_one', 'queries', 'db_ms', ...}}`` for this process"""
+    return _stats.summary()
+
+
+def reset_query_stats():
+    _stats.reset()
+
+
+def record(request, response, recorder, elapsed):
+    match = getattr(request, 'resolver_match', None)
+    name = (match.view_name if match else None) or '<unresolved>'
+    size = None if response.streaming else len(response.content)
+    db_ms = recorder.duration * 1000
+    total_ms = elapsed * 1000
+    threshold = getattr(settings, 'QUERY_N_PLUS_ONE_THRESHOLD', DEFAULT_N_PLUS_ONE_THRESHOLD)
+    repeated = recorder.repeated(threshold)
+
+    _stats.add(name, (recorder.count, db_ms, total_ms - db_ms, total_ms, size), bool(repeated))
+    slow = total_ms > getattr(settings, 'SLOW_REQUEST_MS', DEFAULT_SLOW_REQUEST_MS)
+    logger.log(
+        logging.INFO if slow else logging.DEBUG,
+        '%s %s -> %s: %d queries, %.1fms db, %.1fms total',
+        request.method, name, response.status_code, recorder.count, db_ms, total_ms,
+        extra={
+            'sample_key': name, 'slow': slow,
+            'url_name': name, 'method': request.method, 'status': response.status_code,
+            'queries': recorder.count, 'db_ms': round(db_ms, 2), 'render_ms': round(total_ms - db_ms, 2),
+            'total_ms': round(total_ms, 2), 'bytes': size,
+        },
+    )
+    for shape, count in repeated:
+        logger.warning(
+            'Possible N+1 in %s: query ran %d times: %s', name, count, shape[:300],
+            extra={'url_name': name, 'repeats': count, 'sql_shape': shape},
+        )
+
+
+class QueryInstrumentationMiddleware:
+    """Record per-request query count and timings (sync and async)"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        with QueryRecorder() as recorder:
+            response = self.get_response(request)
+        record(request, response, recorder, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        with QueryRecorder() as recorder:
+            response = await self.get_response(request)
+        record(request, response, recorder, time.perf_counter() - started)
+        return response
@@ -0,0 +1,139 @@
+"""
+Database-backed background jobs.
+
+``enqueue`` stores a ``Job`` row; ``manage.py run_worker`` claims queued jobs
+and runs the handler registered for their ``kind``. A job is claimed with a
+conditional ``UPDATE ... WHERE status = 'queued'``, so any number of worker
+processes and threads can share the table on SQLite or Postgres without row
+locks: exactly one ``UPDATE`` wins.
+
+A handler receives the running job, does its work and records the outcome on
+it (``result``, and ``result_data`` / ``result_filename`` for jobs that
+produce a file to download). If it raises, the job is retried with
+exponential backoff until ``max_attempts`` is reached, then marked failed.
+Jobs left running by a worker that died are requeued after ``STALE_AFTER``.
+
+Files are stored on the job row itself: the worker usually runs as its own
+process (see the Procfile), possibly on another host, so nothing it writes to
+local disk can be served by the web process. Jobs are deleted once they have
+been finished for ``RETENTION``; workers purge them at most every
+``PURGE_INTERVAL``.
+"""
+import traceback
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+
+RETRY_BACKOFF = timedelta(seconds=30)
+STALE_AFTER = timedelta(minutes=15)
+RETENTION = timedelta(days=1)
+PURGE_INTERVAL = timedelta(minutes=10)
+# Management commands that may be queued as 'command' jobs
+COMMANDS = {
+    'send_reminders', 'materialize_recurrences',
+    'rebuild_bill_summaries', 'rebuild_monthly_spend', 'rebuild_search_index',
+}
+
+HANDLERS = {}
+
+
+def handler(kind):
+    def register(func):
+        HANDLERS[kind] = func
+        return func
+    return register
+
+
+def enqueue(kind, user=None, run_after=None, **params):
+    if kind not in HANDLERS:
+        raise ValueError(f"Unknown job kind: {kind}")
+    if kind == 'command' and params.get('name') not in COMMANDS:
+        raise ValueError(f"Command {params.get('name')!r} cannot be queued")
+    return Job.objects.create(kind=kind, user=user, params=params, run_after=run_after or timezone.now())
+
+
+def claim_next(worker, now=None):
+    """Mark the next runnable job as running for ``worker`` and return it, or ``None``"""
+    now = now or timezone.now()
+    candidates = (
+        Job.objects.filter(status='queued', run_after__lte=now)
+        .order_by('run_after', 'pk')
+        .values_list('pk', flat=True)[:10]
+    )
+    for pk in candidates:
+        claimed = Job.objects.filter(pk=pk, status='queued').update(
+            status='running', worker=worker, started_at=now, attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return Job.objects.get(pk=pk)
+    return None
+
+
+def run_job(job):
+    """Run a claimed job and record how it ended"""
+    try:
+        HANDLERS[job.kind](job)
+    except Exception:
+        job.error = traceback.format_exc(limit=5)
+        if job.attempts < job.max_attempts:
+            job.status = 'queued'
+            job.run_after = timezone.now() + RETRY_BACKOFF * 2 ** (job.attempts - 1)
+        else:
+            job.status = 'failed'
+            job.finished_at = timezone.now()
+    else:
+        job.status = 'done'
+        job.error = ''
+        job.finished_at = timezone.now()
+    job.save()
+    return job
+
+
+def requeue_stale(now=None):
+    """Put back jobs whose worker stopped before finishing them"""
+    now = now or timezone.now()
+    return Job.objects.filter(status='running', started_at__lt=now - STALE_AFTER).update(
+        status='queued', worker='', run_after=now,
+    )
+
+
+def purge_finished(now=None):
+    """Delete jobs, with their stored files, finished more than ``RETENTION`` ago"""
+    now = now or timezone.now()
+    return Job.objects.filter(status__in=['done', 'failed'], finished_at__lt=now - RETENTION).delete()[0]
+
+
+# ---- handlers ------------------------------------------------------------
+
+@handler('export_csv')
+def export_csv(job):
+    from .reports import csv_chunks, filter_bills
+
+    chunks = csv_chunks(filter_bills(job.user, job.params.get('filters', {})))
+    job.result_data = ''.join(chunks).encode()
+    job.result_filename = f'bills_{timezone.now().strftime("%Y%m%d")}.csv'
+
+
+@handler('export_pdf')
+def export_pdf(job):
+    from .reports import filter_bills, get_bills_report
+
+    filters = job.params.get('filters', {})
+    # Built through the report cache, then stored on the job
+    report = get_bills_report(job.user, filter_bills(job.user, filters), filters)
+    with open(report, 'rb') as f:
+        job.result_data = f.read()
+    job.result_filename = f'bills_report_{timezone.now().strftime("%Y%m%d")}.pdf'
+
+
+@handler('command')
+def run_command(job):
+    output = StringIO()
+    call_command(job.params['name'], *job.params.get('args', []), stdout=output)
+    job.result = {'output': output.getvalue()[-4000:]}
@@ -0,0 +1,149 @@
+"""
+Peak memory of the CSV export, old in-memory response vs streaming.
+
+Seeds one user with many bills, then exports them once per mode, each in a
+fresh child process so the reported peak RSS belongs to that export alone:
+    python manage.py bench_csv_export --bills 500000
+
+``--measure legacy|streaming --username NAME`` runs a single export in the
+current process; the parent invokes it that way.
+"""
+import argparse
+import os
+import random
+import resource
+import subprocess
+import sys
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.utils import timezone
+
+from bills.models import Bill, PaymentMethod
+from bills.views import export_bills_csv
+
+
+USERNAME = 'bench-csv-export'
+
+
+def legacy_export_csv(request):
+    """The export as it was: one HttpResponse holding the whole file, payment method loaded per row"""
+    import csv
+
+    response = HttpResponse(content_type='text/csv')
+    writer = csv.writer(response)
+    writer.writerow(['Name', 'Amount', 'Due Date', 'Status', 'Category', 'Payment Date', 'Payment Method', 'Notes'])
+    for bill in Bill.objects.filter(user=request.user).order_by('-due_date'):
+        writer.writerow([
+            bill.name,
+            bill.amount,
+            bill.due_date.strftime('%Y-%m-%d %H:%M'),
+            bill.get_status_display(),
+            bill.get_category_display(),
+            bill.payment_date.strftime('%Y-%m-%d %H:%M') if bill.payment_date else '',
+            bill.payment_method.name if bill.payment_method else '',
+            bill.notes or '',
+        ])
+    return response
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+class Command(BaseCommand):
+    help = 'Compare peak RSS and time of the legacy and streaming CSV exports'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bills', type=int, default=500_000, help='Bills to seed (default: %(default)s)')
+        parser.add_argument('--keep', action='store_true', help='Keep the seeded user and bills afterwards')
+        parser.add_argument('--measure', choices=['legacy', 'streaming'], help=argparse.SUPPRESS)
+        parser.add_argument('--username', default=USERNAME, help=argparse.SUPPRESS)
+
+    def handle(self, *args, **options):
+        if options['measure']:
+            self.measure(options['measure'], options['username'])
+            return
+
+        User = get_user_model()
+        if User.objects.filter(username=USERNAME).exists():
+            raise CommandError(f"User '{USERNAME}' already exists; delete it first.")
+        user = User.objects.create(username=USERNAME, email=f'{USERNAME}@example.com')
+        try:
+            self.seed(user, options['bills'])
+            self.stdout.write(f"{'mode':<10} {'rows':>8} {'MB out':>8} {'seconds':>8} {'peak RSS MB':>12} {'export MB':>10}")
+            for mode in ('legacy', 'streaming'):
+                result = subprocess.run(
+                    [sys.executable, os.path.join(settings.BASE_DIR, 'manage.py'), 'bench_csv_export',
+                     '--measure', mode, '--username', USERNAME],
+                    capture_output=True, text=True, check=True,
+                )
+                self.stdout.write(result.stdout.strip().splitlines()[-1])
+        finally:
+            if not options['keep']:
+                # One statement; the seeded bills have no notifications, attachments or search rows
+                with connection.cursor() as cursor:
+                    cursor.execute(f"DELETE FROM {Bill._meta.db_table} WHERE user_id = %s", [user.pk])
+                user.delete()
+
+    def seed(self, user, count):
+        rng = random.Random(7)
+        now = timezone.now()
+        methods = PaymentMethod.objects.bulk_create([
+            PaymentMethod(user=user, name=name, method_type=kind)
+            for name, kind in [('Cash', 'cash'), ('GCash', 'gcash'), ('BPI', 'bank'), ('Visa', 'card')]
+        ])
+        categories = [key for key, _ in Bill.CATEGORY_CHOICES]
+        started = time.perf_counter()
+        batch_size = 10000
+        for offset in range(0, count, batch_size):
+            bills = []
+            for i in range(offset, min(offset + batch_size, count)):
+                due_date = now - timedelta(minutes=rng.randint(0, 5 * 365 * 24 * 60))
+                paid = rng.random() < 0.8
+                bills.append(Bill(
+                    user=user,
+                    name=f'Bill {i}',
+                    amount=Decimal(rng.randint(100, 500000)) / 100,
+                    due_date=due_date,
+                    status='paid' if paid else 'pending',
+                    category=rng.choice(categories),
+                    payment_date=due_date if paid else None,
+                    payment_method=rng.choice(methods) if paid else None,
+                    notes='Auto-debit' if i % 5 == 0 else '',
+                ))
+            Bill.objects.bulk_create(bills)
+        self.stdout.write(f"Seeded {count} bills in {time.perf_counter() - started:.1f}s")
+
+    def measure(self, mode, username):
+        request = RequestFactory().get('/export/csv/')
+        request.user = get_user_model().objects.get(username=username)
+        baseline = peak_rss_mb()
+
+        started = time.perf_counter()
+        rows = size = 0
+        if mode == 'legacy':
+            content = legacy_export_csv(request).content
+            rows, size = content.count(b'\n') - 1, len(content)
+            del content
+        else:
+            for chunk in export_bills_csv(request).streaming_content:
+                # Stands in for the socket: every chunk is dropped once "sent"
+                rows += chunk.count(b'\n')
+                size += len(chunk)
+            rows -= 1
+        elapsed = time.perf_counter() - started
+
+        peak = peak_rss_mb()
+        self.stdout.write(
+            f"{mode:<10} {rows:>8} {size / 1e6:>8.1f} {elapsed:>8.2f} {peak:>12.1f} {peak - baseline:>10.1f}"
+        )
@@ -0,0 +1,157 @@
+"""
+Micro-benchmark for reminder email and report rendering.
+
+Compares the previous per-bill f-string HTML against the precompiled
+templates used now, and the old ``+=`` HTML report against the PDF writer, on
+unsaved in-memory bills so no database access is involved:
+    python manage.py bench_email_render --bills 10000
+"""
+import io
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.mail import EmailMultiAlternatives
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from bills.emails import ReminderEmails
+from bills.models import Bill
+from bills.pdf import PDFWriter
+from bills.reports import BillsReportLayout
+
+
+def legacy_reminder_email(bill, days_until_due):
+    """The f-string message ``send_reminders`` used to build for every bill"""
+    message = f"""
+Hello {bill.user.first_name or bill.user.username},
+
+This is a friendly reminder that your bill is due soon:
+
+Bill: {bill.name}
+Amount: ₱{bill.amount}
+Due Date: {bill.due_date.strftime('%B %d, %Y')}
+Category: {bill.get_category_display()}
+
+Don't forget to pay on time to avoid late fees!
+
+---
+Bill Payment Reminder
+    """.strip()
+    html_message = f"""
+<!DOCTYPE html>
+<html>
+<head>
+    <style>
+        body {{ font-family: sans-serif; line-height: 1.6; color: #333; }}
+        .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
+        .header {{ background: linear-gradient(135deg, #2563eb, #3b82f6); color: white; padding: 20px; border-radius: 8px 8px 0 0; }}
+        .content {{ background: #f8fafc; padding: 20px; border-radius: 0 0 8px 8px; }}
+        .bill-details {{ background: white; padding: 15px; border-radius: 8px; margin: 15px 0; }}
+        .amount {{ font-size: 24px; font-weight: bold; color: #2563eb; }}
+        .due-date {{ color: #f59e0b; font-weight: bold; }}
+    </style>
+</head>
+<body>
+    <div class="container">
+        <div class="header">
+            <h2>📋 Bill Payment Reminder</h2>
+        </div>
+        <div class="content">
+            <p>Hello {bill.user.first_name or bill.user.username},</p>
+            <p>This is a friendly reminder that your bill is due soon:</p>
+            <div class="bill-details">
+                <h3>{bill.name}</h3>
+                <p class="amount" style="color: #2563eb; font-weight: bold; font-size: 24px;">Amount:&nbsp;₱{bill.amount}</p>
+                <p class="due-date">Due: {bill.due_date.strftime('%B %d, %Y')} ({days_until_due} day(s) left)</p>
+                <p>Category: {bill.get_category_display()}</p>
+            </div>
+            <p>Don't forget to pay on time to avoid late fees!</p>
+            <p style="color: #64748b; font-size: 12px; margin-top: 30px;">
+                — Bill Payment Reminder Team
+            </p>
+        </div>
+    </div>
+</body>
+</html>
+    """
+    email = EmailMultiAlternatives(
+        subject=f"Bill Reminder: {bill.name} due in {days_until_due} day(s)",
+        body=message,
+        from_email='noreply@billreminder.com',
+        to=[bill.user.email],
+    )
+    email.attach_alternative(html_message, 'text/html')
+    return email
+
+
+def legacy_report_html(bills):
+    """The ``+=`` report ``export_bills_pdf`` used to build"""
+    html_content = "<html><body><table><tbody>"
+    total = 0
+    for bill in bills:
+        status_class = 'paid' if bill.status == 'paid' else 'pending'
+        html_content += f"""
+            <tr>
+                <td>{bill.name}</td>
+                <td>₱{bill.amount}</td>
+                <td>{bill.due_date.strftime('%b %d, %Y')}</td>
+                <td class="{status_class}">{bill.get_status_display()}</td>
+                <td>{bill.get_category_display()}</td>
+            </tr>
+        """
+        total += bill.amount
+    html_content += f"</tbody></table><p>Total: ₱{total}</p></body></html>"
+    return html_content
+
+
+class Command(BaseCommand):
+    help = 'Benchmark reminder email and report rendering (legacy f-strings vs cached templates and the PDF writer)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bills', type=int, default=10000, help='Number of bills to render (default: %(default)s)')
+
+    def handle(self, *args, **options):
+        count = options['bills']
+        now = timezone.now()
+        user = get_user_model()(username='bench', first_name='Bench', email='bench@example.com')
+        categories = [key for key, _ in Bill.CATEGORY_CHOICES]
+        bills = [
+            Bill(
+                user=user,
+                name=f'Bill {i}',
+                amount=Decimal('1234.50') + i,
+                due_date=now + timedelta(days=i % 7),
+                category=categories[i % len(categories)],
+                status='paid' if i % 3 == 0 else 'pending',
+            )
+            for i in range(count)
+        ]
+
+        self.report('Reminder email (legacy f-string)', count, lambda: [
+            legacy_reminder_email(bill, 3) for bill in bills
+        ])
+
+        def render_templates():
+            # Template loading is part of the run, as it is in send_reminders
+            emails = ReminderEmails()
+            return [emails.reminder(bill, 3) for bill in bills]
+
+        self.report('Reminder email (cached template)', count, render_templates)
+
+        self.report('Report (legacy +=)', 1, lambda: legacy_report_html(bills))
+        def render_pdf():
+            layout = BillsReportLayout(PDFWriter(io.BytesIO()), now)
+            for bill in bills:
+                layout.add_row(bill.name, bill.amount, bill.due_date, bill.status, bill.category)
+            layout.finish(len(bills), sum(bill.amount for bill in bills))
+
+        self.report('Report (PDF writer)', 1, render_pdf)
+
+    def report(self, label, renders, func):
+        started = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - started
+        rate = renders / elapsed if elapsed > 0 else float('inf')
+        self.stdout.write(f"{label:<36} {elapsed:8.3f}s  {rate:12.1f} renders/sec")
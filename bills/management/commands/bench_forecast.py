@@ -0,0 +1,154 @@
+"""
+Time the spending forecast on synthetic 10-year paid-bill histories.
+
+Seeds users with ``--years`` of monthly bills across several categories
+(with a trend, a yearly season and noise), then times, per user:
+
+* ``loop``: the same model written as a loop over ``Bill`` instances and
+  Python dicts, as a reference;
+* ``numpy``: ``bills.forecast.compute_forecast``;
+* ``cached``: ``bills.forecast.get_forecast`` once the result is cached.
+
+    python manage.py bench_forecast --users 20 --years 10
+"""
+import math
+import random
+import statistics
+import time
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from bills import forecast
+from bills.models import Bill
+
+
+PREFIX = 'bench-forecast-'
+CATEGORIES = ['electricity', 'water', 'internet', 'rent', 'phone', 'food', 'transportation', 'subscription']
+
+
+def loop_forecast(user_id, horizon, now):
+    """Moving average, trend and seasonal projection per category, one bill at a time"""
+    now = timezone.localtime(now)
+    current = now.year * 12 + now.month - 1
+    spend = defaultdict(lambda: defaultdict(float))
+    first = current - 1
+    for bill in Bill.objects.filter(user_id=user_id, status='paid', payment_date__isnull=False):
+        paid = timezone.localtime(bill.payment_date)
+        month = paid.year * 12 + paid.month - 1
+        if month < current:
+            spend[bill.category][month] += float(bill.amount)
+            first = min(first, month)
+
+    months = list(range(first, current))
+    result = {}
+    for category, by_month in spend.items():
+        series = [by_month.get(month, 0.0) for month in months]
+        window = series[-forecast.WINDOW:]
+        average = sum(window) / len(window)
+        recent = series[-forecast.TREND_MONTHS:]
+        mean_x = (len(recent) - 1) / 2
+        mean_y = sum(recent) / len(recent)
+        denominator = sum((x - mean_x) ** 2 for x in range(len(recent))) or 1
+        slope = sum((x - mean_x) * (y - mean_y) for x, y in enumerate(recent)) / denominator
+        seasonal = [1.0] * 12
+        overall = sum(series) / len(series)
+        if len(series) >= forecast.SEASONAL_MIN_MONTHS and overall:
+            for calendar_month in range(12):
+                values = [y for month, y in zip(months, series) if month % 12 == calendar_month]
+                seasonal[calendar_month] = sum(values) / len(values) / overall
+        result[category] = [
+            max(0.0, (average + slope * (step + (len(window) - 1) / 2)) * seasonal[(current - 1 + step) % 12])
+            for step in range(1, horizon + 1)
+        ]
+    return result
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the NumPy spending forecast against a per-instance loop'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20, help='Users to seed (default: %(default)s)')
+        parser.add_argument('--years', type=int, default=10, help='Years of history per user (default: %(default)s)')
+        parser.add_argument('--per-month', type=int, default=12,
+                            help='Paid bills per user per month (default: %(default)s)')
+        parser.add_argument('--keep', action='store_true', help='Keep the seeded users and bills afterwards')
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        if User.objects.filter(username__startswith=PREFIX).exists():
+            raise CommandError(f"Users named '{PREFIX}*' already exist; delete them first.")
+        users = User.objects.bulk_create([
+            User(username=f'{PREFIX}{i}', email=f'{PREFIX}{i}@example.com') for i in range(options['users'])
+        ])
+        users = list(User.objects.filter(username__startswith=PREFIX))
+        try:
+            self.seed(users, options['years'], options['per_month'])
+            self.run(users)
+        finally:
+            if not options['keep']:
+                # One statement; the seeded bills have no notifications, attachments or search rows
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        f"DELETE FROM {Bill._meta.db_table} WHERE user_id IN ({', '.join(['%s'] * len(users))})",
+                        [user.pk for user in users],
+                    )
+                User.objects.filter(pk__in=[user.pk for user in users]).delete()
+
+    def seed(self, users, years, per_month):
+        rng = random.Random(11)
+        now = timezone.now()
+        started = time.perf_counter()
+        total = 0
+        for user in users:
+            bills = []
+            for month in range(years * 12):
+                paid_month = now - timedelta(days=30.44 * (years * 12 - month))
+                for i in range(per_month):
+                    category = CATEGORIES[i % len(CATEGORIES)]
+                    base = 500 + 300 * (i % len(CATEGORIES))
+                    season = 1 + 0.25 * math.sin(2 * math.pi * paid_month.month / 12)
+                    amount = base * (1 + 0.004 * month) * season * rng.uniform(0.85, 1.15)
+                    paid = paid_month + timedelta(days=rng.randint(0, 27))
+                    bills.append(Bill(
+                        user=user, name=f'{category} {month}', amount=Decimal(f'{amount:.2f}'), due_date=paid,
+                        status='paid', payment_date=paid, category=category,
+                    ))
+            Bill.objects.bulk_create(bills, batch_size=5000)
+            total += len(bills)
+        self.stdout.write(f"Seeded {total} paid bills for {len(users)} users in {time.perf_counter() - started:.1f}s")
+
+    def run(self, users):
+        now = timezone.now()
+        timings = defaultdict(list)
+        for user in users:
+            started = time.perf_counter()
+            expected = loop_forecast(user.pk, forecast.HORIZON, now)
+            timings['loop'].append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            result = forecast.compute_forecast(user.pk, forecast.HORIZON, now)
+            timings['numpy'].append(time.perf_counter() - started)
+
+            for row in result['categories']:
+                for projected, reference in zip(row['projected'], expected[row['category']]):
+                    if abs(projected - reference) > 0.01:
+                        raise CommandError(f"User {user.pk} {row['category']}: {projected} != {reference:.2f}")
+
+            cache.delete(forecast._version_key(user.pk))
+            forecast.get_forecast(user)
+            started = time.perf_counter()
+            forecast.get_forecast(user)
+            timings['cached'].append(time.perf_counter() - started)
+
+        self.stdout.write(f"{'mode':<8} {'median ms':>10} {'max ms':>10}")
+        for mode, values in timings.items():
+            self.stdout.write(f"{mode:<8} {statistics.median(values) * 1000:>10.2f} {max(values) * 1000:>10.2f}")
+        speedup = statistics.median(timings['loop']) / statistics.median(timings['numpy'])
+        self.stdout.write(self.style.SUCCESS(f"numpy is {speedup:.1f}x faster than the loop (projections match)"))
@@ -0,0 +1,264 @@
+"""
+Benchmark the bill and notification indexes on a large synthetic data set.
+
+Seeds users, bills and notifications, then runs the queries behind the hot
+endpoints twice: once with the indexes declared on ``Bill`` and
+``Notification`` dropped, once with them in place. For each query it prints
+the ``EXPLAIN`` plan and the median / mean latency:
+    python manage.py bench_indexes --bills 1000000 --users 1000
+
+Run it against a scratch database (SQLite by default, or a local Postgres via
+``DATABASE_URL``): seeding a million rows takes a while, and the indexes are
+dropped for the duration of the first pass. Seeded users are removed at the
+end unless ``--keep`` is given; ``--reuse`` benchmarks previously kept data.
+"""
+import random
+import statistics
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count, Max, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from bills.management.commands.seed_synthetic import delete_users
+from bills.management.commands.send_reminders import Command as SendRemindersCommand
+from bills.models import Bill, Notification, UserPreference
+from bills.notifications import DUE_SOON_WINDOW, _missing
+
+
+USERNAME_PREFIX = 'bench-idx-'
+
+
+class Command(BaseCommand):
+    help = 'Seed synthetic bills and compare query plans and latency without and with the bill/notification indexes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bills', type=int, default=1_000_000, help='Bills to seed (default: %(default)s)')
+        parser.add_argument('--users', type=int, default=1000, help='Users to spread them over (default: %(default)s)')
+        parser.add_argument(
+            '--notifications-per-bill', type=float, default=0.3,
+            help='Notifications seeded per bill (default: %(default)s)',
+        )
+        parser.add_argument('--repeat', type=int, default=20, help='Timed runs per query (default: %(default)s)')
+        parser.add_argument('--batch-size', type=int, default=10000, help='Rows per INSERT (default: %(default)s)')
+        parser.add_argument('--keep', action='store_true', help='Keep the seeded data afterwards')
+        parser.add_argument('--reuse', action='store_true', help='Benchmark data kept by an earlier --keep run')
+        parser.add_argument('--no-explain', action='store_true', help='Only report latency')
+
+    def handle(self, *args, **options):
+        self.options = options
+        User = get_user_model()
+        users = User.objects.filter(username__startswith=USERNAME_PREFIX)
+
+        if options['reuse']:
+            if not users.exists():
+                raise CommandError('No seeded data to reuse; run once with --keep first.')
+        else:
+            if users.exists():
+                raise CommandError(
+                    f"Users named '{USERNAME_PREFIX}*' already exist; pass --reuse or delete them first."
+                )
+            self.seed(options['users'], options['bills'])
+
+        # The busiest user is the worst case for every per-user query
+        probe = users.annotate(bill_count=Count('bill')).order_by('-bill_count').first()
+        bill_total = Bill.objects.filter(user__username__startswith=USERNAME_PREFIX).count()
+        self.stdout.write(
+            f"Benchmarking on {connection.vendor}: {bill_total} seeded bills, "
+            f"probe user {probe.username} with {probe.bill_count} bills"
+        )
+
+        try:
+            self.drop_indexes()
+            self.analyze()
+            before = self.run_queries(probe, 'without indexes')
+        finally:
+            self.create_indexes()
+        self.analyze()
+        after = self.run_queries(probe, 'with indexes')
+
+        self.write_comparison(before, after)
+
+        if not options['keep']:
+            self.cleanup(users)
+
+    # ---- data -------------------------------------------------------------
+
+    def seed(self, user_count, bill_count):
+        User = get_user_model()
+        batch_size = self.options['batch_size']
+        rng = random.Random(42)
+        now = timezone.now()
+        started = time.perf_counter()
+
+        User.objects.bulk_create([
+            User(username=f'{USERNAME_PREFIX}{i}', email=f'{USERNAME_PREFIX}{i}@example.com')
+            for i in range(user_count)
+        ], batch_size=batch_size)
+        user_ids = list(
+            User.objects.filter(username__startswith=USERNAME_PREFIX).values_list('pk', flat=True)
+        )
+        UserPreference.objects.bulk_create(
+            [UserPreference(user_id=user_id) for user_id in user_ids], batch_size=batch_size
+        )
+
+        categories = [key for key, _ in Bill.CATEGORY_CHOICES]
+        # bulk_create skips the post_save signal, so no summaries are computed here
+        for offset in range(0, bill_count, batch_size):
+            bills = []
+            for _ in range(min(batch_size, bill_count - offset)):
+                due_date = now + timedelta(minutes=rng.randint(-365 * 24 * 60, 90 * 24 * 60))
+                paid = due_date < now and rng.random() < 0.8
+                bills.append(Bill(
+                    # Skewed so a few users have many bills, like real accounts
+                    user_id=user_ids[int(len(user_ids) * rng.random() ** 2)],
+                    name=f'Bill {offset}',
+                    amount=Decimal(rng.randint(100, 500000)) / 100,
+                    due_date=due_date,
+                    status='paid' if paid else 'pending',
+                    category=rng.choice(categories),
+                    payment_date=due_date - timedelta(days=rng.randint(0, 5)) if paid else None,
+                ))
+            Bill.objects.bulk_create(bills, batch_size=batch_size)
+            self.stdout.write(f"  seeded {offset + len(bills)} / {bill_count} bills", ending='\r')
+        self.stdout.write('')
+
+        rate = self.options['notifications_per_bill']
+        types = [key for key, _ in Notification.NOTIFICATION_TYPES]
+        bills = Bill.objects.filter(user_id__in=user_ids).order_by('pk').values_list('pk', 'user_id')
+        last_pk = 0
+        while True:
+            # Keyset pages, so no cursor stays open across the inserts
+            page = list(bills.filter(pk__gt=last_pk)[:batch_size])
+            if not page:
+                break
+            last_pk = page[-1][0]
+            Notification.objects.bulk_create([
+                Notification(
+                    user_id=user_id,
+                    bill_id=bill_id,
+                    title='Benchmark',
+                    message='Benchmark notification',
+                    notification_type=rng.choice(types),
+                    is_read=rng.random() < 0.7,
+                )
+                for bill_id, user_id in page
+                if rng.random() < rate
+            ])
+
+        self.stdout.write(f"Seeded in {time.perf_counter() - started:.1f}s")
+
+    def cleanup(self, users):
+        started = time.perf_counter()
+        delete_users(users)
+        self.stdout.write(f"Removed seeded data in {time.perf_counter() - started:.1f}s")
+
+    # ---- indexes ----------------------------------------------------------
+
+    def indexed_models(self):
+        return [(model, index) for model in (Bill, Notification) for index in model._meta.indexes]
+
+    def drop_indexes(self):
+        with connection.schema_editor() as editor:
+            for model, index in self.indexed_models():
+                editor.remove_index(model, index)
+
+    def create_indexes(self):
+        started = time.perf_counter()
+        with connection.schema_editor() as editor:
+            for model, index in self.indexed_models():
+                editor.add_index(model, index)
+        self.stdout.write(f"Built {len(self.indexed_models())} indexes in {time.perf_counter() - started:.1f}s")
+
+    def analyze(self):
+        # Fresh planner statistics, so both passes are planned on equal terms
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    # ---- queries ----------------------------------------------------------
+
+    def queries(self, user):
+        """(label, queryset, evaluate) for the queries behind each hot endpoint"""
+        now = timezone.now()
+        today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        six_months_ago = now - timedelta(days=180)
+        bills = Bill.objects.filter(user=user)
+        pending = bills.filter(status='pending')
+        paid_recently = bills.filter(status='paid', payment_date__gte=six_months_ago)
+        notifications = Notification.objects.filter(user=user)
+
+        return [
+            ('dashboard: upcoming bills',
+             pending.filter(due_date__gte=now, due_date__lte=now + timedelta(days=7)).order_by('due_date'),
+             list),
+            ('bills_list: page of all bills',
+             bills.order_by('due_date', 'pk')[:26],
+             list),
+            ('bills_list: overdue',
+             pending.filter(due_date__lt=now).order_by('due_date')[:50],
+             list),
+            ('analytics: monthly spend',
+             paid_recently.annotate(month=TruncMonth('payment_date')).values('month')
+             .annotate(total=Sum('amount')).order_by('month'),
+             list),
+            ('analytics: by category',
+             paid_recently.values('category').annotate(total=Sum('amount')),
+             list),
+            ('notifications: latest 10',
+             notifications.order_by('-created_at')[:10],
+             list),
+            ('notifications: unread count',
+             notifications.filter(is_read=False).values('user').annotate(unread=Count('id')),
+             list),
+            ('notifications: etag',
+             notifications.values('user').annotate(
+                 latest=Max('id'), total=Count('id'), unread=Count('id', filter=Q(is_read=False)),
+             ),
+             list),
+            ('generate_notifications: overdue',
+             _missing(pending.filter(due_date__lt=today_start), 'overdue'),
+             list),
+            ('generate_notifications: due soon',
+             _missing(pending.filter(due_date__gte=now, due_date__lte=now + DUE_SOON_WINDOW), 'due_soon'),
+             list),
+            ('send_reminders: first chunk',
+             SendRemindersCommand().eligible_bills(now)[:500],
+             list),
+        ]
+
+    def run_queries(self, user, label):
+        self.stdout.write(self.style.MIGRATE_HEADING(f"\n== {label} =="))
+        results = {}
+        for name, queryset, evaluate in self.queries(user):
+            if not self.options['no_explain']:
+                self.stdout.write(self.style.MIGRATE_LABEL(name))
+                for line in queryset.explain().splitlines():
+                    self.stdout.write(f"    {line}")
+
+            timings = []
+            for _ in range(self.options['repeat']):
+                # Clone so every run goes to the database
+                started = time.perf_counter()
+                evaluate(queryset.all())
+                timings.append((time.perf_counter() - started) * 1000)
+            results[name] = timings
+        return results
+
+    def write_comparison(self, before, after):
+        self.stdout.write(self.style.MIGRATE_HEADING('\n== Latency (ms, median / mean) =='))
+        self.stdout.write(f"{'query':<36} {'without indexes':>20} {'with indexes':>20} {'speedup':>9}")
+        for name, timings in before.items():
+            old = statistics.median(timings)
+            new = statistics.median(after[name])
+            speedup = old / new if new > 0 else float('inf')
+            self.stdout.write(
+                f"{name:<36} "
+                f"{old:9.2f} / {statistics.mean(timings):8.2f} "
+                f"{new:9.2f} / {statistics.mean(after[name]):8.2f} "
+                f"{speedup:8.1f}x"
+            )
@@ -0,0 +1,190 @@
+"""
+Benchmark the main pages and APIs through the Django test client.
+    python manage.py seed_synthetic --users 50 --bills-per-user 300
+    python manage.py bench_views --output bench.json
+    python manage.py bench_views --baseline bench.json    # exit 1 on regressions
+
+Each endpoint in ``ENDPOINTS`` is requested ``--repeat`` times for each of
+the ``--users`` seeded users with the most bills. Per endpoint it reports
+queries per request, p50/p95 latency (streamed bodies included) and the peak
+Python memory allocated by one request (traced in a separate, untimed pass,
+since ``tracemalloc`` slows everything down).
+
+By default the benchmark user's cached data is invalidated before every
+request (their data version is bumped, see ``bills.caching``), so responses
+are built from the database each time; ``--warm`` measures the cached path
+instead. Nothing cached for other users is touched, so the shared cache of a
+running site keeps working.
+
+``--output`` writes the results as JSON. ``--baseline`` compares them with an
+earlier file: an endpoint regresses when its query count goes up at all, or
+its p95 latency or peak memory grows by more than ``--tolerance``.
+"""
+import json
+import platform
+import statistics
+import time
+import tracemalloc
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from bills.caching import bump_data_version
+from bills.instrumentation import QueryRecorder
+from bills.management.commands.seed_synthetic import DEFAULT_PREFIX
+from bills.notifications import invalidate_watermark
+
+
+def _calendar_window():
+    start = timezone.localtime().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    return {'start': start.isoformat(), 'end': (start + timedelta(days=42)).isoformat()}
+
+
+# name -> (URL name, query string builder)
+ENDPOINTS = {
+    'dashboard': ('dashboard', dict),
+    'bills_list': ('bills-list', dict),
+    'bills_list_paid': ('bills-list', lambda: {'status': 'paid'}),
+    'search': ('search_bills', lambda: {'q': 'electricity'}),
+    'calendar': ('calendar_events', _calendar_window),
+    'analytics': ('analytics_data', lambda: {'months': 12}),
+    'forecast': ('spending_forecast', dict),
+    'notifications': ('get_notifications', dict),
+    'export_csv': ('export_csv', dict),
+    'export_pdf': ('export_pdf', dict),
+}
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class Command(BaseCommand):
+    help = 'Measure queries, latency and memory per endpoint on seeded data'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prefix', default=DEFAULT_PREFIX, help='Seeded username prefix (default: %(default)s)')
+        parser.add_argument('--users', type=int, default=3, help='Seeded users to benchmark as (default: %(default)s)')
+        parser.add_argument('--repeat', type=int, default=10,
+                            help='Requests per endpoint and user (default: %(default)s)')
+        parser.add_argument('--endpoint', action='append', choices=sorted(ENDPOINTS), dest='endpoints',
+                            help='Only this endpoint (repeatable)')
+        parser.add_argument('--warm', action='store_true', help='Keep the cache between requests')
+        parser.add_argument('--output', help='Write the results to this JSON file')
+        parser.add_argument('--baseline', help='Compare with the results in this JSON file')
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help='Allowed p95/memory growth over the baseline (default: %(default)s)')
+
+    def handle(self, *args, **options):
+        users = list(
+            get_user_model().objects.filter(username__startswith=options['prefix'])
+            .annotate(bill_count=Count('bill')).order_by('-bill_count')[:options['users']]
+        )
+        if not users:
+            raise CommandError(f"No users named '{options['prefix']}*'; run seed_synthetic first.")
+
+        self.warm = options['warm']
+        results = {}
+        # The test client's host; DEBUG off so query logging does not add to the cost
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'], DEBUG=False):
+            for name in options['endpoints'] or ENDPOINTS:
+                results[name] = self.bench(name, users, options['repeat'])
+                self.write_row(name, results[name])
+
+        report = {
+            'meta': {
+                'time': timezone.now().isoformat(),
+                'database': connection.vendor,
+                'python': platform.python_version(),
+                'users': [user.username for user in users],
+                'bills_per_user': [user.bill_count for user in users],
+                'repeat': options['repeat'],
+                'cache': 'warm' if self.warm else 'cold',
+            },
+            'endpoints': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f"Wrote {options['output']}")
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+            regressions = self.compare(baseline['endpoints'], results, options['tolerance'])
+            if regressions:
+                for line in regressions:
+                    self.stdout.write(self.style.ERROR(line))
+                raise CommandError(f"{len(regressions)} regression(s) against {options['baseline']}")
+            self.stdout.write(self.style.SUCCESS('No regressions against the baseline.'))
+
+    def request(self, client, user, url, params):
+        if not self.warm:
+            bump_data_version(user.pk)
+            invalidate_watermark(user.pk)
+        response = client.get(url, params)
+        if response.streaming:
+            for _ in response.streaming_content:
+                pass
+        if response.status_code != 200:
+            raise CommandError(f"GET {url} returned {response.status_code}")
+        return response
+
+    def bench(self, name, users, repeat):
+        url_name, build_params = ENDPOINTS[name]
+        url = reverse(url_name)
+        latencies, queries, peaks = [], [], []
+        for user in users:
+            client = Client()
+            client.force_login(user)
+            params = build_params()
+            self.request(client, user, url, params)  # warm-up: connection, templates, imports
+
+            for _ in range(repeat):
+                with QueryRecorder() as recorder:
+                    started = time.perf_counter()
+                    self.request(client, user, url, params)
+                    latencies.append(time.perf_counter() - started)
+                queries.append(recorder.count)
+
+            tracemalloc.start()
+            try:
+                self.request(client, user, url, params)
+                peaks.append(tracemalloc.get_traced_memory()[1])
+            finally:
+                tracemalloc.stop()
+
+        return {
+            'requests': len(latencies),
+            # Session and user lookups included
+            'queries': max(queries),
+            'p50_ms': round(statistics.median(latencies) * 1000, 2),
+            'p95_ms': round(_percentile(latencies, 0.95) * 1000, 2),
+            'peak_kb': round(max(peaks) / 1024, 1),
+        }
+
+    def write_row(self, name, row):
+        self.stdout.write(
+            f"{name:<18} {row['queries']:>4} queries  p50 {row['p50_ms']:>8.2f}ms  "
+            f"p95 {row['p95_ms']:>8.2f}ms  peak {row['peak_kb']:>9.1f}KB"
+        )
+
+    def compare(self, baseline, results, tolerance):
+        regressions = []
+        for name, row in results.items():
+            before = baseline.get(name)
+            if before is None:
+                continue
+            if row['queries'] > before['queries']:
+                regressions.append(f"{name}: {before['queries']} -> {row['queries']} queries")
+            for metric in ('p95_ms', 'peak_kb'):
+                if row[metric] > before[metric] * (1 + tolerance):
+                    regressions.append(f"{name}: {metric} {before[metric]} -> {row[metric]}")
+        return regressions
@@ -0,0 +1,41 @@
+"""
+Store upcoming occurrences of recurring bills and create the bills that are due.
+Run this command daily (``send_reminders`` also creates the due bills first):
+    python manage.py materialize_recurrences
+    python manage.py materialize_recurrences --horizon-days 730
+
+Recurring bills from before series existed are adopted into series first
+(see bills.recurrence).
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from bills import recurrence
+
+
+class Command(BaseCommand):
+    help = 'Materialize recurring bill occurrences up to the horizon and create the bills due soon'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--horizon-days',
+            type=int,
+            default=settings.RECURRENCE_HORIZON_DAYS,
+            help='Store occurrences this many days ahead (default: %(default)s)',
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        now = timezone.now()
+        until = now + timedelta(days=options['horizon_days'])
+        adopted = recurrence.adopt_recurring_bills(now, until)
+        stored = recurrence.materialize(until=until, now=now)
+        bills = recurrence.create_due_bills(now)
+        self.stdout.write(self.style.SUCCESS(
+            f"Adopted {adopted} series, stored {stored} occurrence(s) and created {len(bills)} bill(s) "
+            f"in {time.perf_counter() - started:.2f}s."
+        ))
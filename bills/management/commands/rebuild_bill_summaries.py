@@ -0,0 +1,73 @@
+"""
+Rebuild the denormalized per-user bill summaries.
+    python manage.py rebuild_bill_summaries           # every user, from scratch
+    python manage.py rebuild_bill_summaries --stale   # periodic rollover (cron)
+    python manage.py rebuild_bill_summaries --check   # report drift, change nothing
+"""
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from bills.models import UserBillSummary
+from bills.summaries import compute_summary, refresh_summary
+
+
+class Command(BaseCommand):
+    help = 'Recompute UserBillSummary rows from the bills table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--stale',
+            action='store_true',
+            help='Only recompute rows whose time-based counts have expired',
+        )
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Compare stored rows with freshly computed values without writing',
+        )
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+
+        if options['stale']:
+            user_ids = UserBillSummary.objects.filter(valid_until__lte=now).values_list('user_id', flat=True)
+        else:
+            user_ids = get_user_model().objects.values_list('pk', flat=True)
+
+        if options['check']:
+            self.check_drift(user_ids, now)
+            return
+
+        refreshed = 0
+        for user_id in user_ids.iterator():
+            refresh_summary(user_id, now)
+            refreshed += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Recomputed {refreshed} bill summary row(s)."))
+
+    def check_drift(self, user_ids, now):
+        stored = {summary.user_id: summary for summary in UserBillSummary.objects.all()}
+        drifted = 0
+        for user_id in user_ids.iterator():
+            expected = compute_summary(user_id, now)
+            summary = stored.get(user_id)
+            if summary is None:
+                drifted += 1
+                self.stdout.write(self.style.WARNING(f"User {user_id}: missing summary row"))
+                continue
+            if summary.is_stale:
+                continue
+            diffs = [
+                f"{field} {getattr(summary, field)} != {value}"
+                for field, value in expected.items()
+                if field != 'valid_until' and getattr(summary, field) != value
+            ]
+            if diffs:
+                drifted += 1
+                self.stdout.write(self.style.WARNING(f"User {user_id}: {', '.join(diffs)}"))
+
+        if drifted:
+            self.stdout.write(self.style.ERROR(f"{drifted} summary row(s) drifted."))
+        else:
+            self.stdout.write(self.style.SUCCESS("All summary rows match."))
@@ -0,0 +1,27 @@
+"""
+Rebuild the monthly spending rollups from the bills table.
+    python manage.py rebuild_monthly_spend
+    python manage.py rebuild_monthly_spend --user 42
+
+Needed after writing bills with bulk_create, update() or raw SQL, which
+bypass the signals that keep the rollups current (see bills.spending).
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from bills import spending
+
+
+class Command(BaseCommand):
+    help = 'Recompute MonthlySpend rows from paid bills'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='users', help='Only this user id (repeatable)')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        written = spending.rebuild(options['users'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {written} monthly spend row(s) in {time.perf_counter() - started:.2f}s."
+        ))
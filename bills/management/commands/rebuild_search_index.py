@@ -0,0 +1,32 @@
+"""
+Rebuild the bill full-text search index from the bills table.
+    python manage.py rebuild_search_index
+
+Needed after loading bills with bulk_create, raw SQL or loaddata --raw, which
+bypass the signals that keep the index in sync (see bills.search).
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from bills import search
+
+
+class Command(BaseCommand):
+    help = 'Reindex every bill for full-text search'
+
+    def handle(self, *args, **options):
+        backend = search.get_backend()
+        if backend is None:
+            self.stdout.write(self.style.WARNING(
+                'No full-text search table on this database; search uses icontains lookups.'
+            ))
+            return
+
+        started = time.perf_counter()
+        with transaction.atomic():
+            search.rebuild_index()
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt the {backend} search index in {time.perf_counter() - started:.2f}s."
+        ))
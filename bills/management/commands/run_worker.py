@@ -0,0 +1,90 @@
+"""
+Run queued background jobs (see bills.jobs).
+    python manage.py run_worker --concurrency 2
+
+Each of ``--concurrency`` threads claims a job, runs it and claims the next;
+when the queue is empty it sleeps ``--poll-interval`` seconds, and deletes
+expired jobs if none of its threads has for ``jobs.PURGE_INTERVAL``. Several
+workers, on one host or many, can share the same database. SIGTERM/SIGINT
+stop the worker after the jobs in progress finish.
+
+``--once`` runs until no job is ready, then exits (for cron or tests).
+"""
+import os
+import signal
+import socket
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from bills import jobs
+
+
+class Command(BaseCommand):
+    help = 'Process background jobs (exports, reports, queued commands)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=1, help='Worker threads (default: %(default)s)')
+        parser.add_argument('--poll-interval', type=float, default=2.0,
+                            help='Seconds to wait when the queue is empty (default: %(default)s)')
+        parser.add_argument('--once', action='store_true', help='Exit once no job is ready')
+
+    def handle(self, *args, **options):
+        self.stop = threading.Event()
+        self.once = options['once']
+        self.poll_interval = options['poll_interval']
+        self.name = f'{socket.gethostname()}:{os.getpid()}'
+        if threading.current_thread() is threading.main_thread():
+            for sig in (signal.SIGTERM, signal.SIGINT):
+                signal.signal(sig, lambda *_: self.stop.set())
+
+        requeued = jobs.requeue_stale()
+        if requeued:
+            self.stdout.write(f"Requeued {requeued} stale job(s).")
+
+        self.processed = 0
+        self.lock = threading.Lock()
+        self.next_purge = 0.0
+        if options['concurrency'] == 1:
+            self.work(0)
+        else:
+            threads = [
+                threading.Thread(target=self.work, args=(i,), daemon=True)
+                for i in range(options['concurrency'])
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.stdout.write(self.style.SUCCESS(f"Worker stopped after {self.processed} job(s)."))
+
+    def work(self, index):
+        worker = f'{self.name}:{index}'
+        try:
+            while not self.stop.is_set():
+                close_old_connections()
+                job = jobs.claim_next(worker)
+                if job is None:
+                    if self.once:
+                        break
+                    self.purge_if_due()
+                    self.stop.wait(self.poll_interval)
+                    continue
+                job = jobs.run_job(job)
+                with self.lock:
+                    self.processed += 1
+                self.stdout.write(f"[{worker}] job {job.pk} ({job.kind}): {job.status}")
+        finally:
+            if threading.current_thread() is not threading.main_thread():
+                connection.close()
+
+    def purge_if_due(self):
+        """Purge expired jobs, at most once per ``jobs.PURGE_INTERVAL`` across threads"""
+        now = time.monotonic()
+        with self.lock:
+            if now < self.next_purge:
+                return
+            self.next_purge = now + jobs.PURGE_INTERVAL.total_seconds()
+        jobs.purge_finished()
@@ -0,0 +1,253 @@
+"""
+Seed realistic synthetic users and bills, for load tests and ``bench_views``.
+    python manage.py seed_synthetic --users 200 --bills-per-user 300
+
+Each user gets a handful of recurring accounts drawn from ``ACCOUNTS`` (rent,
+utilities, subscriptions, weekly groceries...), each with its own amount
+range and frequency, whose history runs back from their next due date: past
+occurrences are mostly paid a few days early, some are still overdue, and the
+next one is pending. About ``ONE_TIME_SHARE`` of the bills are one-time bills
+spread over the past year and the next two months. Users also get payment
+methods, budgets and notifications.
+
+Everything is written with ``bulk_create``, then the data that signals would
+normally maintain is rebuilt for the seeded users: search index, monthly
+spend, summaries and recurring series. Seeded usernames start with
+``--prefix``; run against a scratch database (``DATABASE_URL``).
+
+``--delete`` removes the users seeded with ``--prefix`` instead, through
+``delete_users``: deleting users one by one would cascade through the
+per-bill delete receivers (summary, rollups, recurrence, search index, cache)
+for every bill.
+"""
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from bills import recurrence, search, spending
+from bills.models import Bill, BillAttachment, Budget, Notification, PaymentMethod, RecurrenceOccurrence
+from bills.summaries import refresh_summary
+
+
+DEFAULT_PREFIX = 'synthetic-'
+ONE_TIME_SHARE = 0.3
+OVERDUE_RATE = 0.05
+NOTIFICATION_RATE = 0.2
+
+# (name, category, frequency, amount range, share of users that have it)
+ACCOUNTS = [
+    ('Rent', 'rent', 'monthly', (8000, 25000), 0.6),
+    ('Electricity', 'electricity', 'monthly', (1500, 6000), 0.95),
+    ('Water', 'water', 'monthly', (300, 1200), 0.9),
+    ('Internet', 'internet', 'monthly', (1299, 2999), 0.85),
+    ('Mobile Plan', 'phone', 'monthly', (499, 1999), 0.8),
+    ('Netflix', 'subscription', 'monthly', (149, 549), 0.5),
+    ('Spotify', 'subscription', 'monthly', (149, 279), 0.4),
+    ('Gym Membership', 'healthcare', 'monthly', (1500, 3500), 0.25),
+    ('Tuition', 'education', 'monthly', (3000, 15000), 0.15),
+    ('Car Insurance', 'insurance', 'yearly', (8000, 30000), 0.35),
+    ('Health Insurance', 'insurance', 'yearly', (5000, 25000), 0.3),
+    ('Groceries', 'food', 'weekly', (1500, 5000), 0.7),
+    ('Fuel', 'transportation', 'weekly', (800, 2500), 0.45),
+]
+ONE_TIME = [
+    ('Doctor Visit', 'healthcare', (500, 3000)),
+    ('Concert Tickets', 'entertainment', (1500, 8000)),
+    ('Appliance Repair', 'utilities', (800, 5000)),
+    ('School Supplies', 'education', (500, 4000)),
+    ('Gift', 'other', (300, 3000)),
+    ('Taxi', 'transportation', (150, 900)),
+    ('Restaurant', 'food', (600, 4000)),
+]
+PAYMENT_METHODS = [('GCash', 'gcash'), ('Maya', 'maya'), ('BDO Savings', 'bank'), ('BPI Credit', 'card'), ('Cash', 'cash')]
+# Same amount every time; the other categories vary by up to 20%
+FIXED_PRICE = {'rent', 'subscription', 'insurance', 'internet', 'phone'}
+STEPS_PER_YEAR = {'weekly': 52, 'monthly': 12, 'yearly': 1}
+
+
+def _amount(rng, low, high):
+    return Decimal(f'{rng.uniform(low, high):.2f}')
+
+
+def delete_users(users, batch_size=500):
+    """
+    Delete ``users`` (a queryset) with their bills. Bills and the rows that
+    point at them are removed with plain ``DELETE`` statements, skipping the
+    per-bill receivers; the derived rows (summaries, monthly spend) belong to
+    the users and go with them, and the search rows are dropped per batch.
+    Returns the number of bills deleted.
+    """
+    user_ids = list(users.values_list('pk', flat=True))
+    deleted = 0
+    for start in range(0, len(user_ids), batch_size):
+        batch = user_ids[start:start + batch_size]
+        with transaction.atomic():
+            search.remove_user_bills(batch)
+            for queryset in (
+                RecurrenceOccurrence.objects.filter(series__user_id__in=batch),
+                Notification.objects.filter(user_id__in=batch),
+                BillAttachment.objects.filter(bill__user_id__in=batch),
+            ):
+                queryset._raw_delete(queryset.db)
+            bills = Bill.objects.filter(user_id__in=batch)
+            deleted += bills._raw_delete(bills.db)
+            # No bills left, so this only cascades to the users' own rows
+            users.model.objects.filter(pk__in=batch).delete()
+    return deleted
+
+
+class Command(BaseCommand):
+    help = 'Seed synthetic users with realistic recurring and one-time bills'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50, help='Users to create (default: %(default)s)')
+        parser.add_argument('--bills-per-user', type=int, default=200, help='Bills per user (default: %(default)s)')
+        parser.add_argument('--prefix', default=DEFAULT_PREFIX, help='Username prefix (default: %(default)s)')
+        parser.add_argument('--seed', type=int, default=1, help='Random seed (default: %(default)s)')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per INSERT (default: %(default)s)')
+        parser.add_argument('--delete', action='store_true', help='Remove the users seeded with --prefix instead')
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        prefix = options['prefix']
+        if options['delete']:
+            started = time.perf_counter()
+            users = User.objects.filter(username__startswith=prefix)
+            user_count = users.count()
+            bill_count = delete_users(users)
+            self.stdout.write(self.style.SUCCESS(
+                f"Removed {user_count} users and {bill_count} bills in {time.perf_counter() - started:.1f}s"
+            ))
+            return
+        if User.objects.filter(username__startswith=prefix).exists():
+            raise CommandError(f"Users named '{prefix}*' already exist; use another --prefix or a fresh database.")
+
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.now = timezone.now()
+        started = time.perf_counter()
+
+        password = make_password(None)
+        User.objects.bulk_create([
+            User(username=f'{prefix}{i}', email=f'{prefix}{i}@example.com', password=password)
+            for i in range(options['users'])
+        ], batch_size=self.batch_size)
+        users = list(User.objects.filter(username__startswith=prefix).order_by('pk'))
+
+        with transaction.atomic():
+            methods = self.seed_payment_methods(users)
+            bill_count = self.seed_bills(users, options['bills_per_user'], methods)
+            self.seed_budgets(users)
+            notification_count = self.seed_notifications(users)
+        seeded = time.perf_counter() - started
+        self.stdout.write(
+            f"Seeded {len(users)} users, {bill_count} bills and {notification_count} notifications in {seeded:.1f}s"
+        )
+
+        started = time.perf_counter()
+        self.rebuild_derived(users)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt derived data in {time.perf_counter() - started:.1f}s"))
+
+    def seed_payment_methods(self, users):
+        methods = []
+        for user in users:
+            for name, method_type in self.rng.sample(PAYMENT_METHODS, self.rng.randint(1, 3)):
+                methods.append(PaymentMethod(user=user, name=name, method_type=method_type))
+        methods = PaymentMethod.objects.bulk_create(methods, batch_size=self.batch_size)
+        by_user = {}
+        for method in methods:
+            by_user.setdefault(method.user_id, []).append(method)
+        return by_user
+
+    def seed_bills(self, users, per_user, methods):
+        rng = self.rng
+        bills = []
+        total = 0
+        for user in users:
+            user_methods = methods.get(user.pk, [None])
+            accounts = [account for account in ACCOUNTS if rng.random() < account[4]] or ACCOUNTS[1:2]
+            recurring_budget = round(per_user * (1 - ONE_TIME_SHARE))
+            weights = [STEPS_PER_YEAR[account[2]] for account in accounts]
+            counts = [max(1, round(recurring_budget * weight / sum(weights))) for weight in weights]
+            for (name, category, frequency, (low, high), _), count in zip(accounts, counts):
+                base = _amount(rng, low, high)
+                next_due = self.now + timedelta(days=rng.uniform(0, 7 if frequency == 'weekly' else 28))
+                for step in range(count):
+                    due = recurrence.nth_occurrence(next_due, frequency, -step)
+                    amount = base
+                    if category not in FIXED_PRICE:
+                        amount = (base * Decimal(rng.uniform(0.8, 1.2))).quantize(Decimal('0.01'))
+                    bills.append(self.bill(user, name, category, amount, due, user_methods, frequency))
+            for _ in range(max(0, per_user - sum(counts))):
+                name, category, (low, high) = rng.choice(ONE_TIME)
+                due = self.now + timedelta(days=rng.uniform(-365, 60))
+                bills.append(self.bill(user, name, category, _amount(rng, low, high), due, user_methods))
+
+            if len(bills) >= self.batch_size:
+                total += len(Bill.objects.bulk_create(bills, batch_size=self.batch_size))
+                bills = []
+        total += len(Bill.objects.bulk_create(bills, batch_size=self.batch_size))
+        return total
+
+    def bill(self, user, name, category, amount, due, methods, frequency=None):
+        rng = self.rng
+        paid = due < self.now and rng.random() > OVERDUE_RATE
+        return Bill(
+            user=user,
+            name=name,
+            amount=amount,
+            due_date=due,
+            category=category,
+            status='paid' if paid else 'pending',
+            payment_date=min(due - timedelta(days=rng.uniform(0, 5)), self.now) if paid else None,
+            payment_method=rng.choice(methods) if paid else None,
+            recurring=frequency is not None,
+            recurrence_frequency=frequency or 'none',
+            reminder_sent=paid,
+        )
+
+    def seed_budgets(self, users):
+        categories = [category for category, _ in Bill.CATEGORY_CHOICES]
+        Budget.objects.bulk_create([
+            Budget(user=user, category=category, monthly_limit=Decimal(self.rng.choice([2000, 5000, 10000, 20000])))
+            for user in users
+            for category in self.rng.sample(categories, self.rng.randint(2, 5))
+        ], batch_size=self.batch_size)
+
+    def seed_notifications(self, users):
+        rng = self.rng
+        notifications = []
+        bills = Bill.objects.filter(user__in=users).values_list('pk', 'user_id', 'name', 'status', 'due_date')
+        for pk, user_id, name, status, due_date in bills.iterator(chunk_size=self.batch_size):
+            if rng.random() >= NOTIFICATION_RATE:
+                continue
+            if status == 'paid':
+                kind, title = 'payment', 'Payment Confirmed'
+            elif due_date < self.now:
+                kind, title = 'overdue', 'Bill Overdue'
+            else:
+                kind, title = 'due_soon', 'Bill Due Soon'
+            notifications.append(Notification(
+                user_id=user_id, bill_id=pk, title=title, message=f'{title}: "{name}"',
+                notification_type=kind, is_read=status == 'paid' or rng.random() < 0.5,
+            ))
+        return len(Notification.objects.bulk_create(notifications, batch_size=self.batch_size))
+
+    def rebuild_derived(self, users):
+        user_ids = [user.pk for user in users]
+        bill_ids = list(Bill.objects.filter(user_id__in=user_ids).values_list('pk', flat=True))
+        with transaction.atomic():
+            # Stay under SQLite's bound-parameter limit
+            for start in range(0, len(bill_ids), 900):
+                search.index_bills(bill_ids[start:start + 900])
+        spending.rebuild(user_ids)
+        for user_id in user_ids:
+            refresh_summary(user_id, self.now)
+        recurrence.adopt_recurring_bills(self.now)
@@ -2,15 +2,45 @@
 Django management command to send bill reminder emails.
 Run this command daily via cron or task scheduler:
     python manage.py send_reminders
+
+Recurring bill occurrences due within ``RECURRENCE_BILL_LEAD_DAYS`` get their
+bill first (``bills.recurrence.create_due_bills``).
+
+The run is set-based: missing preferences are created in one insert, eligible
+bills are picked with a single query that joins ``UserPreference`` and applies
+``remind_days_before`` in the database, and the bill/notification writes are
+flushed with ``bulk_update``/``bulk_create`` every ``--chunk-size`` bills.
+Emails go out through a ``DeliveryPool`` of ``--workers`` threads, each
+reusing one mail connection for the whole run.
+
+Users with ``daily_digest_enabled`` (or everyone, with ``--digest``) get a
+single digest email and a single notification covering all of their bills
+due soon instead of one per bill.
 """
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import timedelta
+from itertools import groupby
+
+from django.contrib.auth import get_user_model
 from django.core.management.base import BaseCommand
-from django.core.mail import send_mail
 from django.conf import settings
+from django.db.models import DateTimeField, DurationField, ExpressionWrapper, F, Q, Value
 from django.utils import timezone
-from datetime import timedelta
+from bills import recurrence
+from bills.caching import bump_data_version
+from bills.delivery import DeliveryPool
+from bills.emails import ReminderEmails
+from bills.events import publish_notifications
 from bills.models import Bill, UserPreference, Notification
 
 
+DEFAULT_CHUNK_SIZE = 500
+DEFAULT_WORKERS = 4
+DEFAULT_BATCH_SIZE = 50
+
+
 class Command(BaseCommand):
     help = 'Send email reminders for upcoming bills'
 
@@ -20,145 +50,260 @@ class Command(BaseCommand):
             action='store_true',
             help='Show what would be sent without actually sending emails',
         )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=getattr(settings, 'REMINDER_CHUNK_SIZE', DEFAULT_CHUNK_SIZE),
+            help='Number of bills fetched and written per batch (default: %(default)s)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=getattr(settings, 'REMINDER_WORKERS', DEFAULT_WORKERS),
+            help='Number of email delivery threads, one connection each (default: %(default)s)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=getattr(settings, 'REMINDER_BATCH_SIZE', DEFAULT_BATCH_SIZE),
+            help='Number of emails handed to a delivery thread at a time (default: %(default)s)',
+        )
+        parser.add_argument(
+            '--digest',
+            action='store_true',
+            help='Send every user one digest email, regardless of their daily digest preference',
+        )
+
+    @contextmanager
+    def phase(self, name):
+        """Accumulate wall-clock time spent in a named phase of the run"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] += time.perf_counter() - started
 
     def handle(self, *args, **options):
         dry_run = options['dry_run']
+        chunk_size = max(1, options['chunk_size'])
         now = timezone.now()
         reminders_sent = 0
-        
+        emails_sent = 0
+        failed = 0
+        delivery_time = 0.0
+        self.timings = defaultdict(float)
+
         self.stdout.write(f"Checking for bills that need reminders at {now}")
-        
-        # Get all pending bills
-        pending_bills = Bill.objects.filter(
-            status='pending',
-            due_date__gte=now,
-        ).select_related('user')
-        
-        for bill in pending_bills:
-            # Get user preferences
-            try:
-                prefs = bill.user.preferences
-            except UserPreference.DoesNotExist:
-                # Create default preferences if not exists
-                prefs = UserPreference.objects.create(user=bill.user)
-            
-            if not prefs.email_reminders_enabled:
-                continue
-            
-            # Check if reminder should be sent
-            days_until_due = (bill.due_date - now).days
-            
-            if days_until_due <= prefs.remind_days_before:
-                # Check if reminder was already sent today
-                if bill.last_reminder_date and bill.last_reminder_date.date() == now.date():
-                    continue
-                
+
+        if not dry_run:
+            with self.phase('recurrences'):
+                # Occurrences due within the lead time get their bill, so they are reminded too
+                recurrence.create_due_bills(now)
+            with self.phase('preferences'):
+                self.create_missing_preferences(now)
+
+        pending_bills = self.eligible_bills(now, include_defaults=dry_run)
+        force_digest = options['digest']
+        emails = ReminderEmails()
+
+        pool = DeliveryPool(workers=options['workers'], batch_size=options['batch_size'])
+        with pool:
+            for chunk in self.user_chunks(pending_bills, chunk_size):
+                groups = []
+                for _, user_bills in groupby(chunk, key=lambda bill: bill.user_id):
+                    items = [(bill, (bill.due_date - now).days) for bill in user_bills]
+                    if force_digest or self.wants_digest(items[0][0].user):
+                        groups.append(items)
+                    else:
+                        groups.extend([item] for item in items)
+
                 if dry_run:
+                    for items in groups:
+                        bill, days_until_due = items[0]
+                        if len(items) > 1:
+                            self.stdout.write(
+                                f"[DRY RUN] Would send digest to {bill.user.email} "
+                                f"for {len(items)} bills"
+                            )
+                        else:
+                            self.stdout.write(
+                                f"[DRY RUN] Would send reminder to {bill.user.email} "
+                                f"for '{bill.name}' due in {days_until_due} days"
+                            )
+                    continue
+
+                with self.phase('render'):
+                    outgoing = {}
+                    for items in groups:
+                        if len(items) > 1:
+                            message = emails.digest(items)
+                        else:
+                            message = emails.reminder(*items[0])
+                        outgoing[id(message)] = (message, items)
+
+                with self.phase('send'):
+                    result = pool.deliver([message for message, _ in outgoing.values()])
+                delivery_time += result.elapsed
+
+                for message, error in result.failed:
+                    failed += 1
                     self.stdout.write(
-                        f"[DRY RUN] Would send reminder to {bill.user.email} "
-                        f"for '{bill.name}' due in {days_until_due} days"
+                        self.style.ERROR(f"Failed to send email to {', '.join(message.to)}: {error}")
                     )
-                else:
-                    # Send email
-                    success = self.send_reminder_email(bill, days_until_due)
-                    
-                    if success:
-                        # Update bill tracking
+
+                to_update = []
+                notifications = []
+                for message in result.sent:
+                    _, items = outgoing[id(message)]
+                    for bill, _ in items:
                         bill.reminder_sent = True
                         bill.last_reminder_date = now
-                        bill.save()
-                        
-                        # Create notification
-                        Notification.objects.create(
+                        bill.updated_at = now
+                        to_update.append(bill)
+
+                    bill, days_until_due = items[0]
+                    if len(items) > 1:
+                        notifications.append(Notification(
+                            user=bill.user,
+                            title='Reminder Digest Sent',
+                            message=f'Reminder digest sent for {len(items)} bills due soon.',
+                            notification_type='reminder'
+                        ))
+                        self.stdout.write(
+                            self.style.SUCCESS(f"Sent digest to {bill.user.email} for {len(items)} bills")
+                        )
+                    else:
+                        notifications.append(Notification(
                             user=bill.user,
                             bill=bill,
                             title='Reminder Email Sent',
                             message=f'Reminder sent for "{bill.name}" due in {days_until_due} days.',
                             notification_type='reminder'
-                        )
-                        
-                        reminders_sent += 1
+                        ))
                         self.stdout.write(
                             self.style.SUCCESS(f"Sent reminder to {bill.user.email} for '{bill.name}'")
                         )
-        
+                    reminders_sent += len(items)
+                    emails_sent += 1
+
+                with self.phase('write'):
+                    self.flush(to_update, notifications, chunk_size)
+
         self.stdout.write(
             self.style.SUCCESS(f"Done! Sent {reminders_sent} reminder(s).")
         )
+        if not dry_run:
+            throughput = emails_sent / delivery_time if delivery_time > 0 else 0.0
+            self.stdout.write(
+                f"Delivery: {emails_sent} sent, {failed} failed in {delivery_time:.3f}s "
+                f"({throughput:.1f} messages/sec, {pool.workers} worker(s), batch size {pool.batch_size})"
+            )
+        self.write_timings()
 
-    def send_reminder_email(self, bill, days_until_due):
-        """Send reminder email for a bill"""
-        subject = f"Bill Reminder: {bill.name} due in {days_until_due} day(s)"
-        
-        message = f"""
-Hello {bill.user.first_name or bill.user.username},
-
-This is a friendly reminder that your bill is due soon:
-
-Bill: {bill.name}
-Amount: ₱{bill.amount}
-Due Date: {bill.due_date.strftime('%B %d, %Y')}
-Category: {bill.get_category_display()}
-
-Don't forget to pay on time to avoid late fees!
-
----
-Bill Payment Reminder
-        """.strip()
-        
-        html_message = f"""
-<!DOCTYPE html>
-<html>
-<head>
-    <style>
-        body {{ font-family: sans-serif; line-height: 1.6; color: #333; }}
-        .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-        .header {{ background: linear-gradient(135deg, #2563eb, #3b82f6); color: white; padding: 20px; border-radius: 8px 8px 0 0; }}
-        .content {{ background: #f8fafc; padding: 20px; border-radius: 0 0 8px 8px; }}
-        .bill-details {{ background: white; padding: 15px; border-radius: 8px; margin: 15px 0; }}
-        .amount {{ font-size: 24px; font-weight: bold; color: #2563eb; }}
-        .due-date {{ color: #f59e0b; font-weight: bold; }}
-    </style>
-</head>
-<body>
-    <div class="container">
-        <div class="header">
-            <h2>📋 Bill Payment Reminder</h2>
-        </div>
-        <div class="content">
-            <p>Hello {bill.user.first_name or bill.user.username},</p>
-            <p>This is a friendly reminder that your bill is due soon:</p>
-            
-            <div class="bill-details">
-                <h3>{bill.name}</h3>
-                <p class="amount" style="color: #2563eb; font-weight: bold; font-size: 24px;">Amount:&nbsp;₱{bill.amount}</p>
-                <p class="due-date">Due: {bill.due_date.strftime('%B %d, %Y')} ({days_until_due} day(s) left)</p>
-                <p>Category: {bill.get_category_display()}</p>
-            </div>
-            
-            <p>Don't forget to pay on time to avoid late fees!</p>
-            
-            <p style="color: #64748b; font-size: 12px; margin-top: 30px;">
-                — Bill Payment Reminder Team
-            </p>
-        </div>
-    </div>
-</body>
-</html>
-        """
-        
+    def create_missing_preferences(self, now):
+        """Create default preferences for every user with an upcoming bill but no preference row"""
+        User = get_user_model()
+        missing = User.objects.filter(
+            bill__status='pending',
+            bill__due_date__gte=now,
+            preferences__isnull=True,
+        ).values_list('pk', flat=True).distinct()
+
+        UserPreference.objects.bulk_create(
+            [UserPreference(user_id=user_id) for user_id in missing],
+            ignore_conflicts=True,
+        )
+
+    def wants_digest(self, user):
         try:
-            send_mail(
-                subject=subject,
-                message=message,
-                from_email=settings.DEFAULT_FROM_EMAIL if hasattr(settings, 'DEFAULT_FROM_EMAIL') else 'noreply@billreminder.com',
-                recipient_list=[bill.user.email],
-                html_message=html_message,
-                fail_silently=False,
+            return user.preferences.daily_digest_enabled
+        except UserPreference.DoesNotExist:
+            return False
+
+    def user_chunks(self, queryset, chunk_size):
+        """
+        Yield lists of roughly ``chunk_size`` bills ordered by (user, pk), never
+        splitting one user's bills across two lists so digests stay whole.
+        """
+        carry = []
+        last = None
+        while True:
+            with self.phase('select'):
+                page = queryset
+                if last is not None:
+                    page = page.filter(Q(user_id__gt=last.user_id) | Q(user_id=last.user_id, pk__gt=last.pk))
+                fetched = list(page[:chunk_size])
+
+            if not fetched:
+                if carry:
+                    yield carry
+                return
+
+            last = fetched[-1]
+            bills = carry + fetched
+            if len(fetched) < chunk_size:
+                yield bills
+                return
+
+            # Hold back the last user's bills; they may continue in the next page
+            split = len(bills)
+            while split > 0 and bills[split - 1].user_id == last.user_id:
+                split -= 1
+            carry = bills[split:]
+            if split:
+                yield bills[:split]
+
+    def eligible_bills(self, now, include_defaults=False):
+        """
+        Pending bills whose reminder window (``remind_days_before``) has opened
+        and that have not been reminded today, in one query joined to preferences.
+
+        ``include_defaults`` also matches users without a preference row using the
+        model defaults, for dry runs that must not create rows.
+        """
+        # (due_date - now).days <= remind_days_before  <=>  due_date < now + (remind_days_before + 1) days
+        window = ExpressionWrapper(
+            (F('user__preferences__remind_days_before') + 1) * Value(timedelta(days=1)),
+            output_field=DurationField(),
+        )
+        window_end = Value(now, output_field=DateTimeField()) + window
+        start_of_today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+
+        eligible = Q(
+            user__preferences__email_reminders_enabled=True,
+            due_date__lt=window_end,
+        )
+        if include_defaults:
+            default_days = UserPreference._meta.get_field('remind_days_before').default
+            eligible |= Q(
+                user__preferences__isnull=True,
+                due_date__lt=now + timedelta(days=default_days + 1),
             )
-            return True
-        except Exception as e:
-            self.stdout.write(
-                self.style.ERROR(f"Failed to send email to {bill.user.email}: {e}")
+
+        return Bill.objects.filter(
+            eligible,
+            status='pending',
+            due_date__gte=now,
+        ).filter(
+            Q(last_reminder_date__isnull=True) | Q(last_reminder_date__lt=start_of_today)
+        ).select_related('user', 'user__preferences').order_by('user_id', 'pk')
+
+    def flush(self, bills, notifications, chunk_size):
+        """Write one chunk of reminder results"""
+        if bills:
+            Bill.objects.bulk_update(
+                bills, ['reminder_sent', 'last_reminder_date', 'updated_at'], batch_size=chunk_size
             )
-            return False
+        if notifications:
+            Notification.objects.bulk_create(notifications, batch_size=chunk_size)
+            publish_notifications(notifications)
+        # bulk_update/bulk_create skip the signals that invalidate cached responses
+        bump_data_version(*(bill.user_id for bill in bills), *(n.user_id for n in notifications))
+
+    def write_timings(self):
+        """Print the time spent in each phase of the run"""
+        total = sum(self.timings.values())
+        self.stdout.write("Phase timings:")
+        for name in ('recurrences', 'preferences', 'select', 'render', 'send', 'write'):
+            self.stdout.write(f"  {name:<12} {self.timings[name]:8.3f}s")
+        self.stdout.write(f"  {'total':<12} {total:8.3f}s")
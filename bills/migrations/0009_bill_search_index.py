@@ -0,0 +1,85 @@
+from django.db import DatabaseError, migrations
+
+
+# Frozen copies of what bills.search built when this migration was written;
+# later changes to the models or to bills.search must not change it
+SQLITE_TABLE = 'bills_bill_fts'
+POSTGRES_TABLE = 'bills_bill_search'
+CATEGORY_LABELS = [
+    ('utilities', 'Utilities'),
+    ('electricity', 'Electricity'),
+    ('water', 'Water'),
+    ('internet', 'Internet'),
+    ('rent', 'Rent'),
+    ('insurance', 'Insurance'),
+    ('subscription', 'Subscription'),
+    ('phone', 'Phone'),
+    ('transportation', 'Transportation'),
+    ('food', 'Food & Grocery'),
+    ('healthcare', 'Healthcare'),
+    ('education', 'Education'),
+    ('entertainment', 'Entertainment'),
+    ('other', 'Other'),
+]
+CATEGORY_SQL = f"CASE b.category {' '.join('WHEN %s THEN %s' for _ in CATEGORY_LABELS)} ELSE b.category END"
+CATEGORY_PARAMS = [value for choice in CATEGORY_LABELS for value in choice]
+SOURCE = "FROM bills_bill b LEFT JOIN bills_paymentmethod pm ON pm.id = b.payment_method_id"
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        try:
+            schema_editor.execute(
+                f"CREATE VIRTUAL TABLE {SQLITE_TABLE} USING fts5("
+                "name, notes, category, payment_method, owner, "
+                "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+            )
+        except DatabaseError:
+            # SQLite without FTS5: searches use the icontains fallback
+            return
+        schema_editor.execute(
+            f"INSERT INTO {SQLITE_TABLE} (rowid, name, notes, category, payment_method, owner) "
+            f"SELECT b.id, b.name, COALESCE(b.notes, ''), {CATEGORY_SQL}, COALESCE(pm.name, ''), "
+            f"'u' || b.user_id {SOURCE}",
+            CATEGORY_PARAMS,
+        )
+    elif vendor == 'postgresql':
+        schema_editor.execute(
+            f"CREATE TABLE {POSTGRES_TABLE} ("
+            "bill_id bigint PRIMARY KEY REFERENCES bills_bill (id) ON DELETE CASCADE, "
+            "user_id bigint NOT NULL, "
+            "document tsvector NOT NULL)"
+        )
+        schema_editor.execute(f"CREATE INDEX {POSTGRES_TABLE}_document_idx ON {POSTGRES_TABLE} USING GIN (document)")
+        schema_editor.execute(f"CREATE INDEX {POSTGRES_TABLE}_user_idx ON {POSTGRES_TABLE} (user_id)")
+        schema_editor.execute(
+            f"INSERT INTO {POSTGRES_TABLE} (bill_id, user_id, document) "
+            "SELECT b.id, b.user_id, "
+            "setweight(to_tsvector('simple', b.name), 'A') || "
+            f"setweight(to_tsvector('simple', {CATEGORY_SQL}), 'B') || "
+            "setweight(to_tsvector('simple', COALESCE(pm.name, '')), 'C') || "
+            "setweight(to_tsvector('simple', COALESCE(b.notes, '')), 'D') "
+            f"{SOURCE}",
+            CATEGORY_PARAMS,
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(f"DROP TABLE IF EXISTS {SQLITE_TABLE}")
+    elif vendor == 'postgresql':
+        schema_editor.execute(f"DROP TABLE IF EXISTS {POSTGRES_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bills', '0008_bill_user_due_id_idx'),
+    ]
+
+    operations = [
+        # FTS5 table on SQLite, tsvector + GIN on Postgres (see bills.search)
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.8 on 2026-10-17 00:43
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+
+def fill_monthly_spend(apps, schema_editor):
+    Bill = apps.get_model('bills', 'Bill')
+    MonthlySpend = apps.get_model('bills', 'MonthlySpend')
+    totals = (
+        Bill.objects.filter(status='paid', payment_date__isnull=False)
+        .annotate(paid_month=TruncMonth('payment_date'))
+        .values('user_id', 'paid_month', 'category')
+        .annotate(total=Sum('amount'), count=Count('id'))
+        .order_by()
+    )
+    MonthlySpend.objects.bulk_create([
+        MonthlySpend(
+            user_id=row['user_id'], month=timezone.localtime(row['paid_month']).date(),
+            category=row['category'], total=row['total'], count=row['count'],
+        )
+        for row in totals
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bills', '0010_job'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlySpend',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('category', models.CharField(choices=[('utilities', 'Utilities'), ('electricity', 'Electricity'), ('water', 'Water'), ('internet', 'Internet'), ('rent', 'Rent'), ('insurance', 'Insurance'), ('subscription', 'Subscription'), ('phone', 'Phone'), ('transportation', 'Transportation'), ('food', 'Food & Grocery'), ('healthcare', 'Healthcare'), ('education', 'Education'), ('entertainment', 'Entertainment'), ('other', 'Other')], max_length=20)),
+                ('total', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('count', models.PositiveIntegerField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_spend', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['month', 'category'],
+                'constraints': [models.UniqueConstraint(fields=('user', 'month', 'category'), name='monthly_spend_user_month_category')],
+            },
+        ),
+        migrations.RunPython(fill_monthly_spend, migrations.RunPython.noop),
+    ]
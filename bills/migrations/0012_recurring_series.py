@@ -0,0 +1,63 @@
+# Generated by Django 5.2.8 on 2026-10-17 00:54
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bills', '0011_monthlyspend'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecurringSeries',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('category', models.CharField(blank=True, choices=[('utilities', 'Utilities'), ('electricity', 'Electricity'), ('water', 'Water'), ('internet', 'Internet'), ('rent', 'Rent'), ('insurance', 'Insurance'), ('subscription', 'Subscription'), ('phone', 'Phone'), ('transportation', 'Transportation'), ('food', 'Food & Grocery'), ('healthcare', 'Healthcare'), ('education', 'Education'), ('entertainment', 'Entertainment'), ('other', 'Other')], default='other', max_length=50)),
+                ('notes', models.TextField(blank=True, null=True)),
+                ('frequency', models.CharField(choices=[('weekly', 'Weekly'), ('monthly', 'Monthly'), ('yearly', 'Yearly')], max_length=20)),
+                ('anchor', models.DateTimeField()),
+                ('anchor_index', models.PositiveIntegerField(default=0)),
+                ('is_active', models.BooleanField(default=True)),
+                ('materialized_until', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('payment_method', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='bills.paymentmethod')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recurring_series', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'Recurring series',
+            },
+        ),
+        migrations.CreateModel(
+            name='RecurrenceOccurrence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.PositiveIntegerField()),
+                ('due_date', models.DateTimeField()),
+                ('skipped', models.BooleanField(default=False)),
+                ('bill', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='occurrence', to='bills.bill')),
+                ('series', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='occurrences', to='bills.recurringseries')),
+            ],
+            options={
+                'ordering': ['series', 'index'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='recurringseries',
+            index=models.Index(fields=['is_active', 'materialized_until'], name='series_active_until_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recurrenceoccurrence',
+            index=models.Index(condition=models.Q(('bill__isnull', True)), fields=['due_date'], name='occurrence_open_due_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='recurrenceoccurrence',
+            constraint=models.UniqueConstraint(fields=('series', 'index'), name='occurrence_series_index'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.8 on 2026-10-17 01:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bills', '0013_profilerun'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='job',
+            name='result_path',
+        ),
+        migrations.AddField(
+            model_name='job',
+            name='result_data',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+    ]
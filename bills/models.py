@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models.functions import Cast, Coalesce, Floor, Greatest, Least
 from django.conf import settings
 from django.utils import timezone
 from datetime import timedelta
@@ -153,6 +154,20 @@ class Bill(models.Model):
         ordering = ['due_date']
         verbose_name = 'Bill'
         verbose_name_plural = 'Bills'
+        indexes = [
+            # Lists, dashboard and notifications: user + status + due date range
+            models.Index(fields=['user', 'status', 'due_date'], name='bill_user_status_due_idx'),
+            # Keyset pagination over all of a user's bills (bills.pagination)
+            models.Index(fields=['user', 'due_date', 'id'], name='bill_user_due_id_idx'),
+            # Analytics and budgets: paid bills by payment date
+            models.Index(fields=['user', 'status', 'payment_date'], name='bill_user_status_paid_idx'),
+            # send_reminders scans pending bills across all users by due date
+            models.Index(
+                fields=['due_date'],
+                name='bill_pending_due_idx',
+                condition=models.Q(status='pending'),
+            ),
+        ]
     
     def __str__(self):
         return f"{self.name} - ₱{self.amount}"
@@ -188,18 +203,12 @@ class Bill(models.Model):
         return self.receipt_image
     
     def get_next_due_date(self):
-        """Calculate next due date based on recurrence frequency"""
-        if self.recurrence_frequency == 'weekly':
-            return self.due_date + timedelta(weeks=1)
-        elif self.recurrence_frequency == 'biweekly':
-            return self.due_date + timedelta(weeks=2)
-        elif self.recurrence_frequency == 'monthly':
-            return self.due_date + timedelta(days=30)
-        elif self.recurrence_frequency == 'quarterly':
-            return self.due_date + timedelta(days=90)
-        elif self.recurrence_frequency == 'yearly':
-            return self.due_date + timedelta(days=365)
-        return None
+        """Next due date by calendar (same day next week, month or year; month ends are clamped)"""
+        from .recurrence import nth_occurrence, is_recurring
+        
+        if not is_recurring(self):
+            return None
+        return nth_occurrence(self.due_date, self.recurrence_frequency, 1)
 
 
 class BillAttachment(models.Model):
@@ -218,6 +227,100 @@ class BillAttachment(models.Model):
         super().save(*args, **kwargs)
 
 
+class RecurringSeries(models.Model):
+    """
+    A repeating bill. Occurrence ``n`` falls ``n - anchor_index`` steps of
+    ``frequency`` after ``anchor``; upcoming ones are stored as
+    ``RecurrenceOccurrence`` rows (see bills.recurrence).
+    """
+    FREQUENCY_CHOICES = [choice for choice in Bill.RECURRENCE_CHOICES if choice[0] != 'none']
+    
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='recurring_series')
+    name = models.CharField(max_length=200)
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    category = models.CharField(max_length=50, choices=Bill.CATEGORY_CHOICES, default='other', blank=True)
+    notes = models.TextField(blank=True, null=True)
+    payment_method = models.ForeignKey(PaymentMethod, on_delete=models.SET_NULL, null=True, blank=True)
+    frequency = models.CharField(max_length=20, choices=FREQUENCY_CHOICES)
+    anchor = models.DateTimeField()
+    anchor_index = models.PositiveIntegerField(default=0)
+    is_active = models.BooleanField(default=True)
+    # Occurrences exist up to here; materialize_recurrences extends it
+    materialized_until = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name_plural = 'Recurring series'
+        indexes = [
+            models.Index(fields=['is_active', 'materialized_until'], name='series_active_until_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.name} ({self.get_frequency_display()})"
+
+
+class RecurrenceOccurrence(models.Model):
+    """One due date of a series, with the bill created for it once it is due or the previous one is paid"""
+    series = models.ForeignKey(RecurringSeries, on_delete=models.CASCADE, related_name='occurrences')
+    index = models.PositiveIntegerField()
+    due_date = models.DateTimeField()
+    bill = models.OneToOneField(Bill, on_delete=models.SET_NULL, null=True, blank=True, related_name='occurrence')
+    # The user deleted this occurrence's bill; no bill is created for it again
+    skipped = models.BooleanField(default=False)
+    
+    class Meta:
+        ordering = ['series', 'index']
+        constraints = [
+            models.UniqueConstraint(fields=['series', 'index'], name='occurrence_series_index'),
+        ]
+        indexes = [
+            # Calendar windows and bill creation ahead of the due date
+            models.Index(fields=['due_date'], name='occurrence_open_due_idx', condition=models.Q(bill__isnull=True)),
+        ]
+    
+    def __str__(self):
+        return f"{self.series.name} #{self.index} on {self.due_date:%Y-%m-%d}"
+
+
+class BudgetQuerySet(models.QuerySet):
+    def with_spent(self, month=None):
+        """
+        Annotate ``spent``, ``remaining_amount`` and ``percentage`` for the month
+        containing ``month`` (default: now), using one grouped subquery so a list
+        of budgets costs a single query.
+        """
+        month = month or timezone.now()
+        start = month.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        end = (start + timedelta(days=32)).replace(day=1)
+        
+        spent = Bill.objects.filter(
+            user=models.OuterRef('user'),
+            category=models.OuterRef('category'),
+            status='paid',
+            payment_date__gte=start,
+            payment_date__lt=end,
+        ).values('category').annotate(total=models.Sum('amount')).values('total')
+        
+        decimal = models.DecimalField(max_digits=12, decimal_places=2)
+        zero = models.Value(0, output_field=decimal)
+        return self.annotate(
+            spent=Coalesce(models.Subquery(spent, output_field=decimal), zero),
+        ).annotate(
+            remaining_amount=Greatest(models.F('monthly_limit') - models.F('spent'), zero, output_field=decimal),
+            percentage=models.Case(
+                models.When(
+                    monthly_limit__gt=0,
+                    then=Least(
+                        Cast(Floor(models.F('spent') * 100 / models.F('monthly_limit')), models.IntegerField()),
+                        models.Value(100),
+                    ),
+                ),
+                default=models.Value(0),
+                output_field=models.IntegerField(),
+            ),
+        )
+
+
 class Budget(models.Model):
     """Monthly budget goals per category"""
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='budgets')
@@ -226,6 +329,8 @@ class Budget(models.Model):
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
+    objects = BudgetQuerySet.as_manager()
+    
     class Meta:
         unique_together = ['user', 'category']
     
@@ -234,6 +339,10 @@ class Budget(models.Model):
     
     def get_spent_this_month(self):
         """Calculate how much spent in this category this month"""
+        # Already annotated by Budget.objects.with_spent()
+        if hasattr(self, 'spent'):
+            return self.spent
+        
         now = timezone.now()
         start_of_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
         
@@ -246,6 +355,8 @@ class Budget(models.Model):
     
     @property
     def percentage_used(self):
+        if hasattr(self, 'percentage'):
+            return self.percentage
         spent = self.get_spent_this_month()
         if self.monthly_limit > 0:
             return min(100, int((spent / self.monthly_limit) * 100))
@@ -253,9 +364,53 @@ class Budget(models.Model):
     
     @property
     def remaining(self):
+        if hasattr(self, 'remaining_amount'):
+            return self.remaining_amount
         return max(0, self.monthly_limit - self.get_spent_this_month())
 
 
+class UserBillSummary(models.Model):
+    """Denormalized per-user bill counts for the dashboard (see bills.summaries)"""
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='bill_summary')
+    total_count = models.PositiveIntegerField(default=0)
+    pending_count = models.PositiveIntegerField(default=0)
+    paid_count = models.PositiveIntegerField(default=0)
+    overdue_count = models.PositiveIntegerField(default=0)
+    due_soon_count = models.PositiveIntegerField(default=0)
+    paid_this_month = models.PositiveIntegerField(default=0)
+    next_due_date = models.DateTimeField(null=True, blank=True)
+    
+    # Counts depend on the clock; the row must be recomputed once this passes
+    valid_until = models.DateTimeField(db_index=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"Bill summary for {self.user}"
+    
+    @property
+    def is_stale(self):
+        return timezone.now() >= self.valid_until
+
+
+class MonthlySpend(models.Model):
+    """Paid bill totals per user, calendar month and category (see bills.spending)"""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='monthly_spend')
+    # First day of the month, in the site time zone
+    month = models.DateField()
+    category = models.CharField(max_length=20, choices=Bill.CATEGORY_CHOICES)
+    total = models.DecimalField(max_digits=14, decimal_places=2)
+    count = models.PositiveIntegerField()
+    
+    class Meta:
+        ordering = ['month', 'category']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'month', 'category'], name='monthly_spend_user_month_category'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user} {self.month:%b %Y} {self.category}: {self.total}"
+
+
 class Notification(models.Model):
     NOTIFICATION_TYPES = [
         ('overdue', 'Overdue Bill'),
@@ -276,6 +431,12 @@ class Notification(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'is_read'], name='notif_user_read_idx'),
+            models.Index(fields=['user', '-created_at'], name='notif_user_created_idx'),
+            # Duplicate checks in generate_notifications
+            models.Index(fields=['user', 'bill', 'notification_type'], name='notif_user_bill_type_idx'),
+        ]
     
     def __str__(self):
         return f"{self.title} - {self.user.email}"
@@ -304,4 +465,89 @@ class Notification(models.Model):
             'budget': 'warning',
             'info': 'primary',
         }
-        return colors.get(self.notification_type, 'secondary')
\ No newline at end of file
+        return colors.get(self.notification_type, 'secondary')
+
+
+class Job(models.Model):
+    """A unit of background work run by ``manage.py run_worker`` (see bills.jobs)"""
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+    
+    KIND_CHOICES = [
+        ('export_csv', 'CSV export'),
+        ('export_pdf', 'PDF report'),
+        ('command', 'Management command'),
+    ]
+    
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True, related_name='jobs')
+    kind = models.CharField(max_length=50, choices=KIND_CHOICES)
+    params = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    
+    # Scheduling and retries
+    run_after = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    worker = models.CharField(max_length=100, blank=True)
+    
+    # Outcome
+    result = models.JSONField(default=dict, blank=True)
+    # The file produced for download, if any
+    result_data = models.BinaryField(null=True, blank=True)
+    result_filename = models.CharField(max_length=255, blank=True)
+    error = models.TextField(blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            # Workers claim queued jobs in run_after order
+            models.Index(fields=['status', 'run_after'], name='job_status_run_after_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_kind_display()} #{self.pk} ({self.status})"
+    
+    @property
+    def has_result(self):
+        return self.status == 'done' and bool(self.result_filename)
+    
+    @property
+    def result_content_type(self):
+        import mimetypes
+        return mimetypes.guess_type(self.result_filename)[0] or 'application/octet-stream'
+
+
+class ProfileRun(models.Model):
+    """One request run under cProfile on a staff-signed profiling token (see bills.profiling)"""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='profile_runs')
+    requested_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=2000)
+    url_name = models.CharField(max_length=200, blank=True)
+    status_code = models.PositiveSmallIntegerField()
+    
+    duration_ms = models.FloatField()
+    query_count = models.PositiveIntegerField()
+    db_ms = models.FloatField()
+    # pstats report, slowest cumulative first
+    stats = models.TextField()
+    # marshal-dumped pstats data, loadable with pstats / snakeviz
+    raw_stats = models.BinaryField()
+    # [{'sql', 'params', 'ms'}] in execution order
+    queries = models.JSONField(default=list, blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.method} {self.path} ({self.duration_ms:.0f}ms)"
@@ -0,0 +1,105 @@
+"""
+Overdue / due-soon notification generation.
+
+``generate_notifications`` runs on every notifications poll, so it is built to
+do as little as possible:
+
+* New notifications are found with one query per type that anti-joins against
+  existing notifications of that type, and inserted with one ``bulk_create``.
+* After a run, the earliest moment any pending bill can next cross a
+  threshold (become due soon, or overdue at the next UTC midnight) is cached
+  per user as a watermark. Polls before that moment return without touching
+  the database. Saving or deleting a bill clears the watermark
+  (see ``bills.signals``). With several worker processes this needs a shared
+  cache backend, otherwise a worker may keep an outdated watermark until it
+  expires.
+"""
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db.models import Exists, Min, OuterRef, Q
+from django.utils import timezone
+
+from .caching import bump_data_version
+from .events import publish_notifications
+from .models import Bill, Notification
+
+
+DUE_SOON_WINDOW = timedelta(days=3)
+# Upper bound on how long a watermark is trusted, even with no upcoming bills
+MAX_WATERMARK_AGE = timedelta(hours=12)
+
+
+def watermark_key(user_id):
+    return f'bills:notifications:next-check:{user_id}'
+
+
+def invalidate_watermark(user_id):
+    cache.delete(watermark_key(user_id))
+
+
+def _missing(bills, notification_type):
+    """``bills`` that do not yet have a notification of ``notification_type``"""
+    return bills.exclude(Exists(Notification.objects.filter(
+        bill=OuterRef('pk'),
+        user=OuterRef('user'),
+        notification_type=notification_type,
+    )))
+
+
+def generate_notifications(user):
+    """Generate notifications for overdue and due soon bills"""
+    now = timezone.now()
+    key = watermark_key(user.pk)
+    next_check = cache.get(key)
+    if next_check is not None and now < next_check:
+        return []
+
+    # Same rules as Bill.is_overdue / Bill.is_due_soon
+    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    pending = Bill.objects.filter(user=user, status='pending')
+    overdue = _missing(pending.filter(due_date__lt=today_start), 'overdue')
+    due_soon = _missing(pending.filter(due_date__gte=now, due_date__lte=now + DUE_SOON_WINDOW), 'due_soon')
+
+    new_notifications = [
+        Notification(
+            user=user,
+            bill=bill,
+            title='Overdue Bill',
+            message=f'"{bill.name}" was due on {bill.due_date.strftime("%b %d, %Y at %I:%M %p")}. Amount:\u00A0₱{bill.amount}',
+            notification_type='overdue'
+        )
+        for bill in overdue
+    ] + [
+        Notification(
+            user=user,
+            bill=bill,
+            title='Bill Due Soon',
+            message=f'"{bill.name}" is due on {bill.due_date.strftime("%b %d, %Y at %I:%M %p")}. Amount:\u00A0₱{bill.amount}',
+            notification_type='due_soon'
+        )
+        for bill in due_soon
+    ]
+    if new_notifications:
+        Notification.objects.bulk_create(new_notifications)
+        bump_data_version(user.pk)
+        publish_notifications(new_notifications)
+
+    cache.set(key, next_transition(pending, now, today_start), MAX_WATERMARK_AGE.total_seconds())
+    return new_notifications
+
+
+def next_transition(pending, now, today_start):
+    """Earliest time after ``now`` at which a pending bill becomes due soon or overdue"""
+    upcoming = pending.aggregate(
+        next_due_soon=Min('due_date', filter=Q(due_date__gt=now + DUE_SOON_WINDOW)),
+        next_overdue=Min('due_date', filter=Q(due_date__gte=today_start)),
+    )
+    candidates = [now + MAX_WATERMARK_AGE]
+    if upcoming['next_due_soon']:
+        candidates.append(upcoming['next_due_soon'] - DUE_SOON_WINDOW)
+    if upcoming['next_overdue']:
+        # Overdue is a date comparison, so the bill flips at the following midnight
+        due = upcoming['next_overdue']
+        candidates.append(due.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1))
+    return min(candidates)
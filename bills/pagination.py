@@ -0,0 +1,147 @@
+"""
+Keyset (cursor) pagination.
+
+Pages are selected with ``WHERE (field, id) > (last_field, last_id)`` on an
+ordering that always ends in the primary key, instead of ``OFFSET``, so a page
+deep in a user's history costs the same index range scan as the first one and
+rows inserted meanwhile never shift or repeat items. Cursors are opaque,
+URL-safe tokens; one that cannot be decoded raises ``InvalidCursor``.
+
+Results in a computed order (search relevance) have no column to seek on;
+``paginate_ranked`` pages through the list of ranked ids instead, with a
+cursor holding a position in that list and a key for the ranking it came from.
+"""
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class KeysetPage:
+    """One page of results with the cursors for its neighbours (``None`` at either end)"""
+
+    def __init__(self, items, next_cursor=None, previous_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __bool__(self):
+        return bool(self.items)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+def _encode(payload):
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip('=')
+
+
+def encode_cursor(direction, ordering, obj):
+    field = ordering.lstrip('-')
+    value = getattr(obj, field)
+    return _encode([direction, ordering, None if value is None else str(value), obj.pk])
+
+
+def decode_cursor(token, ordering, model):
+    """``(direction, field value, pk)`` from a cursor made for ``ordering``"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        direction, cursor_ordering, value, pk = json.loads(base64.urlsafe_b64decode(padded))
+        field = model._meta.get_field(ordering.lstrip('-'))
+        value, pk = field.to_python(value), int(pk)
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError, ValidationError) as exc:
+        raise InvalidCursor(token) from exc
+    # A cursor from a differently sorted listing would skip or repeat rows
+    if direction not in ('next', 'previous') or cursor_ordering != ordering:
+        raise InvalidCursor(token)
+    return direction, value, pk
+
+
+def _after(ordering, value, pk, forward):
+    """Rows strictly after (``forward``) or before the key ``(value, pk)`` in ``ordering``"""
+    field = ordering.lstrip('-')
+    descending = ordering.startswith('-')
+    lookup = 'lt' if descending == forward else 'gt'
+    return Q(**{f'{field}__{lookup}': value}) | Q(**{field: value, f'pk__{lookup}': pk})
+
+
+def _order_by(ordering, reverse=False):
+    descending = ordering.startswith('-') != reverse
+    field = ordering.lstrip('-')
+    prefix = '-' if descending else ''
+    return (f'{prefix}{field}', f'{prefix}pk')
+
+
+def paginate_keyset(queryset, ordering='due_date', cursor=None, page_size=25):
+    """
+    Page of ``queryset`` ordered by ``ordering`` (a field name, ``-`` for
+    descending) and then by primary key in the same direction.
+    """
+    direction = 'next'
+    if cursor:
+        direction, value, pk = decode_cursor(cursor, ordering, queryset.model)
+        queryset = queryset.filter(_after(ordering, value, pk, forward=direction == 'next'))
+
+    forward = direction == 'next'
+    # One extra row tells whether there is anything beyond this page
+    rows = list(queryset.order_by(*_order_by(ordering, reverse=not forward))[:page_size + 1])
+    has_more = len(rows) > page_size
+    items = rows[:page_size]
+    if not forward:
+        items.reverse()
+    if not items:
+        return KeysetPage(items)
+
+    # Coming from a cursor means there is a page back the way we came
+    has_next = has_more if forward else bool(cursor)
+    has_previous = bool(cursor) if forward else has_more
+    return KeysetPage(
+        items,
+        next_cursor=encode_cursor('next', ordering, items[-1]) if has_next else None,
+        previous_cursor=encode_cursor('previous', ordering, items[0]) if has_previous else None,
+    )
+
+
+def paginate_ranked(queryset, ranked_ids, key, cursor=None, page_size=25):
+    """
+    Page of ``queryset`` in the order of ``ranked_ids``. ``key`` identifies
+    the ranking (query and filters); a cursor made for another key is rejected.
+    """
+    start = 0
+    if cursor:
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            kind, cursor_key, start = json.loads(base64.urlsafe_b64decode(padded))
+            start = int(start)
+        except (binascii.Error, UnicodeDecodeError, TypeError, ValueError) as exc:
+            raise InvalidCursor(cursor) from exc
+        if kind != 'ranked' or cursor_key != key or start < 0:
+            raise InvalidCursor(cursor)
+
+    matching = set(queryset.filter(pk__in=ranked_ids).values_list('pk', flat=True))
+    ordered = [pk for pk in ranked_ids if pk in matching]
+    page_ids = ordered[start:start + page_size]
+    rows = queryset.in_bulk(page_ids)
+    end = start + page_size
+    return KeysetPage(
+        [rows[pk] for pk in page_ids if pk in rows],
+        next_cursor=_encode(['ranked', key, end]) if end < len(ordered) else None,
+        previous_cursor=_encode(['ranked', key, max(start - page_size, 0)]) if start > 0 else None,
+    )
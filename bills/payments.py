@@ -0,0 +1,119 @@
+"""
+Marking bills as paid.
+
+``pay_bills`` pays any number of a user's bills in one transaction with a
+fixed number of queries: the pending bills are locked with
+``select_for_update`` and flipped with one ``UPDATE``; their overdue/due-soon
+notifications are deleted, and the payment confirmations and the bills for
+the next occurrences of recurring bills (``recurrence.next_bills``) are
+inserted, with one statement each. Bills that are already paid are skipped,
+and an occurrence never gets a second bill, so paying twice changes nothing.
+
+``update()`` and ``bulk_create`` bypass the model signals, so the derived
+data they maintain (summary row, monthly spend, search index, cached
+responses) is brought up to date once per call instead of once per bill
+(``signals.bills_written_in_bulk``).
+
+Clients can also send an idempotency key: ``claim_idempotency_key`` records
+it in the cache for ``IDEMPOTENCY_TIMEOUT`` and later requests with the same
+key get the stored result back instead of being processed.
+"""
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from . import recurrence, spending
+from .events import publish_notifications
+from .models import Bill, Notification
+from .signals import bills_written_in_bulk
+
+
+IDEMPOTENCY_TIMEOUT = 24 * 60 * 60
+MAX_BULK_PAYMENT = 200
+IN_PROGRESS = 'in-progress'
+
+
+class PaymentResult:
+    def __init__(self, paid=(), skipped=(), next_bills=()):
+        self.paid = list(paid)
+        self.skipped = list(skipped)
+        self.next_bills = list(next_bills)
+
+    def as_dict(self):
+        return {
+            'paid': [bill.pk for bill in self.paid],
+            'skipped': self.skipped,
+            'next_bills': [
+                {'id': bill.pk, 'name': bill.name, 'due_date': bill.due_date.isoformat()} for bill in self.next_bills
+            ],
+        }
+
+
+def pay_bills(user, bill_ids, now=None):
+    """Mark ``user``'s pending bills among ``bill_ids`` as paid"""
+    now = now or timezone.now()
+    bill_ids = list(dict.fromkeys(bill_ids))
+    with transaction.atomic():
+        bills = list(
+            Bill.objects.select_for_update()
+            .filter(user=user, pk__in=bill_ids, status='pending')
+            .order_by('pk')
+        )
+        paid_ids = [bill.pk for bill in bills]
+        if not bills:
+            return PaymentResult(skipped=bill_ids)
+
+        Bill.objects.filter(pk__in=paid_ids).update(status='paid', payment_date=now, updated_at=now)
+        for bill in bills:
+            bill.status, bill.payment_date, bill.updated_at = 'paid', now, now
+
+        # Remove overdue/due_soon notifications for these bills
+        Notification.objects.filter(
+            user=user, bill_id__in=paid_ids, notification_type__in=['overdue', 'due_soon']
+        ).delete()
+        confirmations = Notification.objects.bulk_create([
+            Notification(
+                user=user,
+                bill=bill,
+                title='Payment Confirmed',
+                message=f'You have successfully paid "{bill.name}". Amount:\u00A0₱{bill.amount}',
+                notification_type='payment'
+            )
+            for bill in bills
+        ])
+        next_bills = recurrence.next_bills(bills, now)
+
+        bills_written_in_bulk(
+            user.pk, created_ids=[bill.pk for bill in next_bills], months={spending.month_of(now)}, now=now
+        )
+        transaction.on_commit(lambda: publish_notifications(confirmations))
+
+    paid_ids = set(paid_ids)
+    return PaymentResult(bills, [pk for pk in bill_ids if pk not in paid_ids], next_bills)
+
+
+# ---- idempotency keys ----------------------------------------------------
+
+def _idempotency_cache_key(user_id, key):
+    return f'bills:payments:idempotency:{user_id}:{key}'
+
+
+def claim_idempotency_key(user_id, key):
+    """
+    ``None`` if ``key`` is new (it is then reserved for this request), or
+    whatever ``store_idempotent_result`` saved for it: the earlier result, or
+    ``IN_PROGRESS`` while the first request is still running.
+    """
+    cache_key = _idempotency_cache_key(user_id, key)
+    if cache.add(cache_key, IN_PROGRESS, IDEMPOTENCY_TIMEOUT):
+        return None
+    return cache.get(cache_key, IN_PROGRESS)
+
+
+def store_idempotent_result(user_id, key, result):
+    cache.set(_idempotency_cache_key(user_id, key), result, IDEMPOTENCY_TIMEOUT)
+
+
+def release_idempotency_key(user_id, key):
+    """Forget ``key`` after a failed attempt, so it can be retried"""
+    cache.delete(_idempotency_cache_key(user_id, key))
@@ -0,0 +1,155 @@
+"""
+Minimal streaming PDF writer.
+
+Enough of PDF 1.4 for text reports: pages of text, lines and filled
+rectangles in the standard Helvetica fonts, so no font files or third-party
+packages are needed. Each page is compressed and written to the output as
+soon as it is finished; only the byte offsets of the written objects are kept
+until ``close()`` writes the cross-reference table, so memory does not grow
+with the page count.
+
+Text is encoded as WinAnsi (cp1252); characters outside it print as ``?``.
+"""
+import zlib
+
+from django.utils import timezone
+
+
+A4 = (595.28, 841.89)
+
+FONTS = {
+    'regular': 'Helvetica',
+    'bold': 'Helvetica-Bold',
+}
+
+
+def _escape(text):
+    encoded = str(text).encode('cp1252', errors='replace')
+    return encoded.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)')
+
+
+def _number(value):
+    return f'{value:.3f}'.rstrip('0').rstrip('.').encode()
+
+
+def hex_to_rgb(color):
+    color = color.lstrip('#')
+    return tuple(int(color[i:i + 2], 16) / 255 for i in (0, 2, 4))
+
+
+class Page:
+    """Drawing operations for one page; coordinates are points from the bottom-left corner"""
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self._ops = []
+
+    def text(self, x, y, text, size=10, font='regular', color=None):
+        color_op = b'%s %s %s rg ' % tuple(_number(c) for c in hex_to_rgb(color)) if color else b''
+        self._ops.append(
+            b'BT %s/F%d %s Tf %s %s Td (%s) Tj ET' % (
+                color_op, list(FONTS).index(font) + 1, _number(size), _number(x), _number(y), _escape(text),
+            )
+        )
+
+    def line(self, x1, y1, x2, y2, width=0.5, color='#dddddd'):
+        self._ops.append(b'%s %s %s RG %s w %s %s m %s %s l S' % (
+            *(_number(c) for c in hex_to_rgb(color)), _number(width),
+            _number(x1), _number(y1), _number(x2), _number(y2),
+        ))
+
+    def rect(self, x, y, width, height, color):
+        self._ops.append(b'%s %s %s rg %s %s %s %s re f' % (
+            *(_number(c) for c in hex_to_rgb(color)),
+            _number(x), _number(y), _number(width), _number(height),
+        ))
+
+    def content(self):
+        return b'\n'.join(self._ops)
+
+
+class PDFWriter:
+    """
+    Writes a PDF to the binary file object ``stream`` one page at a time::
+
+        writer = PDFWriter(stream, title='Report')
+        page = writer.new_page()
+        page.text(40, 800, 'Hello')
+        writer.add_page(page)
+        writer.close()
+    """
+
+    CATALOG, PAGES = 1, 2
+
+    def __init__(self, stream, page_size=A4, title=''):
+        self.stream = stream
+        self.page_size = page_size
+        self.title = title
+        self._offsets = {}
+        self._position = 0
+        self._next_id = 3
+        self._page_ids = []
+        self._font_ids = {name: self._allocate() for name in FONTS}
+        self._write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+
+    def _allocate(self):
+        obj_id = self._next_id
+        self._next_id += 1
+        return obj_id
+
+    def _write(self, data):
+        self.stream.write(data)
+        self._position += len(data)
+
+    def _object(self, obj_id, body, stream=None):
+        self._offsets[obj_id] = self._position
+        self._write(b'%d 0 obj\n' % obj_id + body)
+        if stream is not None:
+            self._write(b'\nstream\n' + stream + b'\nendstream')
+        self._write(b'\nendobj\n')
+
+    def new_page(self):
+        return Page(*self.page_size)
+
+    def add_page(self, page):
+        data = zlib.compress(page.content())
+        content_id = self._allocate()
+        self._object(content_id, b'<< /Length %d /Filter /FlateDecode >>' % len(data), stream=data)
+
+        fonts = b' '.join(b'/F%d %d 0 R' % (i + 1, self._font_ids[name]) for i, name in enumerate(FONTS))
+        page_id = self._allocate()
+        self._object(page_id, (
+            b'<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %s %s] '
+            b'/Resources << /Font << %s >> >> /Contents %d 0 R >>'
+        ) % (self.PAGES, _number(page.width), _number(page.height), fonts, content_id))
+        self._page_ids.append(page_id)
+
+    @property
+    def page_count(self):
+        return len(self._page_ids)
+
+    def close(self):
+        if not self._page_ids:
+            self.add_page(self.new_page())
+
+        for name, font_id in self._font_ids.items():
+            self._object(font_id, b'<< /Type /Font /Subtype /Type1 /BaseFont /%s /Encoding /WinAnsiEncoding >>' % (
+                FONTS[name].encode(),
+            ))
+        kids = b' '.join(b'%d 0 R' % page_id for page_id in self._page_ids)
+        self._object(self.PAGES, b'<< /Type /Pages /Kids [%s] /Count %d >>' % (kids, len(self._page_ids)))
+        self._object(self.CATALOG, b'<< /Type /Catalog /Pages %d 0 R >>' % self.PAGES)
+        info_id = self._allocate()
+        created = timezone.now().strftime('D:%Y%m%d%H%M%SZ').encode()
+        self._object(info_id, b'<< /Title (%s) /Producer (Bill Payment Reminder) /CreationDate (%s) >>' % (
+            _escape(self.title), created,
+        ))
+
+        xref = self._position
+        self._write(b'xref\n0 %d\n0000000000 65535 f \n' % self._next_id)
+        for obj_id in range(1, self._next_id):
+            self._write(b'%010d 00000 n \n' % self._offsets[obj_id])
+        self._write(b'trailer\n<< /Size %d /Root %d 0 R /Info %d 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (
+            self._next_id, self.CATALOG, info_id, xref,
+        ))
@@ -0,0 +1,155 @@
+"""
+On-demand profiling of single requests in production.
+
+Staff issue a signed token from ``admin-panel/profiles/`` (``issue_token``).
+A request that carries it, as ``?_profile=<token>`` or an
+``X-Profile-Token`` header, is run by ``ProfilingMiddleware`` under
+``cProfile`` with its SQL captured by a ``QueryRecorder``, and saved as a
+``ProfileRun``: the top of the cumulative-time report, the raw stats (a
+``.prof`` file for snakeviz or ``pstats``) and the first
+``MAX_CAPTURED_QUERIES`` queries with their parameters and timings. The
+response gets an ``X-Profile-Run`` header with the run's id.
+
+A token names the user whose requests it may profile (by default the staff
+member who issued it) and is honoured only for that user's authenticated
+requests, only while the issuer is still active staff, and only for
+``settings.PROFILING_TOKEN_MAX_AGE`` seconds. Anything else, including a
+malformed or expired token, is ignored and the request runs normally.
+
+Under ASGI the profiled request is run in one worker thread (sync views are
+called on it, as usual), so the profile covers the view code; time spent in
+the event loop itself is not in the stats. Like ``QueryInstrumentationMiddleware``,
+streaming responses are measured up to the point the response is returned.
+"""
+import cProfile
+import io
+import logging
+import marshal
+import pstats
+import time
+
+from asgiref.sync import async_to_sync, iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+
+from .instrumentation import QueryRecorder
+
+
+logger = logging.getLogger(__name__)
+
+SALT = 'bills.profiling'
+QUERY_PARAMETER = '_profile'
+HEADER = 'X-Profile-Token'
+DEFAULT_TOKEN_MAX_AGE = 15 * 60
+MAX_CAPTURED_QUERIES = 500
+# Lines of the cumulative-time report kept in ProfileRun.stats
+STATS_LINES = 80
+
+
+def issue_token(staff, user=None):
+    """A token that profiles ``user``'s requests (``staff``'s own by default)"""
+    return signing.dumps({'by': staff.pk, 'user': (user or staff).pk}, salt=SALT)
+
+
+def _token(request):
+    return request.GET.get(QUERY_PARAMETER) or request.headers.get(HEADER)
+
+
+def authorize(token, user):
+    """The token's payload if it lets ``user``'s request be profiled, else None"""
+    if not user.is_authenticated:
+        return None
+    max_age = getattr(settings, 'PROFILING_TOKEN_MAX_AGE', DEFAULT_TOKEN_MAX_AGE)
+    try:
+        grant = signing.loads(token, salt=SALT, max_age=max_age)
+    except signing.BadSignature:
+        logger.info('Ignoring an invalid or expired profiling token')
+        return None
+    if grant.get('user') != user.pk:
+        return None
+    issuer = get_user_model().objects.filter(pk=grant.get('by'), is_active=True, is_staff=True)
+    if not issuer.exists():
+        return None
+    return grant
+
+
+def _format_stats(profiler):
+    out = io.StringIO()
+    stats = pstats.Stats(profiler, stream=out)
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(STATS_LINES)
+    # Same format as pstats.Stats.dump_stats
+    return out.getvalue(), marshal.dumps(stats.stats)
+
+
+def profile(request, grant, get_response):
+    """Run ``get_response`` under cProfile and save a ProfileRun"""
+    from .models import ProfileRun
+
+    profiler = cProfile.Profile()
+    started = time.perf_counter()
+    with QueryRecorder(capture=MAX_CAPTURED_QUERIES) as recorder:
+        profiler.enable()
+        try:
+            response = get_response(request)
+        finally:
+            profiler.disable()
+    elapsed = time.perf_counter() - started
+
+    stats, raw_stats = _format_stats(profiler)
+    match = getattr(request, 'resolver_match', None)
+    run = ProfileRun.objects.create(
+        user_id=grant['user'],
+        requested_by_id=grant['by'],
+        method=request.method,
+        path=request.get_full_path()[:2000],
+        url_name=(match.view_name if match else '') or '',
+        status_code=response.status_code,
+        duration_ms=elapsed * 1000,
+        query_count=recorder.count,
+        db_ms=recorder.duration * 1000,
+        stats=stats,
+        raw_stats=raw_stats,
+        queries=[
+            {'sql': sql, 'params': repr(params), 'ms': round(seconds * 1000, 3)}
+            for sql, params, seconds in recorder.queries
+        ],
+    )
+    logger.info(
+        'Profiled %s %s: %.1fms, %d queries (run %s)', request.method, run.url_name or run.path,
+        run.duration_ms, run.query_count, run.pk,
+        extra={'profile_run': run.pk, 'url_name': run.url_name, 'total_ms': round(run.duration_ms, 2)},
+    )
+    response['X-Profile-Run'] = str(run.pk)
+    return response
+
+
+class ProfilingMiddleware:
+    """Profile requests that carry a valid staff-issued token (sync and async); needs request.user"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _token(request)
+        grant = authorize(token, request.user) if token else None
+        if grant is None:
+            return self.get_response(request)
+        return profile(request, grant, self.get_response)
+
+    async def __acall__(self, request):
+        token = _token(request)
+        if not token:
+            return await self.get_response(request)
+        user = await request.auser()
+        grant = await sync_to_async(authorize)(token, user)
+        if grant is None:
+            return await self.get_response(request)
+        # cProfile only sees the thread it runs in; keep the whole request on one
+        return await sync_to_async(profile)(request, grant, async_to_sync(self.get_response))
@@ -0,0 +1,320 @@
+"""
+Recurring bills.
+
+A recurring bill belongs to a ``RecurringSeries``. Occurrence ``n`` of a
+series is computed directly from its anchor (``anchor + (n - anchor_index)``
+weeks, months or years, in the site time zone, month ends clamped), so dates
+never drift and every caller gets the same dates.
+
+Upcoming occurrences are stored as ``RecurrenceOccurrence`` rows, up to
+``settings.RECURRENCE_HORIZON_DAYS`` ahead:
+
+* ``materialize`` extends series with ``bulk_create``; it runs from
+  ``manage.py materialize_recurrences`` and when a series is created or
+  re-anchored.
+* ``create_due_bills`` gives each open occurrence due within
+  ``settings.RECURRENCE_BILL_LEAD_DAYS`` its ``Bill``, so notifications and
+  ``send_reminders`` (which calls it first) see it even if the previous bill
+  is still unpaid. Paying a bill creates the next occurrence's bill straight
+  away (``next_bills``).
+* The calendar reads real bills and open occurrences (``calendar_items``).
+
+Saving the latest bill of a series updates the series, and re-anchors it if
+its due date or frequency changed (``bill_saved``); turning ``recurring`` off
+stops it. Deleting a bill marks its occurrence skipped, so no bill is created
+for it again.
+"""
+import math
+from datetime import timedelta
+
+from dateutil.relativedelta import relativedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, Max, OuterRef, Subquery
+from django.utils import timezone
+
+from .models import Bill, RecurrenceOccurrence, RecurringSeries
+
+
+MONTH_STEPS = {'monthly': 1, 'yearly': 12}
+WEEK = timedelta(weeks=1)
+SERIES_FIELDS = ['name', 'amount', 'category', 'notes', 'payment_method_id']
+
+
+def is_recurring(bill):
+    return bool(bill.recurring) and bill.recurrence_frequency in ('weekly', *MONTH_STEPS)
+
+
+def horizon():
+    return timedelta(days=settings.RECURRENCE_HORIZON_DAYS)
+
+
+def bill_lead():
+    return timedelta(days=settings.RECURRENCE_BILL_LEAD_DAYS)
+
+
+def nth_occurrence(due_date, frequency, n):
+    """``due_date`` moved ``n`` steps of ``frequency`` (negative ``n`` goes back)"""
+    due_date = timezone.localtime(due_date)
+    if frequency == 'weekly':
+        return due_date + n * WEEK
+    return due_date + relativedelta(months=n * MONTH_STEPS[frequency])
+
+
+def due_date_of(series, index):
+    return nth_occurrence(series.anchor, series.frequency, index - series.anchor_index)
+
+
+def index_on_or_after(series, moment):
+    """Smallest occurrence index due at or after ``moment``"""
+    anchor = timezone.localtime(series.anchor)
+    if series.frequency == 'weekly':
+        steps = math.ceil((moment - anchor) / WEEK)
+    else:
+        moment = timezone.localtime(moment)
+        steps = ((moment.year - anchor.year) * 12 + moment.month - anchor.month) // MONTH_STEPS[series.frequency]
+    index = series.anchor_index + steps
+    # The month estimate may land one step early
+    while due_date_of(series, index) < moment:
+        index += 1
+    return index
+
+
+def bill_from(series, occurrence):
+    """Unsaved bill for ``occurrence``"""
+    return Bill(
+        user_id=series.user_id,
+        due_date=occurrence.due_date,
+        status='pending',
+        recurring=True,
+        recurrence_frequency=series.frequency,
+        **{field: getattr(series, field) for field in SERIES_FIELDS},
+    )
+
+
+def _copy_fields(series, bill):
+    for field in SERIES_FIELDS:
+        setattr(series, field, getattr(bill, field))
+
+
+# ---- series ---------------------------------------------------------------
+
+def start_series(bills, now=None, until=None):
+    """
+    A new series for each recurring bill in ``bills``, with the bill as its
+    occurrence 0, materialized up to ``until``. Returns ``{bill.pk: occurrence}``.
+    """
+    bills = [bill for bill in bills if is_recurring(bill)]
+    if not bills:
+        return {}
+    series_list = []
+    for bill in bills:
+        series = RecurringSeries(user_id=bill.user_id, frequency=bill.recurrence_frequency, anchor=bill.due_date)
+        _copy_fields(series, bill)
+        series_list.append(series)
+    with transaction.atomic():
+        series_list = RecurringSeries.objects.bulk_create(series_list)
+        occurrences = RecurrenceOccurrence.objects.bulk_create([
+            RecurrenceOccurrence(series=series, index=0, due_date=bill.due_date, bill=bill)
+            for series, bill in zip(series_list, bills)
+        ])
+        materialize(series_list, until, now)
+    return {occurrence.bill_id: occurrence for occurrence in occurrences}
+
+
+def adopt_recurring_bills(now=None, until=None):
+    """
+    Start series for recurring bills from before series existed: the latest
+    bill of each name per user, if it is still pending or its next date is ahead.
+    """
+    now = now or timezone.now()
+    bills = Bill.objects.filter(recurring=True, recurrence_frequency__in=['weekly', *MONTH_STEPS]).exclude(
+        Exists(RecurrenceOccurrence.objects.filter(bill=OuterRef('pk')))
+    ).exclude(
+        Exists(Bill.objects.filter(
+            user=OuterRef('user'), name=OuterRef('name'), recurring=True, due_date__gt=OuterRef('due_date'),
+        ))
+    )
+    live = [bill for bill in bills.iterator() if bill.status == 'pending' or bill.get_next_due_date() > now]
+    return len(start_series(live, now, until))
+
+
+def materialize(series_list=None, until=None, now=None):
+    """
+    Store the occurrences of ``series_list`` (default: every active series
+    not yet stored that far) from now up to ``until`` (default: the horizon).
+    """
+    now = now or timezone.now()
+    until = until or now + horizon()
+    if series_list is None:
+        series_list = RecurringSeries.objects.filter(is_active=True).exclude(materialized_until__gte=until)
+    series_list = list(series_list)
+    if not series_list:
+        return 0
+
+    last_index = dict(
+        RecurrenceOccurrence.objects.filter(series__in=series_list)
+        .values('series').annotate(last=Max('index')).values_list('series', 'last')
+    )
+    occurrences = []
+    for series in series_list:
+        # Dates that already passed are not stored; next_bills creates them if a bill catches up
+        index = max(last_index.get(series.pk, series.anchor_index - 1) + 1, index_on_or_after(series, now))
+        while (due_date := due_date_of(series, index)) <= until:
+            occurrences.append(RecurrenceOccurrence(series=series, index=index, due_date=due_date))
+            index += 1
+        series.materialized_until = until
+    with transaction.atomic():
+        RecurrenceOccurrence.objects.bulk_create(occurrences, batch_size=1000, ignore_conflicts=True)
+        RecurringSeries.objects.bulk_update(series_list, ['materialized_until'], batch_size=1000)
+    return len(occurrences)
+
+
+def _bill_occurrences(occurrences):
+    """Create and link the bills of ``occurrences`` (with ``series`` loaded); returns the bills"""
+    if not occurrences:
+        return []
+    bills = Bill.objects.bulk_create([bill_from(occurrence.series, occurrence) for occurrence in occurrences])
+    for occurrence, bill in zip(occurrences, bills):
+        occurrence.bill = bill
+    RecurrenceOccurrence.objects.bulk_update(occurrences, ['bill'], batch_size=1000)
+    return bills
+
+
+def create_due_bills(now=None):
+    """Bills for the open occurrences due within ``RECURRENCE_BILL_LEAD_DAYS``; returns them"""
+    from .signals import bills_written_in_bulk
+
+    now = now or timezone.now()
+    with transaction.atomic():
+        occurrences = list(
+            RecurrenceOccurrence.objects.select_for_update(of=('self',))
+            .filter(bill__isnull=True, skipped=False, series__is_active=True, due_date__lte=now + bill_lead())
+            .select_related('series')
+            .order_by('due_date')
+        )
+        bills = _bill_occurrences(occurrences)
+        by_user = {}
+        for bill in bills:
+            by_user.setdefault(bill.user_id, []).append(bill.pk)
+        for user_id, bill_ids in by_user.items():
+            bills_written_in_bulk(user_id, created_ids=bill_ids, now=now)
+    return bills
+
+
+def next_bills(paid_bills, now=None):
+    """
+    Bills for the occurrence after each paid bill in ``paid_bills``, unless
+    it already has one (created ahead of its due date) or was skipped.
+    Recurring bills without a series start one. Call inside the payment's
+    transaction; the caller syncs derived data for the returned bills.
+    """
+    paid_bills = [bill for bill in paid_bills if is_recurring(bill)]
+    if not paid_bills:
+        return []
+    current = {
+        occurrence.bill_id: occurrence
+        for occurrence in RecurrenceOccurrence.objects.filter(bill__in=paid_bills).select_related('series')
+    }
+    current.update(start_series([bill for bill in paid_bills if bill.pk not in current], now))
+    wanted = {
+        (occurrence.series_id, occurrence.index + 1): occurrence.series
+        for occurrence in current.values() if occurrence.series.is_active
+    }
+    if not wanted:
+        return []
+
+    following = {
+        (occurrence.series_id, occurrence.index): occurrence
+        for occurrence in RecurrenceOccurrence.objects.select_for_update(of=('self',)).filter(
+            series_id__in={series_id for series_id, _ in wanted}, index__in={index for _, index in wanted},
+        )
+    }
+    missing = [
+        RecurrenceOccurrence(series=series, index=index, due_date=due_date_of(series, index))
+        for (series_id, index), series in wanted.items() if (series_id, index) not in following
+    ]
+    opened = RecurrenceOccurrence.objects.bulk_create(missing)
+    for key, series in wanted.items():
+        if key in following:
+            following[key].series = series
+    opened += [
+        occurrence for key, occurrence in following.items()
+        if key in wanted and occurrence.bill_id is None and not occurrence.skipped
+    ]
+    return _bill_occurrences(opened)
+
+
+def bill_saved(bill, created, now=None):
+    """Keep ``bill``'s series in step with an edit of it (``post_save``)"""
+    if created:
+        # Bills created in bulk for occurrences do not send signals
+        start_series([bill], now)
+        return
+    occurrence = RecurrenceOccurrence.objects.filter(bill=bill).select_related('series').first()
+    if occurrence is None:
+        if is_recurring(bill):
+            start_series([bill], now)
+        return
+    series = occurrence.series
+    if RecurrenceOccurrence.objects.filter(series=series, index__gt=occurrence.index, bill__isnull=False).exists():
+        # Only the latest bill of a series edits it
+        return
+
+    later = RecurrenceOccurrence.objects.filter(series=series, index__gt=occurrence.index, bill__isnull=True)
+    if not is_recurring(bill):
+        later.delete()
+        series.is_active = False
+        series.save(update_fields=['is_active'])
+        return
+
+    _copy_fields(series, bill)
+    if bill.due_date == occurrence.due_date and bill.recurrence_frequency == series.frequency:
+        series.save(update_fields=SERIES_FIELDS)
+        return
+    # Re-anchor on the edited bill: its later occurrences move with it
+    later.delete()
+    occurrence.due_date = bill.due_date
+    occurrence.save(update_fields=['due_date'])
+    series.frequency, series.anchor, series.anchor_index = bill.recurrence_frequency, bill.due_date, occurrence.index
+    series.is_active = True
+    series.save()
+    materialize([series], now=now)
+
+
+def bill_deleted(bill):
+    """
+    Called on ``pre_delete`` of a bill. If a later occurrence of its series
+    already has a bill, the deleted bill's occurrence is marked skipped.
+    Otherwise it was the series' latest bill: the series is deactivated and
+    its not-yet-billed future occurrences are deleted.
+    """
+    occurrence = RecurrenceOccurrence.objects.filter(bill=bill).select_related('series').first()
+    if occurrence is None:
+        return
+    series = occurrence.series
+    if RecurrenceOccurrence.objects.filter(series=series, index__gt=occurrence.index, bill__isnull=False).exists():
+        occurrence.skipped = True
+        occurrence.save(update_fields=['skipped'])
+        return
+    RecurrenceOccurrence.objects.filter(series=series, index__gt=occurrence.index, bill__isnull=True).delete()
+    series.is_active = False
+    series.save(update_fields=['is_active'])
+
+
+# ---- calendar -------------------------------------------------------------
+
+def calendar_items(user, start, end):
+    """
+    ``(bills, occurrences)`` for the calendar: ``user``'s bills due in
+    ``[start, end]``, and the stored occurrences in that window that have no
+    bill yet, each with ``series`` and ``latest_bill_id`` (the bill it follows).
+    """
+    bills = Bill.objects.filter(user=user, due_date__range=(start, end)).order_by('due_date', 'pk')
+    latest_bill = RecurrenceOccurrence.objects.filter(
+        series=OuterRef('series'), bill__isnull=False,
+    ).order_by('-index').values('bill')[:1]
+    occurrences = RecurrenceOccurrence.objects.filter(
+        series__user=user, series__is_active=True, bill__isnull=True, skipped=False, due_date__range=(start, end),
+    ).select_related('series').annotate(latest_bill_id=Subquery(latest_bill)).order_by('due_date', 'pk')
+    return list(bills), list(occurrences)
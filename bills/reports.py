@@ -0,0 +1,231 @@
+"""
+Bill exports: streamed CSV, and PDF reports with an on-disk cache.
+
+``filter_bills`` applies the export filters shared by the export views and
+background jobs. ``csv_chunks`` yields CSV text a chunk of rows at a time
+from plain ``values_list`` tuples.
+
+``write_bills_report`` lays rows out a page at a time through
+``bills.pdf.PDFWriter``, reading bills in chunks, so neither the row list nor
+the document is ever held in memory.
+
+``get_bills_report`` keeps finished reports under
+``settings.REPORT_CACHE_DIR/<user id>/``. A file is named after the filters
+it was built with and the version of the matching bills (the latest
+``updated_at`` plus the row count, which also catches deletions), so a repeat
+download is a file read and any change to those bills produces a new file,
+replacing the old one. The cache is per host; each server builds its own copy.
+"""
+import csv
+import hashlib
+import io
+import json
+import os
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from .models import Bill
+from .pdf import PDFWriter
+
+
+# Bump when the layout changes so cached files are rebuilt
+REPORT_LAYOUT_VERSION = 1
+CHUNK_SIZE = 2000
+
+MARGIN = 40
+ROW_HEIGHT = 16
+FONT_SIZE = 9
+# (heading, x, width in points)
+COLUMNS = [
+    ('Bill Name', MARGIN, 190),
+    ('Amount', 235, 85),
+    ('Due Date', 325, 80),
+    ('Status', 410, 60),
+    ('Category', 475, 80),
+]
+PRIMARY = '#2563eb'
+STATUS_COLORS = {'paid': '#16a34a', 'pending': '#d97706'}
+STATUS_LABELS = dict(Bill.STATUS_CHOICES)
+CATEGORY_LABELS = dict(Bill.CATEGORY_CHOICES)
+
+
+EXPORT_FILTERS = ('status', 'from', 'to')
+CSV_HEADER = ['Name', 'Amount', 'Due Date', 'Status', 'Category', 'Payment Date', 'Payment Method', 'Notes']
+
+
+def filter_bills(user, filters):
+    """``user``'s bills narrowed by the export ``filters``, newest due date first"""
+    bills = Bill.objects.filter(user=user)
+    if filters.get('status'):
+        bills = bills.filter(status=filters['status'])
+    if filters.get('from'):
+        bills = bills.filter(due_date__gte=filters['from'])
+    if filters.get('to'):
+        bills = bills.filter(due_date__lte=filters['to'])
+    return bills.order_by('-due_date')
+
+
+# ---- CSV -----------------------------------------------------------------
+
+def _csv_row(values):
+    name, amount, due_date, status, category, payment_date, payment_method, notes = values
+    return [
+        name,
+        amount,
+        due_date.strftime('%Y-%m-%d %H:%M'),
+        STATUS_LABELS.get(status, status),
+        CATEGORY_LABELS.get(category, category),
+        payment_date.strftime('%Y-%m-%d %H:%M') if payment_date else '',
+        payment_method or '',
+        notes or '',
+    ]
+
+
+def csv_chunks(bills):
+    """CSV text for ``bills``, one chunk of ``CHUNK_SIZE`` rows at a time"""
+    # Plain tuples with the payment method joined in: no model instances, no per-row queries
+    rows = bills.values_list(
+        'name', 'amount', 'due_date', 'status', 'category', 'payment_date', 'payment_method__name', 'notes'
+    )
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush():
+        text = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return text
+
+    writer.writerow(CSV_HEADER)
+    yield flush()
+    pending = 0
+    for values in rows.iterator(chunk_size=CHUNK_SIZE):
+        writer.writerow(_csv_row(values))
+        pending += 1
+        if pending == CHUNK_SIZE:
+            yield flush()
+            pending = 0
+    if pending:
+        yield flush()
+
+
+# ---- PDF -----------------------------------------------------------------
+
+def _fit(text, width, size=FONT_SIZE):
+    """Cut ``text`` to roughly fit ``width`` points of Helvetica"""
+    limit = int(width / (size * 0.52))
+    return text if len(text) <= limit else text[:limit - 3] + '...'
+
+
+def _amount(value):
+    # The peso sign is not in the PDF standard fonts' encoding
+    return f'PHP {value:,.2f}'
+
+
+class BillsReportLayout:
+    """Adds rows to the current page and starts a new one when it is full"""
+
+    def __init__(self, writer, generated_at):
+        self.writer = writer
+        self.generated_at = generated_at
+        self.page = None
+        self.y = 0
+
+    def _start_page(self):
+        self.page = self.writer.new_page()
+        top = self.page.height - MARGIN
+        if self.writer.page_count == 0:
+            self.page.text(MARGIN, top - 20, 'Bill Payment Report', size=20, font='bold', color=PRIMARY)
+            self.page.text(MARGIN, top - 40, f"Generated on: {self.generated_at.strftime('%B %d, %Y')}", size=10)
+            top -= 60
+        self.page.rect(MARGIN, top - ROW_HEIGHT - 4, self.page.width - 2 * MARGIN, ROW_HEIGHT + 4, PRIMARY)
+        for heading, x, _ in COLUMNS:
+            self.page.text(x + 4, top - ROW_HEIGHT + 2, heading, size=FONT_SIZE, font='bold', color='#ffffff')
+        self.y = top - ROW_HEIGHT - 4
+
+    def _finish_page(self):
+        self.page.text(self.page.width - MARGIN - 40, MARGIN / 2, f'Page {self.writer.page_count + 1}', size=8,
+                       color='#64748b')
+        self.writer.add_page(self.page)
+        self.page = None
+
+    def _room_for(self, height):
+        if self.page is None:
+            self._start_page()
+        elif self.y - height < MARGIN:
+            self._finish_page()
+            self._start_page()
+
+    def add_row(self, name, amount, due_date, status, category):
+        self._room_for(ROW_HEIGHT)
+        self.y -= ROW_HEIGHT
+        baseline = self.y + 5
+        cells = [
+            (name, None),
+            (_amount(amount), None),
+            (timezone.localtime(due_date).strftime('%b %d, %Y'), None),
+            (STATUS_LABELS.get(status, status), STATUS_COLORS.get(status)),
+            (CATEGORY_LABELS.get(category, category), None),
+        ]
+        for (text, color), (_, x, width) in zip(cells, COLUMNS):
+            self.page.text(x + 4, baseline, _fit(text, width - 8), size=FONT_SIZE, color=color)
+        self.page.line(MARGIN, self.y, self.page.width - MARGIN, self.y)
+
+    def finish(self, count, total):
+        self._room_for(40)
+        self.page.text(MARGIN, self.y - 24, f'Total: {_amount(total)}', size=12, font='bold')
+        self.page.text(MARGIN + 200, self.y - 24, f'{count} bill(s)', size=10, color='#64748b')
+        self._finish_page()
+        self.writer.close()
+
+
+def write_bills_report(stream, bills, generated_at=None):
+    """Write a PDF report of ``bills`` (ordered as given) to the binary file object ``stream``"""
+    writer = PDFWriter(stream, title='Bill Payment Report')
+    layout = BillsReportLayout(writer, generated_at or timezone.localtime())
+    rows = bills.values_list('name', 'amount', 'due_date', 'status', 'category')
+
+    count, total = 0, 0
+    for row in rows.iterator(chunk_size=CHUNK_SIZE):
+        layout.add_row(*row)
+        count += 1
+        total += row[1]
+    layout.finish(count, total)
+
+
+def _digest(value):
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode()).hexdigest()[:20]
+
+
+def get_bills_report(user, bills, filters):
+    """
+    Path of the cached report for ``bills`` (``user``'s bills narrowed by
+    ``filters``), building it first if no current copy exists.
+    """
+    version = bills.aggregate(latest=Max('updated_at'), count=Count('id'))
+    directory = Path(settings.REPORT_CACHE_DIR) / str(user.pk)
+    prefix = _digest(filters)
+    path = directory / f"{prefix}-{_digest([version, REPORT_LAYOUT_VERSION])}.pdf"
+    if path.exists():
+        return path
+
+    directory.mkdir(parents=True, exist_ok=True)
+    # Build under a temporary name so readers never see a partial file
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as stream:
+            write_bills_report(stream, bills)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+    # Earlier versions of the same report are out of date now
+    for stale in directory.glob(f'{prefix}-*.pdf'):
+        if stale != path:
+            stale.unlink(missing_ok=True)
+    return path
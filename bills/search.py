@@ -0,0 +1,280 @@
+"""
+Full-text search over a user's bills.
+
+Each bill has one row in a search table built from its name, notes, category
+label and payment method name:
+
+* SQLite: an FTS5 virtual table (``bills_bill_fts``, rowid = bill id). The
+  owner is stored as a ``u<id>`` token, so the full-text match itself is
+  scoped to one user. Results are ranked with ``bm25``.
+* Postgres: ``bills_bill_search``, a weighted ``tsvector`` per bill behind a
+  GIN index, ranked with ``ts_rank``.
+* Any other backend, or SQLite built without FTS5, falls back to
+  ``icontains`` lookups.
+
+Rows are kept in sync by the receivers in ``bills.signals``; bills written
+with ``bulk_create`` or raw SQL need ``rebuild_search_index``. Every term is
+matched as a prefix so results narrow as the user types. Ranked ids are
+cached per user and query for ``SEARCH_CACHE_TIMEOUT`` seconds, so the
+repeated requests of a debounced search box do not reach the index; the key
+includes the user's data version (``bills.caching``), so any write to their
+bills or payment methods makes them unreachable.
+"""
+import hashlib
+import re
+import time
+
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .caching import get_data_version
+from .models import Bill, PaymentMethod
+
+
+SQLITE_TABLE = 'bills_bill_fts'
+POSTGRES_TABLE = 'bills_bill_search'
+# Ranked matches kept per query, for relevance order; other orders use search_filter
+MAX_RESULTS = 500
+MAX_TERMS = 10
+SEARCH_CACHE_TIMEOUT = 60
+
+TERM_RE = re.compile(r'\w+')
+
+
+def search_terms(query):
+    """Lowercased word terms of ``query``; operators and punctuation are dropped"""
+    return [term.lower() for term in TERM_RE.findall(query or '')][:MAX_TERMS]
+
+
+# ---- schema --------------------------------------------------------------
+# The tables are created, and filled, by migration 0009_bill_search_index.
+
+# alias -> vendor once the search table is found, or the time.monotonic() of
+# the last check that did not find it
+_backends = {}
+# A missing table is looked for again after this many seconds
+BACKEND_RECHECK_SECONDS = 60
+
+
+def get_backend(conn=None):
+    """``'sqlite'`` or ``'postgresql'`` when the search table exists, otherwise ``None``"""
+    conn = conn or connection
+    cached = _backends.get(conn.alias)
+    if isinstance(cached, str):
+        return cached
+    if cached is not None and time.monotonic() - cached < BACKEND_RECHECK_SECONDS:
+        return None
+    table = {'sqlite': SQLITE_TABLE, 'postgresql': POSTGRES_TABLE}.get(conn.vendor)
+    if table is None:
+        return None
+    found = table in conn.introspection.table_names()
+    _backends[conn.alias] = conn.vendor if found else time.monotonic()
+    return conn.vendor if found else None
+
+
+# ---- indexing ------------------------------------------------------------
+
+def _document_columns():
+    """SQL for (name, notes, category label, payment method name) of bill ``b``, plus params"""
+    whens = ' '.join('WHEN %s THEN %s' for _ in Bill.CATEGORY_CHOICES)
+    params = [value for choice in Bill.CATEGORY_CHOICES for value in choice]
+    return (
+        ["b.name", "COALESCE(b.notes, '')", f"CASE b.category {whens} ELSE b.category END", "COALESCE(pm.name, '')"],
+        params,
+    )
+
+
+def _write(where, where_params, conn=None):
+    """(Re)index the bills matched by the SQL condition ``where`` on ``b``"""
+    conn = conn or connection
+    backend = get_backend(conn)
+    if backend is None:
+        return
+    (name, notes, category, method), params = _document_columns()
+    source = (
+        f"FROM {Bill._meta.db_table} b "
+        f"LEFT JOIN {PaymentMethod._meta.db_table} pm ON pm.id = b.payment_method_id "
+        f"WHERE {where}"
+    )
+    params += list(where_params)
+
+    with conn.cursor() as cursor:
+        if backend == 'sqlite':
+            # FTS5 has no upsert; replace the rows
+            cursor.execute(
+                f"DELETE FROM {SQLITE_TABLE} WHERE rowid IN (SELECT b.id FROM {Bill._meta.db_table} b WHERE {where})",
+                list(where_params),
+            )
+            cursor.execute(
+                f"INSERT INTO {SQLITE_TABLE} (rowid, name, notes, category, payment_method, owner) "
+                f"SELECT b.id, {name}, {notes}, {category}, {method}, 'u' || b.user_id {source}",
+                params,
+            )
+        else:
+            cursor.execute(
+                f"INSERT INTO {POSTGRES_TABLE} (bill_id, user_id, document) "
+                f"SELECT b.id, b.user_id, "
+                f"setweight(to_tsvector('simple', {name}), 'A') || "
+                f"setweight(to_tsvector('simple', {category}), 'B') || "
+                f"setweight(to_tsvector('simple', {method}), 'C') || "
+                f"setweight(to_tsvector('simple', {notes}), 'D') "
+                f"{source} "
+                "ON CONFLICT (bill_id) DO UPDATE SET user_id = EXCLUDED.user_id, document = EXCLUDED.document",
+                params,
+            )
+
+
+def index_bills(bill_ids):
+    bill_ids = list(bill_ids)
+    if bill_ids:
+        _write(f"b.id IN ({', '.join(['%s'] * len(bill_ids))})", bill_ids)
+
+
+def index_payment_method_bills(payment_method_id):
+    """Reindex the bills paid with a renamed payment method"""
+    _write("b.payment_method_id = %s", [payment_method_id])
+
+
+def remove_bills(bill_ids):
+    bill_ids = list(bill_ids)
+    backend = get_backend()
+    if not bill_ids or backend is None:
+        return
+    table, column = (SQLITE_TABLE, 'rowid') if backend == 'sqlite' else (POSTGRES_TABLE, 'bill_id')
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {table} WHERE {column} IN ({', '.join(['%s'] * len(bill_ids))})", bill_ids
+        )
+
+
+def remove_user_bills(user_ids):
+    """Drop the rows of every bill of ``user_ids``, before the bills are deleted without signals"""
+    user_ids = list(user_ids)
+    backend = get_backend()
+    if not user_ids or backend is None:
+        return
+    placeholders = ', '.join(['%s'] * len(user_ids))
+    with connection.cursor() as cursor:
+        if backend == 'sqlite':
+            cursor.execute(
+                f"DELETE FROM {SQLITE_TABLE} WHERE rowid IN "
+                f"(SELECT id FROM {Bill._meta.db_table} WHERE user_id IN ({placeholders}))",
+                user_ids,
+            )
+        else:
+            cursor.execute(f"DELETE FROM {POSTGRES_TABLE} WHERE user_id IN ({placeholders})", user_ids)
+
+
+def rebuild_index(conn=None):
+    """Reindex every bill from scratch"""
+    conn = conn or connection
+    backend = get_backend(conn)
+    if backend is None:
+        return
+    with conn.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SQLITE_TABLE if backend == 'sqlite' else POSTGRES_TABLE}")
+    _write("1 = 1", [], conn)
+
+
+# ---- querying ------------------------------------------------------------
+
+def _sqlite_match(user_id, terms):
+    prefixes = ' '.join(f'"{term}"*' for term in terms)
+    return f'owner : "u{user_id}" AND {{name notes category payment_method}} : ({prefixes})'
+
+
+def _postgres_query(terms):
+    return ' & '.join(f'{term}:*' for term in terms)
+
+
+def _fallback_matches(user_id, terms):
+    matches = Bill.objects.filter(user_id=user_id)
+    for term in terms:
+        matches = matches.filter(
+            Q(name__icontains=term) | Q(notes__icontains=term) | Q(payment_method__name__icontains=term)
+        )
+    return matches
+
+
+def _ranked_ids(user_id, terms, status, category):
+    backend = get_backend()
+    # The filters are applied before ranking, so the cut at MAX_RESULTS never hides a filtered match
+    filters, filter_params = '', []
+    if status:
+        filters += ' AND b.status = %s'
+        filter_params.append(status)
+    if category:
+        filters += ' AND b.category = %s'
+        filter_params.append(category)
+    with connection.cursor() as cursor:
+        if backend == 'sqlite':
+            # Column weights: name, notes, category, payment method, owner
+            cursor.execute(
+                f"SELECT {SQLITE_TABLE}.rowid FROM {SQLITE_TABLE} "
+                f"JOIN {Bill._meta.db_table} b ON b.id = {SQLITE_TABLE}.rowid "
+                f"WHERE {SQLITE_TABLE} MATCH %s{filters} "
+                f"ORDER BY bm25({SQLITE_TABLE}, 10.0, 1.0, 4.0, 4.0, 0.0) LIMIT %s",
+                [_sqlite_match(user_id, terms), *filter_params, MAX_RESULTS],
+            )
+        elif backend == 'postgresql':
+            cursor.execute(
+                f"SELECT s.bill_id FROM {POSTGRES_TABLE} s "
+                f"JOIN {Bill._meta.db_table} b ON b.id = s.bill_id, to_tsquery('simple', %s) query "
+                f"WHERE s.user_id = %s AND s.document @@ query{filters} "
+                "ORDER BY ts_rank(s.document, query) DESC, s.bill_id LIMIT %s",
+                [_postgres_query(terms), user_id, *filter_params, MAX_RESULTS],
+            )
+        else:
+            matches = _fallback_matches(user_id, terms)
+            if status:
+                matches = matches.filter(status=status)
+            if category:
+                matches = matches.filter(category=category)
+            return list(matches.order_by('due_date', 'pk').values_list('pk', flat=True)[:MAX_RESULTS])
+        return [row[0] for row in cursor.fetchall()]
+
+
+def query_digest(query):
+    """Short key for the terms of ``query``; queries with the same terms share it"""
+    return hashlib.md5(' '.join(search_terms(query)).encode()).hexdigest()
+
+
+def search_bill_ids(user, query, status='', category=''):
+    """
+    Ids of ``user``'s bills matching every term of ``query`` as a prefix, and
+    ``status`` and ``category`` when given, best match first (at most
+    ``MAX_RESULTS``), or ``None`` if ``query`` has no terms.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return None
+    key = f'bills:search:{user.pk}:{get_data_version(user.pk)}:{query_digest(query)}:{status}:{category}'
+    ids = cache.get(key)
+    if ids is None:
+        ids = _ranked_ids(user.pk, terms, status, category)
+        cache.set(key, ids, SEARCH_CACHE_TIMEOUT)
+    return ids
+
+
+def search_filter(user, query):
+    """
+    A filter for ``Bill`` querysets matching all of ``user``'s bills that
+    match ``query`` (a subquery on the index, not limited to ``MAX_RESULTS``),
+    or ``None`` if ``query`` has no terms.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return None
+    backend = get_backend()
+    if backend == 'sqlite':
+        ids = RawSQL(f"SELECT rowid FROM {SQLITE_TABLE} WHERE {SQLITE_TABLE} MATCH %s", [_sqlite_match(user.pk, terms)])
+    elif backend == 'postgresql':
+        ids = RawSQL(
+            f"SELECT bill_id FROM {POSTGRES_TABLE} WHERE user_id = %s AND document @@ to_tsquery('simple', %s)",
+            [user.pk, _postgres_query(terms)],
+        )
+    else:
+        ids = _fallback_matches(user.pk, terms).values('pk')
+    return Q(pk__in=ids)
@@ -0,0 +1,128 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import recurrence, search, spending
+from .caching import bump_data_version
+from .models import Bill, Budget, Notification, PaymentMethod
+from .notifications import invalidate_watermark
+from .summaries import apply_bill_change, refresh_summary
+
+
+@receiver(pre_save, sender=Bill)
+def remember_previous_values(sender, instance, **kwargs):
+    """What the bill counted towards before this save, for the summary and rollup updates"""
+    previous = None
+    if instance.pk:
+        previous = Bill.objects.filter(pk=instance.pk).values_list('status', 'due_date', 'payment_date').first()
+    instance._previous_summary_values = previous
+    instance._previous_paid_month = spending.paid_month(previous[0], previous[2]) if previous else None
+
+
+@receiver(post_save, sender=Bill)
+@receiver(post_delete, sender=Bill)
+def bill_changed(sender, instance, signal, origin=None, **kwargs):
+    """A created, edited or deleted bill may cross a notification threshold immediately"""
+    invalidate_watermark(instance.user_id)
+
+    # The user's own summary row is going away with them
+    if isinstance(origin, get_user_model()):
+        return
+    values = (instance.status, instance.due_date, instance.payment_date)
+    if signal is post_delete:
+        apply_bill_change(instance.user_id, values, None)
+    else:
+        apply_bill_change(instance.user_id, getattr(instance, '_previous_summary_values', None), values)
+
+
+@receiver(post_save, sender=Bill)
+@receiver(post_delete, sender=Bill)
+def refresh_monthly_spend(sender, instance, origin=None, **kwargs):
+    if isinstance(origin, get_user_model()):
+        return
+    months = {
+        getattr(instance, '_previous_paid_month', None),
+        spending.paid_month(instance.status, instance.payment_date),
+    }
+    spending.refresh_months(instance.user_id, months - {None})
+
+
+@receiver(post_save, sender=Bill)
+def update_recurring_series(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        recurrence.bill_saved(instance, created)
+
+
+@receiver(pre_delete, sender=Bill)
+def end_recurring_series(sender, instance, origin=None, **kwargs):
+    # The user's series are going away with them
+    if isinstance(origin, get_user_model()):
+        return
+    recurrence.bill_deleted(instance)
+
+
+def bills_written_in_bulk(user_id, created_ids=(), months=(), now=None):
+    """
+    Bring derived data up to date after writing ``user_id``'s bills with
+    ``bulk_create``/``update()``, which skip the receivers above: index the
+    ``created_ids`` bills, refresh the paid ``months`` and the summary row,
+    and invalidate cached results once the transaction commits.
+    """
+    search.index_bills(created_ids)
+    spending.refresh_months(user_id, months)
+    refresh_summary(user_id, now)
+
+    def invalidate():
+        invalidate_watermark(user_id)
+        bump_data_version(user_id)
+
+    transaction.on_commit(invalidate)
+
+
+@receiver(post_save, sender=Bill)
+def index_bill(sender, instance, **kwargs):
+    search.index_bills([instance.pk])
+
+
+@receiver(post_delete, sender=Bill)
+def unindex_bill(sender, instance, **kwargs):
+    search.remove_bills([instance.pk])
+
+
+@receiver(post_save, sender=PaymentMethod)
+def payment_method_renamed(sender, instance, created, **kwargs):
+    if not created:
+        search.index_payment_method_bills(instance.pk)
+
+
+@receiver(pre_delete, sender=PaymentMethod)
+def payment_method_deleted(sender, instance, **kwargs):
+    # Bills keep their row but lose the method name (on_delete=SET_NULL,
+    # which bypasses Bill signals); reindex them once the delete commits
+    bill_ids = list(Bill.objects.filter(payment_method=instance).values_list('pk', flat=True))
+    if not bill_ids:
+        return
+
+    def reindex():
+        search.index_bills(bill_ids)
+        bump_data_version(instance.user_id)
+
+    transaction.on_commit(reindex)
+
+
+# Registered after the search receivers, so results cached under the new
+# version already see the updated index
+@receiver(post_save, sender=Bill)
+@receiver(post_delete, sender=Bill)
+@receiver(post_save, sender=Budget)
+@receiver(post_delete, sender=Budget)
+@receiver(post_save, sender=PaymentMethod)
+@receiver(post_delete, sender=PaymentMethod)
+@receiver(post_save, sender=Notification)
+@receiver(post_delete, sender=Notification)
+def user_data_changed(sender, instance, origin=None, **kwargs):
+    """Drop everything cached for the user: responses, search results, forecast (bills.caching)"""
+    if isinstance(origin, get_user_model()):
+        return
+    bump_data_version(instance.user_id)
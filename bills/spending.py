@@ -0,0 +1,98 @@
+"""
+Monthly spending rollups for the analytics charts.
+
+``MonthlySpend`` holds, per user, calendar month (site time zone) and
+category, the total and count of bills paid in that month. Like
+``bills.summaries`` nothing is tracked as a delta: when a bill is saved or
+deleted, the months it was paid in before and after the write are
+recomputed from the bills table (one aggregate over the user's paid bills in
+those months, served by the ``(user, status, payment_date)`` index, plus a
+replace of their rows). ``rebuild_monthly_spend`` recomputes everything, for
+bills written with ``bulk_create``/``update()`` or raw SQL.
+
+Chart reads then touch at most one row per month and category, so a 60-month
+range costs about the same as a 6-month one.
+"""
+import calendar
+from collections import defaultdict
+from datetime import date, datetime, time
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .models import Bill, MonthlySpend
+
+
+def month_of(moment):
+    """First day of the month ``moment`` falls in, in the site time zone"""
+    return timezone.localtime(moment).date().replace(day=1)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_range(month):
+    """Aware (start, end) datetimes of ``month``"""
+    days = calendar.monthrange(month.year, month.month)[1]
+    start = timezone.make_aware(datetime.combine(month, time.min))
+    return start, timezone.make_aware(datetime.combine(month.replace(day=days), time.max))
+
+
+def spend_rows(bills):
+    """Unsaved ``MonthlySpend`` rows for the paid bills in ``bills``"""
+    totals = (
+        bills.filter(status='paid', payment_date__isnull=False)
+        .annotate(paid_month=TruncMonth('payment_date'))
+        .values('user_id', 'paid_month', 'category')
+        .annotate(total=Sum('amount'), count=Count('id'))
+        .order_by()
+    )
+    return [
+        MonthlySpend(
+            user_id=row['user_id'], month=month_of(row['paid_month']), category=row['category'],
+            total=row['total'], count=row['count'],
+        )
+        for row in totals
+    ]
+
+
+def refresh_months(user_id, months):
+    """Recompute ``user_id``'s rows for each date in ``months`` (first days of months)"""
+    months = set(months)
+    if not months:
+        return
+    paid_in = Q()
+    for month in months:
+        paid_in |= Q(payment_date__range=month_range(month))
+    with transaction.atomic():
+        MonthlySpend.objects.filter(user_id=user_id, month__in=months).delete()
+        MonthlySpend.objects.bulk_create(spend_rows(Bill.objects.filter(paid_in, user_id=user_id)))
+
+
+def rebuild(user_ids=None):
+    """Recompute every row (of ``user_ids``, if given); returns the number of rows written"""
+    bills = Bill.objects.all()
+    rows = MonthlySpend.objects.all()
+    if user_ids is not None:
+        bills = bills.filter(user_id__in=user_ids)
+        rows = rows.filter(user_id__in=user_ids)
+    with transaction.atomic():
+        rows.delete()
+        return len(MonthlySpend.objects.bulk_create(spend_rows(bills), batch_size=1000))
+
+
+def paid_month(status, payment_date):
+    return month_of(payment_date) if status == 'paid' and payment_date else None
+
+
+def spending_by_month(user, first_month, last_month):
+    """``{month: {category: (total, count)}}`` for the months in the range, inclusive"""
+    months = defaultdict(dict)
+    rows = MonthlySpend.objects.filter(user=user, month__range=(first_month, last_month))
+    for month, category, total, count in rows.values_list('month', 'category', 'total', 'count'):
+        months[month][category] = (total, count)
+    return months
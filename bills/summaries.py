@@ -0,0 +1,150 @@
+"""
+Per-user bill summary maintenance.
+
+``UserBillSummary`` holds the dashboard counts for one user. Overdue,
+due-soon and paid-this-month depend on the clock, so every row also stores
+``valid_until``, the next moment one of those counts can change.
+``rebuild_bill_summaries --stale`` recomputes expired rows periodically, and
+``get_summary`` recomputes an expired row on read in case the periodic job
+has not run yet.
+
+When one bill is saved or deleted (see ``bills.signals``), ``apply_bill_change``
+adjusts the row in a single ``UPDATE`` from the bill's old and new values:
+while a row is valid no count has changed with the clock, so the old values
+counted then exactly as they count now. It falls back to ``refresh_summary``
+(one aggregate query plus one upsert) when the row is missing or expired, or
+when the bill was the one defining ``next_due_date`` and no longer is.
+Writes that skip the signals (``bulk_create``, ``update()``) use
+``refresh_summary`` through ``bills_written_in_bulk``.
+"""
+from datetime import timedelta
+
+from django.db.models import Case, Count, F, Min, Q, Value, When
+from django.db.models.functions import Least
+from django.utils import timezone
+
+from .models import Bill, UserBillSummary
+from .notifications import DUE_SOON_WINDOW
+
+
+def start_of_next_month(moment):
+    month_start = moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    return (month_start + timedelta(days=32)).replace(day=1)
+
+
+def compute_summary(user_id, now=None):
+    """Summary field values for ``user_id``, computed in one aggregate query"""
+    now = now or timezone.now()
+    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    pending = Q(status='pending')
+
+    totals = Bill.objects.filter(user_id=user_id).aggregate(
+        total_count=Count('id'),
+        pending_count=Count('id', filter=pending),
+        paid_count=Count('id', filter=Q(status='paid')),
+        # Same rules as Bill.is_overdue / Bill.is_due_soon
+        overdue_count=Count('id', filter=pending & Q(due_date__lt=today_start)),
+        due_soon_count=Count('id', filter=pending & Q(due_date__gte=now, due_date__lte=now + DUE_SOON_WINDOW)),
+        paid_this_month=Count('id', filter=Q(status='paid', payment_date__gte=month_start)),
+        next_due_date=Min('due_date', filter=pending & Q(due_date__gte=now)),
+        next_due_soon=Min('due_date', filter=pending & Q(due_date__gt=now + DUE_SOON_WINDOW)),
+        next_overdue=Min('due_date', filter=pending & Q(due_date__gte=today_start)),
+    )
+
+    # The earliest moment any count above can change without a bill write
+    transitions = [start_of_next_month(now)]
+    if totals['next_due_date']:
+        # Leaves due-soon (and next_due_date moves on) once it is in the past
+        transitions.append(totals['next_due_date'] + timedelta(microseconds=1))
+    next_due_soon = totals.pop('next_due_soon')
+    if next_due_soon:
+        transitions.append(next_due_soon - DUE_SOON_WINDOW)
+    next_overdue = totals.pop('next_overdue')
+    if next_overdue:
+        transitions.append(next_overdue.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1))
+
+    totals['valid_until'] = min(transitions)
+    return totals
+
+
+def _bill_counts(values, now):
+    """
+    ``(counts, next_due, transitions)`` one bill with ``values`` (status,
+    due date, payment date) adds to its user's summary; the same rules as
+    ``compute_summary``.
+    """
+    if values is None:
+        return {}, None, []
+    status, due_date, payment_date = values
+    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    pending = status == 'pending'
+
+    counts = {
+        'total_count': 1,
+        'pending_count': int(pending),
+        'paid_count': int(status == 'paid'),
+        'overdue_count': int(pending and due_date < today_start),
+        'due_soon_count': int(pending and now <= due_date <= now + DUE_SOON_WINDOW),
+        'paid_this_month': int(status == 'paid' and payment_date is not None and payment_date >= month_start),
+    }
+    next_due = due_date if pending and due_date >= now else None
+    transitions = []
+    if next_due:
+        transitions.append(due_date + timedelta(microseconds=1))
+    if pending and due_date > now + DUE_SOON_WINDOW:
+        transitions.append(due_date - DUE_SOON_WINDOW)
+    if pending and due_date >= today_start:
+        transitions.append(due_date.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1))
+    return counts, next_due, transitions
+
+
+def apply_bill_change(user_id, old, new, now=None):
+    """
+    Update ``user_id``'s summary for one bill going from ``old`` to ``new``
+    (``(status, due_date, payment_date)``, ``None`` for a created or deleted
+    bill) without recounting their bills, if the row allows it.
+    """
+    now = now or timezone.now()
+    old_counts, old_next_due, _ = _bill_counts(old, now)
+    new_counts, new_next_due, transitions = _bill_counts(new, now)
+
+    changes = {}
+    for field in old_counts.keys() | new_counts.keys():
+        delta = new_counts.get(field, 0) - old_counts.get(field, 0)
+        if delta:
+            changes[field] = F(field) + delta
+    if new_next_due:
+        changes['next_due_date'] = Case(
+            When(Q(next_due_date__isnull=True) | Q(next_due_date__gt=new_next_due), then=Value(new_next_due)),
+            default=F('next_due_date'),
+        )
+    if transitions:
+        # The old value's transitions may stay in; they only bring the next recompute forward
+        changes['valid_until'] = Least(F('valid_until'), Value(min(transitions)))
+    # If the bill was the next one due, which bill is next now takes a recount
+    was_next_due = old_next_due and not (new_next_due and new_next_due <= old_next_due)
+    if not changes and not was_next_due:
+        return
+
+    rows = UserBillSummary.objects.filter(user_id=user_id, valid_until__gt=now)
+    if was_next_due:
+        rows = rows.exclude(next_due_date=old_next_due)
+    if not rows.update(updated_at=now, **changes):
+        refresh_summary(user_id, now)
+
+
+def refresh_summary(user_id, now=None):
+    summary, _ = UserBillSummary.objects.update_or_create(
+        user_id=user_id, defaults=compute_summary(user_id, now)
+    )
+    return summary
+
+
+def get_summary(user):
+    """The user's summary row, recomputed first if missing or expired"""
+    summary = UserBillSummary.objects.filter(user=user).first()
+    if summary is None or summary.is_stale:
+        summary = refresh_summary(user.pk)
+    return summary
@@ -1,3 +1,1428 @@
-from django.test import TestCase
+import asyncio
+import json
+import logging
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.mail import EmailMessage
+from django.core.mail.backends.locmem import EmailBackend as LocmemBackend
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from bill_payment_reminder.logs import JsonFormatter, QueuedStreamHandler, SampledFilter
+from . import forecast, payments, recurrence, reports
+from .delivery import DeliveryPool
+from .events import InProcessBroker, get_broker
+from .instrumentation import QueryRecorder, query_stats, reset_query_stats
+from .models import (
+    Bill, Budget, Job, MonthlySpend, Notification, PaymentMethod, ProfileRun, RecurrenceOccurrence,
+    RecurringSeries, UserBillSummary, UserPreference,
+)
+from .notifications import generate_notifications
+from .profiling import authorize, issue_token
+from .summaries import get_summary
+
+
+def make_user(username='alice', **kwargs):
+    return get_user_model().objects.create_user(
+        username=username, email=f'{username}@example.com', password='pass12345', **kwargs
+    )
+
+
+def make_bill(user, days=1, **kwargs):
+    defaults = {
+        'name': 'Electricity',
+        'amount': '1500.00',
+        'due_date': timezone.now() + timedelta(days=days, hours=1),
+        'category': 'electricity',
+    }
+    defaults.update(kwargs)
+    return Bill.objects.create(user=user, **defaults)
+
+
+class SendRemindersTests(TestCase):
+    def run_command(self, *args):
+        out = StringIO()
+        call_command('send_reminders', *args, stdout=out)
+        return out.getvalue()
+
+    def test_sends_reminders_inside_window_only(self):
+        user = make_user()
+        due = make_bill(user, days=1)
+        make_bill(user, days=10, name='Rent')
+        make_bill(user, days=1, name='Water', status='paid')
+
+        output = self.run_command()
+
+        self.assertEqual(len(mail.outbox), 1)
+        due.refresh_from_db()
+        self.assertTrue(due.reminder_sent)
+        self.assertEqual(Notification.objects.filter(notification_type='reminder').count(), 1)
+        self.assertTrue(UserPreference.objects.filter(user=user).exists())
+        self.assertIn('Phase timings:', output)
+
+    def test_respects_preferences(self):
+        user = make_user()
+        UserPreference.objects.create(user=user, remind_days_before=10)
+        make_bill(user, days=8)
+        muted = make_user('bob')
+        UserPreference.objects.create(user=muted, email_reminders_enabled=False)
+        make_bill(muted, days=1)
+
+        self.run_command('--chunk-size', '1')
+
+        self.assertEqual([m.to for m in mail.outbox], [['alice@example.com']])
+
+    def test_does_not_remind_twice_on_the_same_day(self):
+        user = make_user()
+        make_bill(user, days=1)
+        make_bill(user, days=2, name='Internet')
+
+        self.run_command('--chunk-size', '1')
+        self.run_command()
+
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(Notification.objects.count(), 2)
+
+    def test_dry_run_writes_nothing(self):
+        user = make_user()
+        make_bill(user, days=1)
+
+        output = self.run_command('--dry-run')
+
+        self.assertIn('[DRY RUN]', output)
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertFalse(UserPreference.objects.exists())
+        self.assertFalse(Notification.objects.exists())
+
+    def test_digest_collapses_bills_per_user(self):
+        user = make_user()
+        UserPreference.objects.create(user=user, daily_digest_enabled=True)
+        for i in range(3):
+            make_bill(user, days=1, name=f'Bill {i}')
+        other = make_user('bob')
+        make_bill(other, days=1)
+        make_bill(other, days=2, name='Internet')
+
+        self.run_command('--chunk-size', '2')
+
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox),
+                         ['alice@example.com', 'bob@example.com', 'bob@example.com'])
+        digest = next(m for m in mail.outbox if m.to == ['alice@example.com'])
+        self.assertIn('3 bills due soon', digest.subject)
+        self.assertEqual(Notification.objects.filter(user=user).count(), 1)
+        self.assertEqual(Bill.objects.filter(reminder_sent=True).count(), 5)
+
+    def test_digest_flag_applies_to_everyone(self):
+        user = make_user()
+        make_bill(user, days=1)
+        make_bill(user, days=2, name='Internet')
+
+        self.run_command('--digest')
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn('Internet', mail.outbox[0].body)
+
+
+class FlakyBackend(LocmemBackend):
+    """Locmem backend that fails the first send for every recipient"""
+    failures = {}
+
+    def send_messages(self, messages):
+        for message in messages:
+            recipient = message.to[0]
+            if not self.failures.get(recipient):
+                self.failures[recipient] = True
+                raise ConnectionError('connection reset')
+        return super().send_messages(messages)
+
+
+class DeliveryPoolTests(SimpleTestCase):
+    def make_messages(self, count):
+        return [
+            EmailMessage(subject=f'Reminder {i}', body='Due soon', to=[f'user{i}@example.com'])
+            for i in range(count)
+        ]
+
+    def test_delivers_all_messages_across_workers(self):
+        with DeliveryPool(workers=3, batch_size=4) as pool:
+            result = pool.deliver(self.make_messages(10))
+
+        self.assertEqual(len(result.sent), 10)
+        self.assertEqual(result.failed, [])
+        self.assertEqual(len(mail.outbox), 10)
+        self.assertGreater(result.throughput, 0)
+
+    def test_retries_failed_recipients_only(self):
+        FlakyBackend.failures = {}
+        with DeliveryPool(workers=2, batch_size=2, retries=1, backoff=0, connection_factory=FlakyBackend) as pool:
+            result = pool.deliver(self.make_messages(4))
+
+        self.assertEqual(len(result.sent), 4)
+        self.assertEqual(len(mail.outbox), 4)
+
+    def test_reports_failures_after_retries(self):
+        FlakyBackend.failures = {}
+        with DeliveryPool(workers=1, retries=0, connection_factory=FlakyBackend) as pool:
+            result = pool.deliver(self.make_messages(2))
+
+        self.assertEqual(result.sent, [])
+        self.assertEqual(len(result.failed), 2)
+
+    def test_backend_that_cannot_be_created_fails_messages(self):
+        factory = mock.Mock(side_effect=ImportError('no such backend'))
+        with DeliveryPool(workers=2, batch_size=1, retries=1, backoff=0, connection_factory=factory) as pool:
+            result = pool.deliver(self.make_messages(3))
+
+        self.assertEqual(result.sent, [])
+        self.assertEqual(len(result.failed), 3)
+        self.assertIsInstance(result.failed[0][1], ImportError)
+
+
+class GenerateNotificationsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = make_user()
+
+    def test_creates_overdue_and_due_soon_once(self):
+        make_bill(self.user, days=-3, name='Rent')
+        make_bill(self.user, days=1, name='Water')
+        make_bill(self.user, days=20, name='Insurance')
+
+        generate_notifications(self.user)
+        cache.clear()
+        generate_notifications(self.user)
+
+        types = sorted(Notification.objects.values_list('notification_type', flat=True))
+        self.assertEqual(types, ['due_soon', 'overdue'])
+
+    def test_skips_queries_until_next_transition(self):
+        make_bill(self.user, days=10)
+        generate_notifications(self.user)
+
+        with self.assertNumQueries(0):
+            generate_notifications(self.user)
+
+    def test_bill_changes_clear_the_watermark(self):
+        generate_notifications(self.user)
+        make_bill(self.user, days=1)
+
+        generate_notifications(self.user)
+
+        self.assertEqual(Notification.objects.filter(notification_type='due_soon').count(), 1)
+
+
+class NotificationsEndpointTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = make_user()
+        self.client.force_login(self.user)
+
+    def test_unchanged_poll_returns_304(self):
+        make_bill(self.user, days=1)
+        first = self.client.get('/notifications/')
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.json()['unread_count'], 1)
+
+        second = self.client.get('/notifications/', HTTP_IF_NONE_MATCH=first['ETag'])
+
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second.content, b'')
+
+    def test_etag_changes_when_notifications_are_read(self):
+        make_bill(self.user, days=1)
+        etag = self.client.get('/notifications/')['ETag']
+        self.client.get('/notifications/mark-all-read/')
+
+        response = self.client.get('/notifications/', HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['unread_count'], 0)
+
+
+class NotificationStreamTests(TestCase):
+    def test_in_process_broker_fans_out_to_user_listeners(self):
+        broker = InProcessBroker()
+
+        async def scenario():
+            mine = broker.listen(1, heartbeat=0.05)
+            other = broker.listen(2, heartbeat=0.05)
+            self.assertIsNone(await mine.__anext__())
+            self.assertIsNone(await other.__anext__())
+            broker.publish(1, {'id': 7})
+            self.assertEqual(await mine.__anext__(), {'id': 7})
+            self.assertIsNone(await other.__anext__())
+            await mine.aclose()
+            await other.aclose()
+
+        asyncio.run(scenario())
+        self.assertEqual(dict(broker._listeners), {})
+
+    async def test_stream_pushes_created_notifications(self):
+        user = await get_user_model().objects.acreate_user(
+            username='alice', email='alice@example.com', password='pass12345'
+        )
+        await self.async_client.aforce_login(user)
+
+        response = await self.async_client.get('/notifications/stream/')
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        events = aiter(response.streaming_content)
+        self.assertEqual(await anext(events), b'retry: 5000\n\n')
+
+        pending = asyncio.ensure_future(anext(events))
+        await asyncio.sleep(0.05)
+        get_broker().publish(user.pk, {'id': 42, 'title': 'Payment Confirmed'})
+
+        chunk = await asyncio.wait_for(pending, 1)
+        self.assertIn(b'event: notification', chunk)
+        self.assertIn(b'"id": 42', chunk)
+
+    def test_stream_is_refused_under_wsgi(self):
+        self.client.force_login(make_user())
+        response = self.client.get('/notifications/stream/')
+        self.assertEqual(response.status_code, 204)
+
+    async def test_stream_heartbeat_generates_due_notifications(self):
+        user = await get_user_model().objects.acreate_user(
+            username='alice', email='alice@example.com', password='pass12345'
+        )
+        await sync_to_async(make_bill)(user, days=-3)
+        await self.async_client.aforce_login(user)
+
+        with mock.patch('bills.views.NOTIFICATION_HEARTBEAT', 0.05):
+            response = await self.async_client.get('/notifications/stream/')
+            events = aiter(response.streaming_content)
+            await anext(events)
+            self.assertEqual(await asyncio.wait_for(anext(events), 1), b': keepalive\n\n')
+
+        self.assertTrue(await Notification.objects.filter(user=user, notification_type='overdue').aexists())
+
+
+class UserBillSummaryTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+
+    def test_kept_current_by_bill_writes(self):
+        overdue = make_bill(self.user, days=-5)
+        make_bill(self.user, days=1, name='Water')
+        make_bill(self.user, days=-10, name='Rent', status='paid', payment_date=timezone.now())
+
+        summary = UserBillSummary.objects.get(user=self.user)
+        self.assertEqual(
+            (summary.total_count, summary.pending_count, summary.paid_count,
+             summary.overdue_count, summary.due_soon_count, summary.paid_this_month),
+            (3, 2, 1, 1, 1, 1),
+        )
+
+        overdue.delete()
+        summary.refresh_from_db()
+        self.assertEqual((summary.total_count, summary.overdue_count), (2, 0))
+
+    def test_single_bill_writes_update_the_row_without_recounting(self):
+        from .summaries import compute_summary, refresh_summary
+
+        fields = ['total_count', 'pending_count', 'paid_count', 'overdue_count', 'due_soon_count',
+                  'paid_this_month', 'next_due_date']
+        first = make_bill(self.user, days=1, name='Water')
+        soon = make_bill(self.user, days=2, name='Internet')
+        later = make_bill(self.user, days=20, name='Rent')
+        make_bill(self.user, days=-5, name='Phone')
+
+        def pay(bill):
+            bill.status, bill.payment_date = 'paid', timezone.now()
+            bill.save()
+
+        def postpone(bill):
+            bill.due_date += timedelta(days=30)
+            bill.save()
+
+        # Paying the next bill due is the one edit that needs a recount
+        edits = [(lambda: pay(soon), 0), (lambda: postpone(later), 0), (soon.delete, 0), (lambda: pay(first), 1)]
+        for edit, recounts in edits:
+            with mock.patch('bills.summaries.refresh_summary', wraps=refresh_summary) as refresh:
+                edit()
+            self.assertEqual(refresh.call_count, recounts)
+            summary = UserBillSummary.objects.values(*fields).get(user=self.user)
+            expected = compute_summary(self.user.pk)
+            self.assertEqual(summary, {field: expected[field] for field in fields})
+
+        # Renaming changes no count, so the row is not touched
+        with CaptureQueriesContext(connection) as queries:
+            Bill.objects.get(name='Phone').save(update_fields=['name'])
+        self.assertFalse(any('bills_userbillsummary' in query['sql'] for query in queries))
+
+    def test_expired_row_is_recomputed_on_read(self):
+        make_bill(self.user, days=-5)
+        UserBillSummary.objects.filter(user=self.user).update(
+            overdue_count=0, valid_until=timezone.now() - timedelta(seconds=1)
+        )
+
+        self.assertEqual(get_summary(self.user).overdue_count, 1)
+
+    def test_rebuild_check_reports_drift(self):
+        make_bill(self.user, days=1)
+        UserBillSummary.objects.filter(user=self.user).update(pending_count=7)
+
+        out = StringIO()
+        call_command('rebuild_bill_summaries', '--check', stdout=out)
+        self.assertIn('pending_count 7 != 1', out.getvalue())
+
+        call_command('rebuild_bill_summaries', stdout=StringIO())
+        self.assertEqual(UserBillSummary.objects.get(user=self.user).pending_count, 1)
+
+    def test_deleting_user_removes_summary(self):
+        make_bill(self.user, days=1)
+        self.user.delete()
+        self.assertFalse(UserBillSummary.objects.exists())
+
+
+class DashboardTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.client.force_login(self.user)
+
+    def dashboard_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/')
+        self.assertEqual(response.status_code, 200)
+        return response, len(ctx.captured_queries)
+
+    def test_counts(self):
+        make_bill(self.user, days=-5)
+        make_bill(self.user, days=1, name='Water')
+        make_bill(self.user, days=2, name='Rent', status='paid', payment_date=timezone.now())
+
+        response, _ = self.dashboard_queries()
+
+        self.assertEqual(response.context['total_bills'], 3)
+        self.assertEqual(response.context['total_pending'], 2)
+        self.assertEqual(response.context['overdue_count'], 1)
+        self.assertEqual(response.context['paid_this_month'], 1)
+        self.assertEqual([b.name for b in response.context['upcoming_bills']], ['Water'])
+
+    def test_query_count_is_constant(self):
+        make_bill(self.user, days=1)
+        _, baseline = self.dashboard_queries()
+
+        for i in range(25):
+            make_bill(self.user, days=(i % 10) - 5, name=f'Bill {i}')
+        _, queries = self.dashboard_queries()
+
+        self.assertEqual(queries, baseline)
+
+    def test_add_budget(self):
+        response = self.client.post('/', {'add_budget': '1', 'category': 'rent', 'monthly_limit': '5000', 'is_active': 'on'})
+
+        self.assertRedirects(response, '/')
+        self.assertTrue(self.user.budgets.filter(category='rent').exists())
+
+
+class BudgetSpentTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.client.force_login(self.user)
+
+    def pay(self, category, amount, when=None):
+        make_bill(self.user, days=-1, category=category, amount=amount,
+                  status='paid', payment_date=when or timezone.now())
+
+    def test_annotations_match_model_properties(self):
+        rent = Budget.objects.create(user=self.user, category='rent', monthly_limit=Decimal('1000'))
+        Budget.objects.create(user=self.user, category='water', monthly_limit=Decimal('200'))
+        Budget.objects.create(user=self.user, category='food', monthly_limit=Decimal('0'))
+        self.pay('rent', '333.00')
+        self.pay('rent', '100.00')
+        self.pay('water', '250.00')
+        self.pay('rent', '999.00', when=timezone.now() - timedelta(days=40))
+
+        annotated = {b.category: b for b in Budget.objects.filter(user=self.user).with_spent()}
+
+        self.assertEqual(annotated['rent'].spent, rent.get_spent_this_month())
+        self.assertEqual(annotated['rent'].percentage_used, rent.percentage_used)
+        self.assertEqual(annotated['rent'].remaining, rent.remaining)
+        self.assertEqual((annotated['rent'].spent, annotated['rent'].percentage), (433, 43))
+        self.assertEqual((annotated['water'].percentage, annotated['water'].remaining_amount), (100, 0))
+        self.assertEqual((annotated['food'].spent, annotated['food'].percentage), (0, 0))
+
+    def test_dashboard_budget_queries_do_not_grow(self):
+        Budget.objects.create(user=self.user, category='rent', monthly_limit=Decimal('1000'))
+        self.pay('rent', '120.00')
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get('/')
+        baseline = len(ctx.captured_queries)
+
+        for category in ['water', 'food', 'internet', 'phone']:
+            Budget.objects.create(user=self.user, category=category, monthly_limit=Decimal('500'))
+            self.pay(category, '120.00')
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/')
+
+        self.assertEqual(len(ctx.captured_queries), baseline)
+        self.assertContains(response, '₱120.00 of ₱500.00')
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.client.force_login(self.user)
+        due = timezone.now() + timedelta(days=2)
+        # Shared due dates, so the id tie-breaker matters
+        self.bills = [
+            make_bill(self.user, name=f'Bill {i:02}', due_date=due + timedelta(days=i // 3))
+            for i in range(12)
+        ]
+
+    def search(self, **params):
+        response = self.client.get('/api/search/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_search_pages_cover_every_bill_once_in_order(self):
+        seen = []
+        data = self.search(limit=5)
+        self.assertIsNone(data['previous_cursor'])
+        while True:
+            seen.extend(bill['id'] for bill in data['bills'])
+            if not data['next_cursor']:
+                break
+            data = self.search(limit=5, cursor=data['next_cursor'])
+
+        self.assertEqual(seen, [bill.pk for bill in self.bills])
+
+    def test_previous_cursor_returns_the_earlier_page(self):
+        first = self.search(limit=5, sort='-due_date')
+        second = self.search(limit=5, sort='-due_date', cursor=first['next_cursor'])
+
+        back = self.search(limit=5, sort='-due_date', cursor=second['previous_cursor'])
+
+        self.assertEqual(back['bills'], first['bills'])
+        self.assertIsNone(back['previous_cursor'])
+
+    def test_cursor_is_rejected_for_another_ordering(self):
+        cursor = self.search(limit=5)['next_cursor']
+
+        self.assertEqual(self.client.get('/api/search/', {'sort': 'name', 'cursor': cursor}).status_code, 400)
+        self.assertEqual(self.client.get('/api/search/', {'cursor': 'not-a-cursor'}).status_code, 400)
+
+    def test_bills_list_follows_next_cursor(self):
+        with mock.patch('bills.views.BILLS_PAGE_SIZE', 5):
+            first = self.client.get('/bills/', {'status': 'pending'}).context['page']
+            second = self.client.get('/bills/', {'status': 'pending', 'cursor': first.next_cursor}).context['page']
+
+        self.assertEqual([bill.pk for bill in first], [bill.pk for bill in self.bills[:5]])
+        self.assertEqual([bill.pk for bill in second], [bill.pk for bill in self.bills[5:10]])
+        self.assertTrue(second.has_previous)
+
+    def test_admin_user_detail_pages_newest_first(self):
+        self.client.force_login(make_user('admin', is_staff=True))
+        url = reverse('admin_user_detail', args=[self.user.pk])
+
+        first = self.client.get(url)
+        second = self.client.get(url, {'cursor': first.context['bills'].next_cursor})
+
+        newest_first = [bill.pk for bill in reversed(self.bills)]
+        self.assertEqual([bill.pk for bill in first.context['bills']], newest_first[:10])
+        self.assertEqual([bill.pk for bill in second.context['bills']], newest_first[10:])
+
+
+class BillSearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = make_user()
+        self.client.force_login(self.user)
+
+    def search(self, query, **params):
+        response = self.client.get('/api/search/', {'q': query, **params})
+        self.assertEqual(response.status_code, 200)
+        return [bill['name'] for bill in response.json()['bills']]
+
+    def test_matches_prefixes_across_indexed_fields(self):
+        gcash = PaymentMethod.objects.create(user=self.user, name='GCash Wallet', method_type='gcash')
+        make_bill(self.user, name='Meralco', category='electricity')
+        make_bill(self.user, name='Rent', category='rent', notes='Condo unit 12B', payment_method=gcash)
+        make_bill(make_user('bob'), name='Meralco')
+
+        self.assertEqual(self.search('mer'), ['Meralco'])
+        self.assertEqual(self.search('electr'), ['Meralco'])
+        self.assertEqual(self.search('condo'), ['Rent'])
+        self.assertEqual(self.search('gcash wal'), ['Rent'])
+        self.assertEqual(self.search('meralco condo'), [])
+
+    def test_name_matches_rank_above_notes(self):
+        make_bill(self.user, name='Groceries', notes='water jug refill', days=1)
+        make_bill(self.user, name='Water', category='water', days=5)
+
+        self.assertEqual(self.search('water'), ['Water', 'Groceries'])
+        self.assertEqual(self.search('water', sort='due_date'), ['Groceries', 'Water'])
+
+    def test_relevance_results_are_paginated(self):
+        for i in range(7):
+            make_bill(self.user, name=f'Groceries {i}', days=i + 1)
+
+        seen, cursor = [], None
+        while True:
+            params = {'q': 'groc', 'limit': 3, **({'cursor': cursor} if cursor else {})}
+            data = self.client.get('/api/search/', params).json()
+            seen.extend(bill['id'] for bill in data['bills'])
+            cursor = data['next_cursor']
+            if not cursor:
+                break
+
+        self.assertEqual(len(seen), 7)
+        self.assertEqual(len(set(seen)), 7)
+        back = self.client.get('/api/search/', {'q': 'groc', 'limit': 3, 'cursor': data['previous_cursor']}).json()
+        self.assertEqual(len(back['bills']), 3)
+        # The cursor belongs to this query and filters
+        response = self.client.get('/api/search/', {'q': 'rent', 'cursor': data['previous_cursor']})
+        self.assertEqual(response.status_code, 400)
+
+    def test_filters_and_sorts_see_matches_past_max_results(self):
+        for i in range(4):
+            make_bill(self.user, name=f'Groceries {i}', days=i + 1)
+        make_bill(self.user, name='Groceries late', days=30, status='paid')
+
+        with mock.patch('bills.search.MAX_RESULTS', 2):
+            self.assertEqual(self.search('groc', status='paid'), ['Groceries late'])
+            self.assertEqual(self.search('groc', sort='-due_date', limit=1), ['Groceries late'])
+            self.assertEqual(len(self.search('groc', sort='due_date')), 5)
+
+    def test_missing_index_table_is_looked_for_again(self):
+        from . import search
+
+        self.addCleanup(search._backends.clear)
+        search._backends.clear()
+        with mock.patch.object(connection.introspection, 'table_names', return_value=[]):
+            self.assertIsNone(search.get_backend())
+        self.assertIsNone(search.get_backend())
+
+        later = time.monotonic() + search.BACKEND_RECHECK_SECONDS + 1
+        with mock.patch('bills.search.time.monotonic', return_value=later):
+            self.assertEqual(search.get_backend(), connection.vendor)
+
+    def test_index_follows_edits_and_deletes(self):
+        bill = make_bill(self.user, name='Netflix')
+        self.assertEqual(self.search('netf'), ['Netflix'])
+
+        bill.name = 'Spotify'
+        bill.save()
+        self.assertEqual(self.search('netf'), [])
+        self.assertEqual(self.search('spot'), ['Spotify'])
+
+        bill.delete()
+        self.assertEqual(self.search('spot'), [])
+
+    def test_payment_method_rename_is_searchable(self):
+        method = PaymentMethod.objects.create(user=self.user, name='BPI Card', method_type='card')
+        make_bill(self.user, name='Insurance', payment_method=method)
+
+        method.name = 'Metrobank Card'
+        method.save()
+
+        self.assertEqual(self.search('metrobank'), ['Insurance'])
+        self.assertEqual(self.search('bpi'), [])
+
+    def test_repeated_query_is_served_from_cache(self):
+        make_bill(self.user, name='Internet')
+        self.search('inter')
+
+        with CaptureQueriesContext(connection) as queries:
+            self.search('Inter!')
+
+        self.assertFalse(any('bills_bill_fts' in query['sql'] for query in queries))
+
+
+class CSVExportTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.client.force_login(self.user)
+        method = PaymentMethod.objects.create(user=self.user, name='GCash', method_type='gcash')
+        for i in range(5):
+            make_bill(self.user, days=i, name=f'Bill {i}', status='paid', payment_method=method,
+                      payment_date=timezone.now(), notes='Auto, debit' if i == 0 else '')
+
+    def test_streams_rows_without_per_row_queries(self):
+        with mock.patch('bills.reports.CHUNK_SIZE', 2), CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/export/csv/')
+            content = b''.join(response.streaming_content).decode()
+
+        lines = content.splitlines()
+        self.assertTrue(response.streaming)
+        self.assertEqual(lines[0], 'Name,Amount,Due Date,Status,Category,Payment Date,Payment Method,Notes')
+        self.assertEqual([line.split(',')[0] for line in lines[1:]], [f'Bill {i}' for i in range(4, -1, -1)])
+        self.assertIn('"Auto, debit"', lines[-1])
+        self.assertIn(',Paid,Electricity,', lines[1])
+        self.assertIn(',GCash,', lines[1])
+        # Session and user lookups plus one SELECT for the bills
+        self.assertEqual(sum('bills_bill' in query['sql'] for query in queries), 1)
+
+    async def test_asgi_request_gets_an_async_stream(self):
+        await self.async_client.aforce_login(self.user)
+
+        response = await self.async_client.get('/export/csv/')
+
+        self.assertTrue(response.is_async)
+        content = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(len(content.decode().splitlines()), 6)
+
+
+class PDFReportTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.client.force_login(self.user)
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.cache_dir.cleanup)
+        self.settings_override = self.settings(REPORT_CACHE_DIR=self.cache_dir.name)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+
+    def download(self, **params):
+        response = self.client.get('/export/pdf/', params)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        return b''.join(response.streaming_content)
+
+    def test_writes_a_well_formed_multi_page_pdf(self):
+        Bill.objects.bulk_create([
+            Bill(user=self.user, name=f'Bill (#{i})', amount=Decimal('1000.50'), due_date=timezone.now())
+            for i in range(120)
+        ])
+
+        pdf = self.download()
+
+        self.assertTrue(pdf.startswith(b'%PDF-1.4'))
+        self.assertTrue(pdf.endswith(b'%%EOF\n'))
+        self.assertIn(b'/Type /Pages /Kids', pdf)
+        self.assertRegex(pdf, rb'/Count [3-9] ')
+        startxref = int(pdf.rsplit(b'startxref\n', 1)[1].split(b'\n')[0])
+        self.assertTrue(pdf[startxref:].startswith(b'xref\n'))
+        # Every object offset in the table points at that object
+        table = pdf[startxref:].split(b'\n')[3:]
+        for obj_id, entry in enumerate(table[:5], start=1):
+            offset = int(entry[:10])
+            self.assertTrue(pdf[offset:].startswith(b'%d 0 obj' % obj_id))
+
+    def test_repeat_downloads_reuse_the_cached_file_until_bills_change(self):
+        bill = make_bill(self.user)
+
+        with mock.patch('bills.reports.write_bills_report', wraps=reports.write_bills_report) as build:
+            first = self.download()
+            self.assertEqual(self.download(), first)
+            self.assertEqual(build.call_count, 1)
+
+            bill.name = 'Water'
+            bill.save()
+            self.download()
+            self.assertEqual(build.call_count, 2)
+
+            self.download(status='paid')
+            self.assertEqual(build.call_count, 3)
+
+        cached = list(Path(self.cache_dir.name, str(self.user.pk)).glob('*.pdf'))
+        self.assertEqual(len(cached), 2)
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.client.force_login(self.user)
+
+    def run_worker(self):
+        call_command('run_worker', '--once', stdout=StringIO())
+
+    def test_background_export_is_queued_run_and_downloaded(self):
+        make_bill(self.user, name='Water', status='paid')
+        make_bill(self.user, name='Internet')
+
+        response = self.client.get('/export/csv/', {'background': 1, 'status': 'paid'})
+        self.assertEqual(response.status_code, 202)
+        status_url = response.json()['status_url']
+        self.assertEqual(self.client.get(status_url).json()['status'], 'queued')
+
+        self.run_worker()
+
+        status = self.client.get(status_url).json()
+        self.assertEqual(status['status'], 'done')
+        download = self.client.get(status['download_url'])
+        self.assertEqual(download['Content-Type'], 'text/csv')
+        content = b''.join(download.streaming_content).decode()
+        self.assertIn('Water', content)
+        self.assertNotIn('Internet', content)
+
+        self.client.force_login(make_user('bob'))
+        self.assertEqual(self.client.get(status_url).status_code, 404)
+        self.assertEqual(self.client.get(status['download_url']).status_code, 404)
+
+    def test_each_job_is_claimed_once(self):
+        from . import jobs
+
+        job = jobs.enqueue('export_csv', user=self.user, filters={})
+
+        self.assertEqual(jobs.claim_next('a').pk, job.pk)
+        self.assertIsNone(jobs.claim_next('b'))
+
+    def test_failing_job_is_retried_then_marked_failed(self):
+        from . import jobs
+
+        job = jobs.enqueue('export_csv', user=self.user, filters={})
+        with mock.patch.dict(jobs.HANDLERS, export_csv=mock.Mock(side_effect=RuntimeError('disk full'))):
+            for attempt in range(1, job.max_attempts + 1):
+                self.run_worker()
+                job.refresh_from_db()
+                self.assertEqual(job.attempts, attempt)
+                # Retries wait out a backoff; skip it
+                Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+
+        self.assertEqual(job.status, 'failed')
+        self.assertIn('disk full', job.error)
+        self.assertIsNone(self.client.get(reverse('job_status', args=[job.pk])).json()['download_url'])
+
+    def test_idle_worker_purges_at_most_once_per_interval(self):
+        from . import jobs
+        from .management.commands.run_worker import Command
+
+        worker = Command()
+        worker.lock, worker.next_purge = threading.Lock(), 0.0
+        with mock.patch('bills.jobs.purge_finished') as purge:
+            worker.purge_if_due()
+            worker.purge_if_due()
+            self.assertEqual(purge.call_count, 1)
+
+            later = time.monotonic() + jobs.PURGE_INTERVAL.total_seconds() + 1
+            with mock.patch('bills.management.commands.run_worker.time.monotonic', return_value=later):
+                worker.purge_if_due()
+            self.assertEqual(purge.call_count, 2)
+
+
+class MonthlySpendTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.client.force_login(self.user)
+
+    def rows(self):
+        return sorted(
+            MonthlySpend.objects.filter(user=self.user).values_list('month', 'category', 'total', 'count')
+        )
+
+    def test_rollups_follow_payments_edits_and_deletes(self):
+        from . import spending
+
+        now = timezone.now()
+        this_month = spending.month_of(now)
+        last_month = spending.add_months(this_month, -1)
+        bill = make_bill(self.user, amount='100.00')
+        self.assertEqual(self.rows(), [])
+
+        self.client.post(reverse('bill-pay', args=[bill.pk]))
+        self.assertEqual(self.rows(), [(this_month, 'electricity', Decimal('100.00'), 1)])
+
+        bill.refresh_from_db()
+        bill.payment_date = timezone.localtime(now).replace(day=1) - timedelta(days=3)
+        bill.category = 'water'
+        bill.save()
+        self.assertEqual(self.rows(), [(last_month, 'water', Decimal('100.00'), 1)])
+
+        bill.delete()
+        self.assertEqual(self.rows(), [])
+
+    def test_rebuild_matches_incremental_rows(self):
+        for days in (5, 40, 400):
+            make_bill(self.user, status='paid', payment_date=timezone.now() - timedelta(days=days))
+        incremental = self.rows()
+
+        call_command('rebuild_monthly_spend', stdout=StringIO())
+
+        self.assertEqual(self.rows(), incremental)
+        self.assertEqual(len(incremental), 3)
+
+    def test_analytics_reads_rollups_with_year_over_year(self):
+        from . import spending
+
+        this_month = spending.month_of(timezone.now())
+        MonthlySpend.objects.create(user=self.user, month=this_month, category='water', total=300, count=2)
+        MonthlySpend.objects.create(
+            user=self.user, month=spending.add_months(this_month, -12), category='water', total=200, count=1
+        )
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('analytics_data'), {'months': 24, 'compare': 'yoy'})
+        self.assertFalse(any(Bill._meta.db_table in q['sql'] for q in queries.captured_queries))
+
+        data = response.json()
+        self.assertEqual(len(data['monthly']['data']), 24)
+        self.assertEqual(data['monthly']['data'][-1], 300.0)
+        self.assertEqual(data['previous_year']['data'][-1], 200.0)
+        self.assertEqual(data['previous_year']['change_percent'], 150.0)
+        self.assertEqual(data['categories']['labels'], ['Water'])
+
+
+class ForecastTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.client.force_login(self.user)
+        cache.clear()
+
+    def pay(self, months_ago, amount, category='electricity'):
+        from . import spending
+
+        month = spending.add_months(spending.month_of(timezone.now()), -months_ago)
+        paid = spending.month_range(month)[0] + timedelta(days=10)
+        return make_bill(self.user, amount=amount, category=category, status='paid', payment_date=paid)
+
+    def test_projects_moving_average_and_trend(self):
+        # Rises by 100 a month: 100, 200, ..., 600
+        for months_ago, amount in zip(range(6, 0, -1), range(100, 700, 100)):
+            self.pay(months_ago, amount)
+
+        forecast = self.client.get(reverse('spending_forecast')).json()
+
+        self.assertEqual(len(forecast['months']), 3)
+        electricity, = forecast['categories']
+        self.assertEqual(electricity['moving_average'], 500.0)
+        self.assertEqual(electricity['trend_per_month'], 100.0)
+        self.assertEqual(electricity['projected'], [700.0, 800.0, 900.0])
+
+    def test_recurring_bills_set_a_floor_and_changes_invalidate_the_cache(self):
+        from . import spending
+
+        self.pay(1, 100, category='internet')
+        next_month = spending.month_range(spending.add_months(spending.month_of(timezone.now()), 1))[0]
+        make_bill(
+            self.user, category='internet', amount='1500.00', recurring=True, recurrence_frequency='monthly',
+            due_date=next_month + timedelta(days=4),
+        )
+
+        internet, = self.client.get(reverse('spending_forecast')).json()['categories']
+        self.assertEqual(internet['recurring'], [1500.0, 1500.0, 1500.0])
+        self.assertEqual(internet['projected'], [1500.0, 1500.0, 1500.0])
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('spending_forecast'))
+        self.assertFalse(any(Bill._meta.db_table in q['sql'] for q in queries.captured_queries))
+
+        self.pay(2, 100, category='water')
+        labels = [c['category'] for c in self.client.get(reverse('spending_forecast')).json()['categories']]
+        self.assertEqual(labels, ['internet', 'water'])
+
+    def test_series_with_several_pending_bills_is_counted_once(self):
+        from . import spending
+
+        next_month = spending.month_range(spending.add_months(spending.month_of(timezone.now()), 1))[0]
+        first = make_bill(
+            self.user, category='internet', amount='1500.00', recurring=True, recurrence_frequency='monthly',
+            due_date=next_month + timedelta(days=4),
+        )
+        # The following bill is created ahead of its due date while the first is unpaid
+        second_due = recurrence.nth_occurrence(first.due_date, 'monthly', 1)
+        recurrence.create_due_bills(now=second_due - timedelta(days=3))
+        self.assertEqual(Bill.objects.filter(user=self.user, status='pending').count(), 2)
+
+        internet, = forecast.compute_forecast(self.user.pk)['categories']
+        self.assertEqual(internet['recurring'], [1500.0, 1500.0, 1500.0])
+
+
+class ResponseCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = make_user()
+        self.client.force_login(self.user)
+
+    def test_cached_until_the_users_data_changes(self):
+        bill = make_bill(self.user, name='Water')
+        url = reverse('search_bills')
+
+        first = self.client.get(url, {'q': 'water'})
+        self.assertEqual(first['X-Cache'], 'miss')
+        with self.assertNumQueries(2):  # session and user only
+            second = self.client.get(url, {'q': 'water'})
+        self.assertEqual(second['X-Cache'], 'hit')
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(self.client.get(url, {'q': 'wat'})['X-Cache'], 'miss')
+
+        bill.name = 'Water bill'
+        bill.save()
+        refreshed = self.client.get(url, {'q': 'water'})
+        self.assertEqual(refreshed['X-Cache'], 'miss')
+        self.assertEqual(refreshed.json()['bills'][0]['name'], 'Water bill')
+
+        # Bulk writes bump the version explicitly
+        make_bill(self.user, status='pending', days=-3)
+        self.client.get(reverse('calendar_events'))
+        self.client.post(reverse('mark_all_notifications_read'))
+        self.assertEqual(self.client.get(reverse('calendar_events'))['X-Cache'], 'miss')
+
+    def test_entries_are_per_user(self):
+        make_bill(self.user, name='Rent', category='rent')
+        self.client.get(reverse('analytics_data'))
+
+        self.client.force_login(make_user('bob'))
+        response = self.client.get(reverse('analytics_data'))
+        self.assertEqual(response['X-Cache'], 'miss')
+
+    def test_staff_can_read_hit_and_miss_counters(self):
+        url = reverse('analytics_data')
+        self.client.get(url)
+        self.client.get(url)
+        self.client.get(url)
+
+        self.assertEqual(self.client.get(reverse('admin_cache_stats')).status_code, 302)
+        self.client.force_login(make_user('admin', is_staff=True))
+        stats = self.client.get(reverse('admin_cache_stats')).json()['caches']['analytics']
+        self.assertEqual((stats['hits'], stats['misses'], stats['hit_rate']), (2, 1, 0.667))
+
+
+class CalendarEventsTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.client.force_login(self.user)
+        cache.clear()
+
+    def events(self, start, end):
+        response = self.client.get(reverse('calendar_events'), {'start': start.isoformat(), 'end': end.isoformat()})
+        return response.json()
+
+    def test_reads_stored_occurrences_in_a_constant_number_of_queries(self):
+        start = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=300)
+        end = start + timedelta(days=42)
+        for i in range(10):
+            make_bill(self.user, name=f'Weekly {i}', days=-3, recurring=True, recurrence_frequency='weekly')
+        monthly = make_bill(self.user, name='Rent', days=-95, recurring=True, recurrence_frequency='monthly')
+
+        with self.assertNumQueries(4):  # session, user, bills, occurrences
+            events = self.events(start, end)
+
+        weekly_0 = [e for e in events if e['title'].startswith('Weekly 0 ')]
+        self.assertEqual(len(weekly_0), 6)
+        self.assertTrue(all(e['extendedProps']['is_future'] for e in weekly_0))
+        self.assertEqual(len({e['start'][:10] for e in weekly_0}), 6)
+        rent = [e for e in events if e['title'].startswith('Rent')]
+        self.assertEqual({e['start'][8:10] for e in rent}, {timezone.localtime(monthly.due_date).strftime('%d')})
+        self.assertEqual({e['extendedProps']['original_bill_id'] for e in rent}, {monthly.pk})
+
+    def test_occurrences_with_a_bill_show_as_the_bill(self):
+        make_bill(self.user, name='Gym', days=-3, recurring=True, recurrence_frequency='weekly')
+        created = recurrence.create_due_bills()
+        start = timezone.now()
+
+        events = [e for e in self.events(start, start + timedelta(days=20)) if e['title'].startswith('Gym')]
+
+        self.assertEqual(len(created), 1)
+        self.assertEqual([e['id'] for e in events if not e['extendedProps'].get('is_future')], [created[0].pk])
+        self.assertEqual(len(events), len({e['start'][:10] for e in events}))
+
+    def test_paid_bills_do_not_duplicate_their_successors_occurrences(self):
+        bill = make_bill(self.user, name='Internet', days=-40, recurring=True, recurrence_frequency='monthly')
+        self.client.post(reverse('bill-pay', args=[bill.pk]))
+        start = timezone.now()
+
+        future = [e for e in self.events(start, start + timedelta(days=120)) if e['extendedProps'].get('is_future')]
+
+        self.assertEqual(len(future), len({e['start'][:10] for e in future}))
+        self.assertTrue(all(e['extendedProps']['original_bill_id'] != bill.pk for e in future))
+
+
+class PaymentTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.client.force_login(self.user)
+        cache.clear()
+
+    def test_get_only_confirms(self):
+        bill = make_bill(self.user)
+
+        response = self.client.get(reverse('bill-pay', args=[bill.pk]))
+
+        self.assertTemplateUsed(response, 'bills/bill_confirm_payment.html')
+        bill.refresh_from_db()
+        self.assertEqual(bill.status, 'pending')
+
+    def test_paying_twice_creates_one_next_occurrence(self):
+        bill = make_bill(self.user, recurring=True, recurrence_frequency='monthly')
+        Notification.objects.create(user=self.user, bill=bill, title='Due', message='x', notification_type='due_soon')
+
+        self.client.post(reverse('bill-pay', args=[bill.pk]))
+        self.client.post(reverse('bill-pay', args=[bill.pk]))
+
+        bill.refresh_from_db()
+        self.assertEqual(bill.status, 'paid')
+        self.assertEqual(Bill.objects.filter(user=self.user, name=bill.name).count(), 2)
+        self.assertEqual(
+            list(Notification.objects.filter(bill=bill).values_list('notification_type', flat=True)), ['payment']
+        )
+        self.assertEqual(get_summary(self.user).paid_count, 1)
+
+    def test_bulk_payment_runs_a_constant_number_of_queries(self):
+        def pay_many(count, key):
+            ids = [
+                make_bill(self.user, name=f'Bill {key} {i}', recurring=i % 2 == 0, recurrence_frequency='monthly').pk
+                for i in range(count)
+            ]
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(
+                    reverse('bills-pay'), {'ids': ids}, content_type='application/json',
+                    headers={'Idempotency-Key': key},
+                )
+            return ids, response, len(queries)
+
+        _, _, few = pay_many(2, 'a')
+        ids, response, many = pay_many(20, 'b')
+
+        self.assertEqual(few, many)
+        result = response.json()
+        self.assertEqual(result['paid'], ids)
+        self.assertEqual(len(result['next_bills']), 10)
+        self.assertEqual(Notification.objects.filter(bill_id__in=ids, notification_type='payment').count(), 20)
+
+        replay = self.client.post(
+            reverse('bills-pay'), {'ids': ids}, content_type='application/json', headers={'Idempotency-Key': 'b'}
+        )
+        self.assertEqual(replay['Idempotent-Replayed'], 'true')
+        self.assertEqual(replay.json(), result)
+        again = self.client.post(reverse('bills-pay'), {'ids': ids[:3]}, content_type='application/json')
+        self.assertEqual(again.json(), {'paid': [], 'skipped': ids[:3], 'next_bills': []})
+
+    def test_bulk_payment_only_touches_own_bills(self):
+        other = make_bill(make_user('bob'))
+
+        response = self.client.post(reverse('bills-pay'), {'ids': [other.pk]})
+
+        self.assertEqual(response.json()['skipped'], [other.pk])
+        other.refresh_from_db()
+        self.assertEqual(other.status, 'pending')
+        self.assertEqual(self.client.get(reverse('bills-pay')).status_code, 405)
+
+
+class RecurringSeriesTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        cache.clear()
+
+    def test_dates_follow_the_calendar_without_drift(self):
+        jan_31 = timezone.make_aware(datetime(2027, 1, 31, 9))
+        bill = make_bill(self.user, due_date=jan_31, recurring=True, recurrence_frequency='monthly')
+        series = bill.occurrence.series
+
+        self.assertEqual(bill.get_next_due_date().date(), date(2027, 2, 28))
+        self.assertEqual(recurrence.due_date_of(series, 2).date(), date(2027, 3, 31))
+        self.assertEqual(recurrence.due_date_of(series, 13).date(), date(2028, 2, 29))
+        self.assertEqual(
+            [o.due_date.day for o in series.occurrences.filter(index__in=[1, 2, 3])], [28, 31, 30]
+        )
+
+    def test_materialize_recurrences_adopts_existing_bills_and_is_repeatable(self):
+        Bill.objects.bulk_create([
+            Bill(user=self.user, name='Water', amount='300.00', due_date=timezone.now() - timedelta(days=1),
+                 recurring=True, recurrence_frequency='weekly'),
+            Bill(user=self.user, name='Old', amount='300.00', due_date=timezone.now() - timedelta(days=400),
+                 status='paid', recurring=True, recurrence_frequency='monthly'),
+        ])
+
+        call_command('materialize_recurrences', '--horizon-days', '60', stdout=StringIO())
+        call_command('materialize_recurrences', '--horizon-days', '60', stdout=StringIO())
+
+        series = RecurringSeries.objects.get()
+        self.assertEqual(series.name, 'Water')
+        self.assertEqual(series.occurrences.count(), 9)  # the bill and 8 weeks ahead
+        self.assertEqual(Bill.objects.filter(name='Water').count(), 2)  # next week's is within the lead time
+
+    def test_reminders_see_bills_created_for_upcoming_occurrences(self):
+        bill = make_bill(self.user, name='Gym', days=-5, status='paid', recurring=True, recurrence_frequency='weekly')
+
+        call_command('send_reminders', stdout=StringIO())
+
+        upcoming = Bill.objects.get(name='Gym', status='pending')
+        self.assertEqual(upcoming.occurrence.index, 1)
+        self.assertEqual(upcoming.due_date, recurrence.due_date_of(bill.occurrence.series, 1))
+        self.assertTrue(upcoming.reminder_sent)
+
+    def test_paying_bills_the_stored_next_occurrence_once(self):
+        bill = make_bill(self.user, recurring=True, recurrence_frequency='monthly')
+        following = RecurrenceOccurrence.objects.get(series=bill.occurrence.series, index=1)
+
+        next_bills = payments.pay_bills(self.user, [bill.pk]).next_bills
+        recurrence.create_due_bills(following.due_date)
+
+        following.refresh_from_db()
+        self.assertEqual([b.pk for b in next_bills], [following.bill_id])
+        self.assertEqual(next_bills[0].due_date, following.due_date)
+        self.assertEqual(Bill.objects.filter(name=bill.name).count(), 2)
+
+    def test_editing_the_latest_bill_reanchors_or_ends_the_series(self):
+        bill = make_bill(self.user, recurring=True, recurrence_frequency='monthly')
+        series = bill.occurrence.series
+
+        bill.due_date += timedelta(days=3)
+        bill.amount = Decimal('1700.00')
+        bill.save()
+        series.refresh_from_db()
+        self.assertEqual(series.amount, Decimal('1700.00'))
+        self.assertEqual(
+            series.occurrences.get(index=1).due_date, recurrence.nth_occurrence(bill.due_date, 'monthly', 1)
+        )
+
+        bill.recurring = False
+        bill.save()
+        series.refresh_from_db()
+        self.assertFalse(series.is_active)
+        self.assertEqual(series.occurrences.count(), 1)
+
+    def test_deleting_an_earlier_bill_skips_its_occurrence(self):
+        bill = make_bill(self.user, name='Gym', days=-3, recurring=True, recurrence_frequency='weekly')
+        later = recurrence.create_due_bills()[0]
+
+        bill.delete()
+
+        occurrence = RecurrenceOccurrence.objects.get(series=later.occurrence.series, index=0)
+        self.assertTrue(occurrence.skipped)
+        self.assertIsNone(occurrence.bill)
+        self.assertTrue(later.occurrence.series.is_active)
+
+
+class QueryInstrumentationTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        cache.clear()
+        reset_query_stats()
+
+    def test_records_queries_and_latency_per_url_name(self):
+        self.client.force_login(self.user)
+        start = timezone.now()
+
+        with self.assertLogs('bills.instrumentation', 'DEBUG') as logs:
+            response = self.client.get(reverse('calendar_events'), {'start': start.isoformat()})
+
+        stats = query_stats()['calendar_events']
+        self.assertEqual(stats['requests'], 1)
+        self.assertEqual(stats['queries']['p50'], 4)
+        self.assertEqual(stats['bytes']['p95'], len(response.content))
+        self.assertGreaterEqual(stats['total_ms']['p50'], stats['db_ms']['p50'])
+        self.assertEqual(logs.records[0].url_name, 'calendar_events')
+        self.assertEqual(logs.records[0].queries, 4)
+        self.assertEqual(logs.records[0].levelno, logging.DEBUG)
+
+    def test_slow_requests_are_logged_at_info(self):
+        self.client.force_login(self.user)
+
+        with self.settings(SLOW_REQUEST_MS=0), self.assertLogs('bills.instrumentation', 'INFO') as logs:
+            self.client.get(reverse('calendar_events'), {'start': timezone.now().isoformat()})
+
+        self.assertEqual(logs.records[0].levelno, logging.INFO)
+        self.assertTrue(logs.records[0].slow)
+
+    def test_flags_repeated_query_shapes(self):
+        bills = [make_bill(self.user, name=f'Bill {i}') for i in range(4)]
+
+        with QueryRecorder() as recorder:
+            for bill in bills:
+                Bill.objects.filter(pk=bill.pk).first()
+            list(Bill.objects.filter(pk__in=[1, 2]))
+            list(Bill.objects.filter(pk__in=[1, 2, 3]))
+
+        repeated = recorder.repeated(3)
+        self.assertEqual(len(repeated), 1)
+        self.assertEqual(repeated[0][1], 4)
+        self.assertEqual(recorder.count, 6)
+        self.assertEqual(len(recorder.shapes), 2)
+
+    def test_stats_endpoint_is_staff_only(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(reverse('admin_query_stats')).status_code, 302)
+
+        self.client.force_login(make_user('admin', is_staff=True))
+        views = self.client.get(reverse('admin_query_stats')).json()['views']
+        self.assertEqual(views['admin_query_stats']['requests'], 1)
+        self.client.post(reverse('admin_query_stats'))
+        self.assertEqual(list(self.client.get(reverse('admin_query_stats')).json()['views']), ['admin_query_stats'])
+
+
+class LoggingPipelineTests(SimpleTestCase):
+    def record(self, msg, *args, level=logging.DEBUG, **extra):
+        record = logging.LogRecord('bills.test', level, __file__, 1, msg, args, None)
+        record.__dict__.update(extra)
+        return record
+
+    def test_json_lines_include_extra_fields(self):
+        line = json.loads(JsonFormatter().format(self.record('Paid %d bills', 3, user_id=7)))
+
+        self.assertEqual(
+            (line['level'], line['logger'], line['message'], line['user_id']), ('DEBUG', 'bills.test', 'Paid 3 bills', 7)
+        )
+
+    def test_debug_events_are_sampled_per_message(self):
+        sampler = SampledFilter(rate=2, per=60)
+
+        passed = [sampler.filter(self.record('Cache miss %s', i)) for i in range(5)]
+        other = sampler.filter(self.record('Other event'))
+        warning = sampler.filter(self.record('Cache miss %s', 9, level=logging.WARNING))
+
+        self.assertEqual(passed, [True, True, False, False, False])
+        self.assertTrue(other and warning)
+        with mock.patch('bill_payment_reminder.logs.time.monotonic', return_value=time.monotonic() + 61):
+            record = self.record('Cache miss %s', 10)
+            self.assertTrue(sampler.filter(record))
+        self.assertEqual(record.suppressed, 3)
+
+    def test_sample_key_gives_each_source_its_own_quota(self):
+        sampler = SampledFilter(rate=1, per=60)
+
+        passed = [
+            sampler.filter(self.record('%s took %dms', view, 5, sample_key=view))
+            for view in ('dashboard', 'search_bills', 'dashboard')
+        ]
+
+        self.assertEqual(passed, [True, True, False])
+
+    def test_queued_handler_writes_from_a_background_thread(self):
+        stream = StringIO()
+        handler = QueuedStreamHandler(stream)
+        handler.setFormatter(JsonFormatter())
+        logger = logging.getLogger('bills.test.queued')
+        logger.addHandler(handler)
+        logger.propagate = False
+        self.addCleanup(setattr, logger, 'propagate', True)
+        self.addCleanup(logger.removeHandler, handler)
+        values = ['before']
+
+        logger.warning('Values: %s', values)
+        values.append('after')
+        handler.close()
+
+        self.assertEqual(json.loads(stream.getvalue())['message'], "Values: ['before']")
+
+
+class BenchmarkToolsTests(TestCase):
+    def test_seeded_data_drives_the_view_benchmark(self):
+        call_command('seed_synthetic', '--users', '2', '--bills-per-user', '60', stdout=StringIO())
+
+        bills = Bill.objects.filter(user__username__startswith='synthetic-')
+        self.assertEqual(bills.count(), 120)
+        self.assertTrue(bills.filter(recurring=True, status='paid').exists())
+        self.assertTrue(bills.filter(recurring=False).exists())
+        self.assertTrue(RecurringSeries.objects.filter(user__username__startswith='synthetic-').exists())
+
+        cache.set('unrelated', 'kept')
+        with tempfile.TemporaryDirectory() as directory:
+            output = Path(directory) / 'bench.json'
+            args = ['--users', '1', '--repeat', '2', '--endpoint', 'bills_list', '--endpoint', 'calendar']
+            call_command('bench_views', *args, '--output', str(output), stdout=StringIO())
+            # Only the benchmark user's entries are invalidated
+            self.assertEqual(cache.get('unrelated'), 'kept')
+            report = json.loads(output.read_text())
+            self.assertEqual(set(report['endpoints']), {'bills_list', 'calendar'})
+            self.assertEqual(report['endpoints']['calendar']['queries'], 4)
+
+            report['endpoints']['calendar']['queries'] = 3
+            output.write_text(json.dumps(report))
+            with self.assertRaisesMessage(CommandError, '1 regression(s)'):
+                call_command('bench_views', *args, '--baseline', str(output), '--tolerance', '100', stdout=StringIO())
+
+    def test_seeded_users_are_deleted_without_per_bill_receivers(self):
+        from . import search
+
+        call_command('seed_synthetic', '--users', '2', '--bills-per-user', '30', stdout=StringIO())
+        kept = make_bill(make_user(), name='Kept')
+
+        with mock.patch('bills.signals.apply_bill_change') as summary_update:
+            call_command('seed_synthetic', '--delete', stdout=StringIO())
+
+        summary_update.assert_not_called()
+        self.assertFalse(get_user_model().objects.filter(username__startswith='synthetic-').exists())
+        self.assertEqual(list(Bill.objects.all()), [kept])
+        self.assertFalse(Notification.objects.exclude(user=kept.user).exists())
+        if search.get_backend() == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute(f"SELECT rowid FROM {search.SQLITE_TABLE}")
+                self.assertEqual(cursor.fetchall(), [(kept.pk,)])
+
+
+class ProfilingTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.staff = make_user('admin', is_staff=True)
+        make_bill(self.user)
+        cache.clear()
+
+    def test_signed_token_profiles_the_request(self):
+        self.client.force_login(self.user)
+        token = issue_token(self.staff, self.user)
+
+        with self.assertLogs('bills.profiling', 'INFO'):
+            response = self.client.get(reverse('bills-list'), {'_profile': token})
+
+        self.assertEqual(response.status_code, 200)
+        run = ProfileRun.objects.get()
+        self.assertEqual(response['X-Profile-Run'], str(run.pk))
+        self.assertEqual((run.user, run.requested_by), (self.user, self.staff))
+        self.assertEqual(run.url_name, 'bills-list')
+        self.assertIn('cumulative', run.stats)
+        self.assertGreater(len(bytes(run.raw_stats)), 0)
+        self.assertEqual(len(run.queries), run.query_count)
+        self.assertTrue(any('bills_bill' in query['sql'] for query in run.queries))
+
+        # Also as a header
+        with self.assertLogs('bills.profiling', 'INFO'):
+            self.client.get(reverse('bills-list'), HTTP_X_PROFILE_TOKEN=token)
+        self.assertEqual(ProfileRun.objects.count(), 2)
+
+    async def test_profiles_under_asgi(self):
+        await self.async_client.aforce_login(self.user)
+
+        with self.assertLogs('bills.profiling', 'INFO'):
+            response = await self.async_client.get(
+                reverse('bills-list'), {'_profile': issue_token(self.staff, self.user)}
+            )
+
+        run = await ProfileRun.objects.aget()
+        self.assertEqual(response['X-Profile-Run'], str(run.pk))
+        self.assertEqual(run.url_name, 'bills-list')
+        # The sync view ran in the profiled thread
+        self.assertIn('bills_list', run.stats)
+
+    def test_ignores_invalid_foreign_and_revoked_tokens(self):
+        self.client.force_login(self.user)
+        url = reverse('bills-list')
+
+        with self.assertLogs('bills.profiling', 'INFO'):
+            response = self.client.get(url, {'_profile': issue_token(self.staff, self.user) + 'x'})
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('X-Profile-Run', response)
+            # Issued for someone else's requests
+            self.client.get(url, {'_profile': issue_token(self.staff)})
+            # Issued by a non-staff user
+            self.client.get(url, {'_profile': issue_token(self.user)})
+            with self.settings(PROFILING_TOKEN_MAX_AGE=-1):
+                self.client.get(url, {'_profile': issue_token(self.staff, self.user)})
+        self.staff.is_staff = False
+        self.staff.save()
+        self.client.get(url, {'_profile': issue_token(self.staff, self.user)})
+
+        self.assertFalse(ProfileRun.objects.exists())
+
+    def test_admin_pages_are_staff_only(self):
+        self.client.force_login(self.user)
+        with self.assertLogs('bills.profiling', 'INFO'):
+            self.client.get(reverse('bills-list'), {'_profile': issue_token(self.staff, self.user)})
+        run = ProfileRun.objects.get()
+        for url in (reverse('admin_profile_runs'), reverse('admin_profile_run_detail', args=[run.pk]),
+                    reverse('admin_profile_run_download', args=[run.pk])):
+            self.assertEqual(self.client.get(url).status_code, 302)
+
+        self.client.force_login(self.staff)
+        response = self.client.post(reverse('admin_profile_runs'), {'username': 'alice'})
+        self.assertContains(response, 'alice@example.com')
+        self.assertEqual(authorize(response.context['token'], self.user)['by'], self.staff.pk)
+        self.assertContains(self.client.get(reverse('admin_profile_run_detail', args=[run.pk])), 'bills_bill')
+        download = self.client.get(reverse('admin_profile_run_download', args=[run.pk]))
+        self.assertEqual(download.content, bytes(run.raw_stats))
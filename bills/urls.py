@@ -9,10 +9,12 @@ urlpatterns = [
     path('bills/<int:pk>/edit/', views.bill_update, name='bill-update'),
     path('bills/<int:pk>/delete/', views.bill_delete, name='bill-delete'),
     path('bills/<int:pk>/pay/', views.mark_as_paid, name='bill-pay'),
+    path('bills/pay/', views.pay_bills_bulk, name='bills-pay'),
     path('logout/', views.logout_view, name='logout'),
     
     # Notifications
     path('notifications/', views.get_notifications, name='get_notifications'),
+    path('notifications/stream/', views.notification_stream, name='notification_stream'),
     path('notifications/<int:pk>/read/', views.mark_notification_read, name='mark_notification_read'),
     path('notifications/mark-all-read/', views.mark_all_notifications_read, name='mark_all_notifications_read'),
     
@@ -24,9 +26,14 @@ urlpatterns = [
     
     # Analytics & Export
     path('api/analytics/', views.analytics_data, name='analytics_data'),
+    path('api/forecast/', views.spending_forecast, name='spending_forecast'),
     path('export/csv/', views.export_bills_csv, name='export_csv'),
     path('export/pdf/', views.export_bills_pdf, name='export_pdf'),
     
+    # Background jobs
+    path('jobs/<int:pk>/', views.job_status, name='job_status'),
+    path('jobs/<int:pk>/download/', views.job_download, name='job_download'),
+    
     # Search
     path('api/search/', views.search_bills, name='search_bills'),
     
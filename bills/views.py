@@ -3,45 +3,38 @@ from django.contrib.auth.decorators import login_required
 from django.contrib.auth import logout
 from django.contrib import messages
 from django.utils import timezone
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
+from django.db.models import Count, Max, Q
+from django.views.decorators.http import condition, require_http_methods, require_POST
 from datetime import timedelta
+import json
+import logging
+import os
+from .caching import bump_data_version, cache_user_json, cached_for_user
 from .models import Bill, Notification
 from .forms import BillForm
+from .events import get_broker, serialize_notification
+from .notifications import generate_notifications
+from .pagination import InvalidCursor, paginate_keyset, paginate_ranked
+from .search import query_digest, search_bill_ids, search_filter, search_terms
+from .summaries import get_summary
+
+logger = logging.getLogger(__name__)
+
+BILLS_PAGE_SIZE = 25
+SEARCH_PAGE_SIZE = 50
+SEARCH_MAX_PAGE_SIZE = 100
+ANALYTICS_DEFAULT_MONTHS = 6
+ANALYTICS_MAX_MONTHS = 120
+# Seconds between keepalives on the notification stream, which also check for due bills
+NOTIFICATION_HEARTBEAT = 15
+
 
 @login_required
 def dashboard(request):
-    bills = Bill.objects.filter(user=request.user)
-    
-    pending_bills = bills.filter(status='pending')
-    paid_bills = bills.filter(status='paid')
-    
-    # Get overdue and due soon bills
-    overdue_bills = []
-    due_soon_bills = []
-    
-    for bill in pending_bills:
-        if bill.is_overdue:
-            overdue_bills.append(bill)
-        elif bill.is_due_soon:
-            due_soon_bills.append(bill)
-    
-    # Get bills for the next 7 days
-    now = timezone.now()
-    seven_days_later = now + timedelta(days=7)
-    upcoming_bills = pending_bills.filter(
-        due_date__gte=now,
-        due_date__lte=seven_days_later
-    ).order_by('due_date')
-    
-    # Count paid bills this month
-    current_month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    paid_this_month = paid_bills.filter(payment_date__gte=current_month_start).count()
-    
-    # Get budgets for the user
     from .models import Budget
     from .forms import BudgetForm
     
-    budgets = Budget.objects.filter(user=request.user, is_active=True)
     budget_form = BudgetForm()
     
     # Handle budget form submission
@@ -54,18 +47,37 @@ def dashboard(request):
             messages.success(request, 'Budget goal added!')
             return redirect('dashboard')
     
+    # All counts come from one row, maintained by a single conditional aggregate
+    # (overdue / due soon are classified in SQL, see bills.summaries)
+    summary = get_summary(request.user)
+    
+    # Get bills for the next 7 days, and budgets with this month's spending;
+    # cached until the user's data changes (bills.caching)
+    now = timezone.now()
+    seven_days_later = now + timedelta(days=7)
+    
+    def panels():
+        upcoming_bills = Bill.objects.filter(
+            user=request.user,
+            status='pending',
+            due_date__gte=now,
+            due_date__lte=seven_days_later
+        ).order_by('due_date')
+        budgets = Budget.objects.filter(user=request.user, is_active=True).with_spent(now)
+        return list(upcoming_bills), list(budgets)
+    
+    upcoming_bills, budgets = cached_for_user(request.user, 'dashboard', panels, timezone.localdate())
+    
     context = {
-        'bills': bills,
-        'pending_bills': pending_bills,
-        'paid_bills': paid_bills,
-        'overdue_bills': overdue_bills,
-        'due_soon_bills': due_soon_bills,
         'upcoming_bills': upcoming_bills,
-        'total_bills': bills.count(),
-        'total_pending': pending_bills.count(),
-        'total_paid': paid_bills.count(),
-        'paid_this_month': paid_this_month,
-        'overdue_count': len(overdue_bills),
+        'summary': summary,
+        'total_bills': summary.total_count,
+        'total_pending': summary.pending_count,
+        'total_paid': summary.paid_count,
+        'paid_this_month': summary.paid_this_month,
+        'overdue_count': summary.overdue_count,
+        'due_soon_count': summary.due_soon_count,
+        'next_due_date': summary.next_due_date,
         'budgets': budgets,
         'budget_form': budget_form,
     }
@@ -90,15 +102,19 @@ def bills_list(request):
         now = timezone.now()
         bills = bills.filter(status='pending', due_date__lt=now)
     
-    # Order bills by due date (optional but recommended)
-    bills = bills.order_by('due_date')
+    # One page at a time, ordered by (due_date, id)
+    try:
+        page = paginate_keyset(bills, 'due_date', request.GET.get('cursor'), BILLS_PAGE_SIZE)
+    except InvalidCursor:
+        page = paginate_keyset(bills, 'due_date', None, BILLS_PAGE_SIZE)
     
     # Keep these for backward compatibility if needed elsewhere
     pending_bills = Bill.objects.filter(user=request.user, status='pending')
     paid_bills = Bill.objects.filter(user=request.user, status='paid')
     
     context = {
-        'bills': bills,
+        'bills': page,
+        'page': page,
         'pending_bills': pending_bills,
         'paid_bills': paid_bills,
         'status_filter': status_filter,
@@ -117,15 +133,11 @@ def bill_create(request):
                 messages.success(request, 'Bill created successfully!')
                 return redirect('dashboard')
             except Exception as e:
-                # Log the error for debugging
-                import traceback
-                error_details = traceback.format_exc()
-                print(f"ERROR SAVING BILL: {e}")
-                print(f"ERROR DETAILS: {error_details}")
+                logger.exception('Error saving bill', extra={'user_id': request.user.pk})
                 messages.error(request, f'Error saving bill: {str(e)}')
         else:
             messages.error(request, 'Please correct the errors below.')
-            print("Form errors:", form.errors)
+            logger.debug('Bill form invalid', extra={'user_id': request.user.pk, 'errors': form.errors.get_json_data()})
     else:
         form = BillForm(user=request.user)
     
@@ -162,184 +174,165 @@ def bill_delete(request, pk):
     
     return render(request, 'bills/bill_confirm_delete.html', {'bill': bill})
 
+def _idempotency_key(request):
+    """Client key for retry-safe POSTs: ``Idempotency-Key`` header or ``idempotency_key`` field"""
+    key = request.headers.get('Idempotency-Key') or request.POST.get('idempotency_key', '')
+    return key.strip()[:100]
+
+
 @login_required
+@require_http_methods(['GET', 'POST'])
 def mark_as_paid(request, pk):
-    bill = get_object_or_404(Bill, pk=pk, user=request.user)
-    
-    # DEBUG: Log recurring bill info
-    print(f"[DEBUG] Marking bill as paid: {bill.name}")
-    print(f"[DEBUG] bill.recurring = {bill.recurring}")
-    print(f"[DEBUG] bill.recurrence_frequency = '{bill.recurrence_frequency}'")
-    
-    bill.status = 'paid'
-    bill.payment_date = timezone.now()
-    bill.save()
-    
-    # Remove overdue/due_soon notifications for this bill
-    Notification.objects.filter(
-        user=request.user, bill=bill, 
-        notification_type__in=['overdue', 'due_soon']
-    ).delete()
-    
-    # Create payment confirmation notification
-    Notification.objects.create(
-        user=request.user,
-        bill=bill,
-        title='Payment Confirmed',
-        message=f'You have successfully paid "{bill.name}". Amount:\u00A0₱{bill.amount}',
-        notification_type='payment'
-    )
-    
-    # Handle recurring bills - create next occurrence
-    # Check if recurring is True AND frequency is NOT 'none'
-    if bill.recurring and bill.recurrence_frequency and bill.recurrence_frequency != 'none':
-        next_due_date = bill.get_next_due_date()
-        print(f"[DEBUG] Creating next bill with due date: {next_due_date}")
-        if next_due_date:
-            new_bill = Bill.objects.create(
-                user=request.user,
-                name=bill.name,
-                amount=bill.amount,
-                due_date=next_due_date,
-                status='pending',
-                category=bill.category,
-                notes=bill.notes,
-                recurring=True,
-                recurrence_frequency=bill.recurrence_frequency,
-                payment_method=bill.payment_method,
-            )
-            print(f"[DEBUG] Created new bill ID: {new_bill.id}")
-            messages.info(request, f'Next "{bill.name}" bill created for {next_due_date.strftime("%b %d, %Y")}')
-    else:
-        print(f"[DEBUG] NOT creating next bill - recurring={bill.recurring}, frequency='{bill.recurrence_frequency}'")
+    """Confirmation page on GET; the bill is only paid by the POST it submits"""
+    import uuid
+    from .payments import claim_idempotency_key, pay_bills, release_idempotency_key, store_idempotent_result
     
+    bill = get_object_or_404(Bill, pk=pk, user=request.user)
+    if request.method == 'GET':
+        return render(request, 'bills/bill_confirm_payment.html', {
+            'bill': bill,
+            'idempotency_key': uuid.uuid4().hex,
+        })
+    
+    # A resubmitted form or retried request with the same key is not processed again
+    key = _idempotency_key(request)
+    if key and claim_idempotency_key(request.user.pk, key) is not None:
+        messages.info(request, f'Payment for {bill.name} was already recorded.')
+        return redirect('dashboard')
+    try:
+        result = pay_bills(request.user, [bill.pk])
+    except Exception:
+        if key:
+            release_idempotency_key(request.user.pk, key)
+        raise
+    if key:
+        store_idempotent_result(request.user.pk, key, result.as_dict())
+    
+    if not result.paid:
+        messages.info(request, f'{bill.name} is already paid.')
+        return redirect('dashboard')
+    for next_bill in result.next_bills:
+        messages.info(request, f'Next "{next_bill.name}" bill created for {next_bill.due_date.strftime("%b %d, %Y")}')
     messages.success(request, f'{bill.name} marked as paid!')
     return redirect('dashboard')
 
+
+@login_required
+@require_POST
+def pay_bills_bulk(request):
+    """
+    Pay several bills in one transaction. Takes ``ids`` as repeated form
+    fields or a JSON body ``{"ids": [...]}``; answers with the paid and
+    skipped (already paid or not found) ids and any next bills created.
+    """
+    from .payments import (
+        IN_PROGRESS, MAX_BULK_PAYMENT, claim_idempotency_key, pay_bills, release_idempotency_key,
+        store_idempotent_result,
+    )
+    
+    try:
+        if request.content_type == 'application/json':
+            ids = json.loads(request.body or b'{}').get('ids', [])
+        else:
+            ids = request.POST.getlist('ids')
+        ids = [int(pk) for pk in ids]
+    except (ValueError, TypeError, AttributeError):
+        return JsonResponse({'error': 'ids must be a list of bill ids'}, status=400)
+    if not ids or len(ids) > MAX_BULK_PAYMENT:
+        return JsonResponse({'error': f'Send between 1 and {MAX_BULK_PAYMENT} bill ids'}, status=400)
+    
+    key = _idempotency_key(request)
+    if key:
+        previous = claim_idempotency_key(request.user.pk, key)
+        if previous == IN_PROGRESS:
+            return JsonResponse({'error': 'A request with this idempotency key is in progress'}, status=409)
+        if previous is not None:
+            response = JsonResponse(previous)
+            response['Idempotent-Replayed'] = 'true'
+            return response
+    try:
+        result = pay_bills(request.user, ids).as_dict()
+    except Exception:
+        if key:
+            release_idempotency_key(request.user.pk, key)
+        raise
+    if key:
+        store_idempotent_result(request.user.pk, key, result)
+    return JsonResponse(result)
+
+
 @login_required
 def logout_view(request):
     logout(request)
     messages.success(request, 'You have been logged out successfully.')
     return redirect('login')
 
-@login_required
-def dashboard(request):
-    bills = Bill.objects.filter(user=request.user)
-    
-    # DEBUG: Print all bills
-    print(f"Total bills: {bills.count()}")
-    for bill in bills:
-        print(f"Bill: {bill.name}, Status: {bill.status}, Due: {bill.due_date}")
-    
-    pending_bills = bills.filter(status='pending')
-    paid_bills = bills.filter(status='paid')
-    
-    # Get overdue and due soon bills
-    overdue_bills = []
-    due_soon_bills = []
-    
-    for bill in pending_bills:
-        if bill.is_overdue:
-            overdue_bills.append(bill)
-        elif bill.is_due_soon:
-            due_soon_bills.append(bill)
-    
-    # Get bills for the next 7 days
-    now = timezone.now()
-    seven_days_later = now + timedelta(days=7)
-    
-    # DEBUG
-    print(f"Now: {now}")
-    print(f"Seven days later: {seven_days_later}")
-    
-    upcoming_bills = pending_bills.filter(
-        due_date__gte=now,
-        due_date__lte=seven_days_later
-    ).order_by('due_date')
-    
-    # DEBUG
-    print(f"Upcoming bills count: {upcoming_bills.count()}")
-    
-    # Count paid bills this month
-    current_month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    paid_this_month = paid_bills.filter(payment_date__gte=current_month_start).count()
+
+def notifications_etag(request):
+    """Cheap per-user version of the notifications payload"""
+    if not request.user.is_authenticated:
+        return None
     
-    context = {
-        'bills': bills,
-        'pending_bills': pending_bills,
-        'paid_bills': paid_bills,
-        'overdue_bills': overdue_bills,
-        'due_soon_bills': due_soon_bills,
-        'upcoming_bills': upcoming_bills,
-        'total_bills': bills.count(),
-        'total_pending': pending_bills.count(),
-        'total_paid': paid_bills.count(),
-        'paid_this_month': paid_this_month,
-        'overdue_count': len(overdue_bills),
-    }
+    # Generate any new notifications
+    generate_notifications(request.user)
     
-    return render(request, 'bills/dashboard.html', context)
-
-
-def generate_notifications(user):
-    """Generate notifications for overdue and due soon bills"""
-    pending_bills = Bill.objects.filter(user=user, status='pending')
-    
-    for bill in pending_bills:
-        # Check for overdue bills - create notification if not already exists
-        if bill.is_overdue:
-            existing = Notification.objects.filter(
-                user=user, bill=bill, notification_type='overdue'
-            ).exists()
-            if not existing:
-                Notification.objects.create(
-                    user=user,
-                    bill=bill,
-                    title='Overdue Bill',
-                    message=f'"{bill.name}" was due on {bill.due_date.strftime("%b %d, %Y at %I:%M %p")}. Amount:\u00A0₱{bill.amount}',
-                    notification_type='overdue'
-                )
-        # Check for due soon bills
-        elif bill.is_due_soon:
-            existing = Notification.objects.filter(
-                user=user, bill=bill, notification_type='due_soon'
-            ).exists()
-            if not existing:
-                Notification.objects.create(
-                    user=user,
-                    bill=bill,
-                    title='Bill Due Soon',
-                    message=f'"{bill.name}" is due on {bill.due_date.strftime("%b %d, %Y at %I:%M %p")}. Amount:\u00A0₱{bill.amount}',
-                    notification_type='due_soon'
-                )
+    version = Notification.objects.filter(user=request.user).aggregate(
+        latest=Max('id'),
+        total=Count('id'),
+        unread=Count('id', filter=Q(is_read=False)),
+    )
+    request.notifications_version = version
+    return f"{version['latest'] or 0}-{version['total']}-{version['unread']}"
 
 
 @login_required
+@condition(etag_func=notifications_etag)
 def get_notifications(request):
-    """API endpoint to get user notifications"""
-    # Generate any new notifications
-    generate_notifications(request.user)
-    
+    """API endpoint to get user notifications (honors If-None-Match)"""
     notifications = Notification.objects.filter(user=request.user)[:10]
-    unread_count = Notification.objects.filter(user=request.user, is_read=False).count()
+    unread_count = request.notifications_version['unread']
     
     data = {
         'unread_count': unread_count,
-        'notifications': [
-            {
-                'id': n.id,
-                'title': n.title,
-                'message': n.message,
-                'type': n.notification_type,
-                'icon': n.icon,
-                'color': n.color,
-                'is_read': n.is_read,
-                'created_at': n.created_at.strftime('%b %d, %H:%M'),
-            }
-            for n in notifications
-        ]
+        'notifications': [serialize_notification(n) for n in notifications],
     }
-    return JsonResponse(data)
+    response = JsonResponse(data)
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+@login_required
+async def notification_stream(request):
+    """Server-Sent Events stream of new notifications (needs the ASGI app)"""
+    from asgiref.sync import sync_to_async
+    from django.core.handlers.asgi import ASGIRequest
+    from django.http import HttpResponse
+    
+    if not isinstance(request, ASGIRequest):
+        # Under WSGI the endless stream would be read into memory and pin a worker;
+        # 204 tells EventSource not to reconnect, and the page falls back to polling
+        return HttpResponse(status=204)
+    
+    user = await request.auser()
+    broker = get_broker()
+    
+    async def events():
+        # Ask the browser to wait 5s before reconnecting after a drop
+        yield 'retry: 5000\n\n'
+        async for payload in broker.listen(user.pk, heartbeat=NOTIFICATION_HEARTBEAT):
+            if payload is None:
+                # The page stops polling while the stream is open, so bills that
+                # became due or overdue are checked here (watermark-gated, cheap);
+                # new notifications come back through the broker
+                await sync_to_async(generate_notifications)(user)
+                yield ': keepalive\n\n'
+            else:
+                yield f"id: {payload['id']}\nevent: notification\ndata: {json.dumps(payload)}\n\n"
+    
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
 
 
 @login_required
@@ -355,6 +348,7 @@ def mark_notification_read(request, pk):
 def mark_all_notifications_read(request):
     """Mark all notifications as read"""
     Notification.objects.filter(user=request.user, is_read=False).update(is_read=True)
+    bump_data_version(request.user.pk)
     return JsonResponse({'status': 'ok'})
 
 
@@ -403,7 +397,7 @@ def settings_view(request):
         'pm_form': PaymentMethodForm(),
         'budget_form': BudgetForm(),
         'payment_methods': PaymentMethod.objects.filter(user=request.user),
-        'budgets': Budget.objects.filter(user=request.user, is_active=True),
+        'budgets': Budget.objects.filter(user=request.user, is_active=True).with_spent(),
     }
     return render(request, 'bills/settings.html', context)
 
@@ -454,197 +448,229 @@ def delete_budget(request, pk):
 # ============ ANALYTICS DATA ============
 
 @login_required
+@cache_user_json('analytics')
 def analytics_data(request):
-    """API endpoint for dashboard charts"""
-    from django.db.models import Sum
-    from django.db.models.functions import TruncMonth
-    from collections import defaultdict
-    import json
+    """
+    API endpoint for dashboard charts, read from the monthly spending rollups.
     
-    # Monthly spending for last 6 months
-    now = timezone.now()
-    six_months_ago = now - timedelta(days=180)
-    
-    monthly_data = Bill.objects.filter(
-        user=request.user,
-        status='paid',
-        payment_date__gte=six_months_ago
-    ).annotate(
-        month=TruncMonth('payment_date')
-    ).values('month').annotate(
-        total=Sum('amount')
-    ).order_by('month')
-    
-    months = []
-    amounts = []
-    for item in monthly_data:
-        if item['month']:
-            months.append(item['month'].strftime('%b %Y'))
-            amounts.append(float(item['total'] or 0))
-    
-    # Category breakdown
-    category_data = Bill.objects.filter(
-        user=request.user,
-        status='paid',
-        payment_date__gte=six_months_ago
-    ).values('category').annotate(
-        total=Sum('amount')
-    )
+    ``?months=N`` (default 6, at most 120) covers the current month and the
+    N - 1 before it; ``?compare=yoy`` adds the same months one year earlier.
+    """
+    from .spending import add_months, month_of, spending_by_month
     
-    categories = []
-    category_amounts = []
-    category_colors = []
-    for item in category_data:
-        categories.append(dict(Bill.CATEGORY_CHOICES).get(item['category'], item['category']))
-        category_amounts.append(float(item['total'] or 0))
-        category_colors.append(Bill.CATEGORY_COLORS.get(item['category'], '#64748b'))
+    try:
+        months = min(max(int(request.GET.get('months', ANALYTICS_DEFAULT_MONTHS)), 1), ANALYTICS_MAX_MONTHS)
+    except ValueError:
+        return JsonResponse({'error': 'months must be a whole number'}, status=400)
+    compare = request.GET.get('compare') == 'yoy'
+    
+    last_month = month_of(timezone.now())
+    first_month = add_months(last_month, 1 - months)
+    range_months = [add_months(first_month, i) for i in range(months)]
+    spend = spending_by_month(request.user, add_months(first_month, -12) if compare else first_month, last_month)
+    
+    def month_totals(month):
+        return sum(total for total, _ in spend.get(month, {}).values())
+    
+    amounts = [float(month_totals(month)) for month in range_months]
+    category_totals = {}
+    for month in range_months:
+        for category, (total, _) in spend.get(month, {}).items():
+            category_totals[category] = category_totals.get(category, 0) + total
+    
+    category_labels = dict(Bill.CATEGORY_CHOICES)
+    data = {
+        'monthly': {'labels': [month.strftime('%b %Y') for month in range_months], 'data': amounts},
+        'categories': {
+            'labels': [category_labels.get(category, category) for category in category_totals],
+            'data': [float(total) for total in category_totals.values()],
+            'colors': [Bill.CATEGORY_COLORS.get(category, '#64748b') for category in category_totals],
+        },
+    }
+    if compare:
+        previous = [float(month_totals(add_months(month, -12))) for month in range_months]
+        total, previous_total = sum(amounts), sum(previous)
+        data['previous_year'] = {
+            'labels': [add_months(month, -12).strftime('%b %Y') for month in range_months],
+            'data': previous,
+            'total': previous_total,
+            'change_percent': round((total - previous_total) / previous_total * 100, 1) if previous_total else None,
+        }
+    return JsonResponse(data)
+
+
+@login_required
+def spending_forecast(request):
+    """Projected spending per category for the next ``?months=N`` months (default 3)"""
+    from .forecast import HORIZON, MAX_HORIZON, get_forecast
     
-    return JsonResponse({
-        'monthly': {'labels': months, 'data': amounts},
-        'categories': {'labels': categories, 'data': category_amounts, 'colors': category_colors},
-    })
+    try:
+        months = min(max(int(request.GET.get('months', HORIZON)), 1), MAX_HORIZON)
+    except ValueError:
+        return JsonResponse({'error': 'months must be a whole number'}, status=400)
+    return JsonResponse(get_forecast(request.user, months))
 
 
 # ============ EXPORT FUNCTIONALITY ============
 
+def _read_file(f, chunk_size=64 * 1024):
+    with f:
+        while chunk := f.read(chunk_size):
+            yield chunk
+
+
+async def _aiterate(chunks):
+    """Async view of the sync generator ``chunks``, advanced in the thread that owns the DB connection"""
+    from asgiref.sync import sync_to_async
+    
+    next_chunk = sync_to_async(next, thread_sensitive=True)
+    while (chunk := await next_chunk(chunks, None)) is not None:
+        yield chunk
+
+
+def _stream_file(request, f):
+    from django.core.handlers.asgi import ASGIRequest
+    
+    chunks = _read_file(f)
+    return _aiterate(chunks) if isinstance(request, ASGIRequest) else chunks
+
+
 @login_required
 def export_bills_csv(request):
-    """Export bills to CSV"""
-    import csv
-    from django.http import HttpResponse
+    """Export bills to CSV, streamed a chunk of rows at a time"""
+    from django.core.handlers.asgi import ASGIRequest
+    from .reports import EXPORT_FILTERS, csv_chunks, filter_bills
     
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = f'attachment; filename="bills_{timezone.now().strftime("%Y%m%d")}.csv"'
+    filters = {key: request.GET.get(key, '') for key in EXPORT_FILTERS}
+    if request.GET.get('background'):
+        return _enqueue_export(request, 'export_csv', filters)
     
-    writer = csv.writer(response)
-    writer.writerow(['Name', 'Amount', 'Due Date', 'Status', 'Category', 'Payment Date', 'Payment Method', 'Notes'])
+    chunks = csv_chunks(filter_bills(request.user, filters))
     
-    # Get filter parameters
-    status = request.GET.get('status', '')
-    date_from = request.GET.get('from', '')
-    date_to = request.GET.get('to', '')
+    # Under ASGI a sync iterator would be read into memory before sending.
+    # values_list().aiterator() opens its cursor outside sync_to_async on this
+    # Django version, so the sync generator is advanced a chunk at a time instead.
+    content = _aiterate(chunks) if isinstance(request, ASGIRequest) else chunks
+    response = StreamingHttpResponse(content, content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="bills_{timezone.now().strftime("%Y%m%d")}.csv"'
+    return response
+
+
+@login_required
+def export_bills_pdf(request):
+    """Export bills to PDF, served from the report cache when nothing changed"""
+    from .reports import EXPORT_FILTERS, filter_bills, get_bills_report
     
-    bills = Bill.objects.filter(user=request.user)
+    filters = {key: request.GET.get(key, '') for key in EXPORT_FILTERS}
+    if request.GET.get('background'):
+        return _enqueue_export(request, 'export_pdf', filters)
     
-    if status:
-        bills = bills.filter(status=status)
-    if date_from:
-        bills = bills.filter(due_date__gte=date_from)
-    if date_to:
-        bills = bills.filter(due_date__lte=date_to)
-    
-    for bill in bills.order_by('-due_date'):
-        writer.writerow([
-            bill.name,
-            bill.amount,
-            bill.due_date.strftime('%Y-%m-%d %H:%M'),
-            bill.get_status_display(),
-            bill.get_category_display(),
-            bill.payment_date.strftime('%Y-%m-%d %H:%M') if bill.payment_date else '',
-            bill.payment_method.name if bill.payment_method else '',
-            bill.notes or '',
-        ])
+    # Opened right away: a newer build may replace the cached file meanwhile
+    report = get_bills_report(request.user, filter_bills(request.user, filters), filters).open('rb')
     
+    response = StreamingHttpResponse(_stream_file(request, report), content_type='application/pdf')
+    response['Content-Length'] = os.fstat(report.fileno()).st_size
+    response['Content-Disposition'] = f'attachment; filename="bills_report_{timezone.now().strftime("%Y%m%d")}.pdf"'
     return response
 
 
-@login_required
-def export_bills_pdf(request):
-    """Export bills to PDF"""
-    from django.http import HttpResponse
-    from io import BytesIO
+def _enqueue_export(request, kind, filters):
+    """Hand the export to the job queue and point the client at the job's status"""
+    from django.urls import reverse
+    from .jobs import enqueue
     
-    # Simple HTML to PDF approach
-    html_content = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <style>
-            body {{ font-family: Arial, sans-serif; margin: 20px; }}
-            h1 {{ color: #2563eb; }}
-            table {{ width: 100%; border-collapse: collapse; margin-top: 20px; }}
-            th, td {{ padding: 10px; text-align: left; border-bottom: 1px solid #ddd; }}
-            th {{ background: #2563eb; color: white; }}
-            .paid {{ color: green; }}
-            .pending {{ color: orange; }}
-            .total {{ font-weight: bold; font-size: 18px; margin-top: 20px; }}
-        </style>
-    </head>
-    <body>
-        <h1>Bill Payment Report</h1>
-        <p>Generated on: {timezone.now().strftime('%B %d, %Y')}</p>
-        <table>
-            <thead>
-                <tr>
-                    <th>Bill Name</th>
-                    <th>Amount</th>
-                    <th>Due Date</th>
-                    <th>Status</th>
-                    <th>Category</th>
-                </tr>
-            </thead>
-            <tbody>
-    """
+    job = enqueue(kind, user=request.user, filters=filters)
+    return JsonResponse({
+        'id': job.pk,
+        'status': job.status,
+        'status_url': reverse('job_status', args=[job.pk]),
+    }, status=202)
+
+
+# ============ BACKGROUND JOBS ============
+
+def _job_payload(job):
+    from django.urls import reverse
     
-    bills = Bill.objects.filter(user=request.user).order_by('-due_date')
-    total = 0
+    return {
+        'id': job.pk,
+        'kind': job.kind,
+        'status': job.status,
+        'created_at': job.created_at.isoformat(),
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+        'error': job.error,
+        'download_url': reverse('job_download', args=[job.pk]) if job.has_result else None,
+    }
+
+
+@login_required
+def job_status(request, pk):
+    """Polled by the client until the job is done or failed"""
+    from .models import Job
     
-    for bill in bills:
-        status_class = 'paid' if bill.status == 'paid' else 'pending'
-        html_content += f"""
-            <tr>
-                <td>{bill.name}</td>
-                <td>₱{bill.amount}</td>
-                <td>{bill.due_date.strftime('%b %d, %Y')}</td>
-                <td class="{status_class}">{bill.get_status_display()}</td>
-                <td>{bill.get_category_display()}</td>
-            </tr>
-        """
-        total += bill.amount
-    
-    html_content += f"""
-            </tbody>
-        </table>
-        <p class="total">Total: ₱{total}</p>
-    </body>
-    </html>
-    """
+    job = get_object_or_404(Job.objects.defer('result_data'), pk=pk, user=request.user)
+    response = JsonResponse(_job_payload(job))
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+@login_required
+def job_download(request, pk):
+    """The file a finished export job produced"""
+    from io import BytesIO
+    from django.http import Http404
+    from .models import Job
     
-    response = HttpResponse(content_type='text/html')
-    response['Content-Disposition'] = f'attachment; filename="bills_report_{timezone.now().strftime("%Y%m%d")}.html"'
-    response.write(html_content)
+    job = get_object_or_404(Job, pk=pk, user=request.user)
+    if not job.has_result:
+        raise Http404('This job has no file to download.')
+    result = bytes(job.result_data)
     
+    response = StreamingHttpResponse(_stream_file(request, BytesIO(result)), content_type=job.result_content_type)
+    response['Content-Length'] = len(result)
+    response['Content-Disposition'] = f'attachment; filename="{job.result_filename}"'
     return response
 
 
 # ============ SEARCH & FILTER (AJAX) ============
 
 @login_required
+@cache_user_json('search')
 def search_bills(request):
     """AJAX search for bills"""
     query = request.GET.get('q', '')
     status = request.GET.get('status', '')
     category = request.GET.get('category', '')
-    sort = request.GET.get('sort', 'due_date')
     
     bills = Bill.objects.filter(user=request.user)
-    
-    if query:
-        bills = bills.filter(name__icontains=query)
     if status:
         bills = bills.filter(status=status)
     if category:
         bills = bills.filter(category=category)
     
-    # Sorting
-    if sort == 'amount':
-        bills = bills.order_by('-amount')
-    elif sort == 'name':
-        bills = bills.order_by('name')
-    elif sort == '-due_date':
-        bills = bills.order_by('-due_date')
-    else:
-        bills = bills.order_by('due_date')
+    # Full-text match on name, notes, category and payment method (bills.search)
+    searching = bool(search_terms(query))
+    sort = request.GET.get('sort') or ('relevance' if searching else 'due_date')
+    try:
+        limit = min(max(int(request.GET.get('limit', SEARCH_PAGE_SIZE)), 1), SEARCH_MAX_PAGE_SIZE)
+    except ValueError:
+        limit = SEARCH_PAGE_SIZE
+    
+    try:
+        if sort == 'relevance' and searching:
+            # Best matches first (filtered while ranking), paged by position in the ranked list
+            ranked_ids = search_bill_ids(request.user, query, status, category)
+            key = f'{query_digest(query)}:{status}:{category}'
+            page = paginate_ranked(bills, ranked_ids, key, request.GET.get('cursor'), limit)
+        else:
+            if searching:
+                # Every match, so sorting and paging see the whole match set
+                bills = bills.filter(search_filter(request.user, query))
+            # Sorting; every ordering is keyed on (field, id) for cursor pagination
+            ordering = {'amount': '-amount', 'name': 'name', '-due_date': '-due_date'}.get(sort, 'due_date')
+            page = paginate_keyset(bills, ordering, request.GET.get('cursor'), limit)
+    except InvalidCursor:
+        return JsonResponse({'error': 'Invalid cursor'}, status=400)
     
     data = {
         'bills': [
@@ -661,8 +687,10 @@ def search_bills(request):
                 'is_overdue': b.is_overdue,
                 'is_due_soon': b.is_due_soon,
             }
-            for b in bills[:50]
-        ]
+            for b in page
+        ],
+        'next_cursor': page.next_cursor,
+        'previous_cursor': page.previous_cursor,
     }
     return JsonResponse(data)
 
@@ -676,10 +704,11 @@ def calendar_view(request):
 
 
 @login_required
+@cache_user_json('calendar')
 def calendar_events(request):
     """API endpoint returning bills as calendar events for FullCalendar"""
     from datetime import datetime
-    from dateutil.relativedelta import relativedelta
+    from .recurrence import calendar_items
     
     start = request.GET.get('start', '')
     end = request.GET.get('end', '')
@@ -688,12 +717,16 @@ def calendar_events(request):
     try:
         start_date = datetime.fromisoformat(start.replace('Z', '+00:00')) if start else timezone.now()
         end_date = datetime.fromisoformat(end.replace('Z', '+00:00')) if end else timezone.now() + timedelta(days=31)
-    except:
+    except ValueError:
         start_date = timezone.now()
         end_date = timezone.now() + timedelta(days=31)
+    if timezone.is_naive(start_date):
+        start_date = timezone.make_aware(start_date)
+    if timezone.is_naive(end_date):
+        end_date = timezone.make_aware(end_date)
     
-    # Get all bills (not just in range, we'll generate recurring events)
-    bills = Bill.objects.filter(user=request.user)
+    # Two queries: bills in range, and the stored occurrences in range that have no bill yet
+    bills, future = calendar_items(request.user, start_date, end_date)
     
     events = []
     
@@ -708,78 +741,41 @@ def calendar_events(request):
         else:
             color = Bill.CATEGORY_COLORS.get(bill.category, '#2563eb')
         
-        # Always show as all-day event (no time display)
-        is_all_day = True
-        
-        # Only add the actual bill event if it falls within the date range
-        if bill.due_date >= start_date and bill.due_date <= end_date:
-            events.append({
-                'id': bill.id,
-                'title': f'{bill.name} - ₱{bill.amount}',
-                'start': bill.due_date.isoformat(),
-                'allDay': is_all_day,
-                'backgroundColor': color,
-                'borderColor': color,
-                'extendedProps': {
-                    'status': bill.status,
-                    'category': bill.get_category_display(),
-                    'amount': str(bill.amount),
-                    'is_recurring': bill.recurring,
-                }
-            })
-        
-        # Generate future recurring events ONLY within the current view range
-        if bill.recurring and bill.recurrence_frequency and bill.recurrence_frequency != 'none':
-            # Calculate future occurrences
-            current_date = bill.due_date
-            occurrences_added = 0
-            max_occurrences = 12  # Limit iterations but only add if in date range
-            
-            while occurrences_added < max_occurrences:
-                # Calculate next date based on frequency
-                if bill.recurrence_frequency == 'weekly':
-                    next_date = current_date + timedelta(weeks=1)
-                elif bill.recurrence_frequency == 'monthly':
-                    next_date = current_date + relativedelta(months=1)
-                elif bill.recurrence_frequency == 'yearly':
-                    next_date = current_date + relativedelta(years=1)
-                else:
-                    break
-                
-                # Stop if we're past the calendar view range
-                if next_date > end_date:
-                    break
-                
-                # Only add if the date is within the current view range
-                if next_date >= start_date:
-                    # Check if a bill already exists for this date (avoid duplicates)
-                    existing = Bill.objects.filter(
-                        user=request.user,
-                        name=bill.name,
-                        due_date__date=next_date.date()
-                    ).exists()
-                    
-                    if not existing:
-                        # Add virtual future event (faded yellow - clearly different from actual bills)
-                        events.append({
-                            'id': f'future_{bill.id}_{occurrences_added}',
-                            'title': f'{bill.name} - ₱{bill.amount}',
-                            'start': next_date.isoformat(),
-                            'allDay': True,
-                            'backgroundColor': '#fef3c7',  # Light yellow background
-                            'borderColor': '#f59e0b',  # Amber border
-                            'textColor': '#92400e',  # Dark amber text
-                            'extendedProps': {
-                                'status': 'future',
-                                'category': bill.get_category_display(),
-                                'amount': str(bill.amount),
-                                'is_recurring': True,
-                                'is_future': True,
-                                'original_bill_id': bill.id,  # Link to original bill
-                            }
-                        })
-                        occurrences_added += 1
-                
-                current_date = next_date
+        # Always shown as all-day events (no time display)
+        events.append({
+            'id': bill.id,
+            'title': f'{bill.name} - ₱{bill.amount}',
+            'start': bill.due_date.isoformat(),
+            'allDay': True,
+            'backgroundColor': color,
+            'borderColor': color,
+            'extendedProps': {
+                'status': bill.status,
+                'category': bill.get_category_display(),
+                'amount': str(bill.amount),
+                'is_recurring': bill.recurring,
+            }
+        })
+    
+    for occurrence in future:
+        series = occurrence.series
+        # Virtual future event (faded yellow - clearly different from actual bills)
+        events.append({
+            'id': f'future_{series.id}_{occurrence.index}',
+            'title': f'{series.name} - ₱{series.amount}',
+            'start': occurrence.due_date.isoformat(),
+            'allDay': True,
+            'backgroundColor': '#fef3c7',  # Light yellow background
+            'borderColor': '#f59e0b',  # Amber border
+            'textColor': '#92400e',  # Dark amber text
+            'extendedProps': {
+                'status': 'future',
+                'category': series.get_category_display(),
+                'amount': str(series.amount),
+                'is_recurring': True,
+                'is_future': True,
+                'original_bill_id': occurrence.latest_bill_id,  # Link to the bill it follows
+            }
+        })
     
     return JsonResponse(events, safe=False)
\ No newline at end of file
@@ -10,3 +10,6 @@ python manage.py collectstatic --no-input
 
 # Run database migrations
 python manage.py migrate
+
+# Adopt existing recurring bills into series and store their upcoming occurrences
+python manage.py materialize_recurrences
@@ -7,6 +7,7 @@ from django.utils import timezone
 from datetime import timedelta
 from .models import CustomUser
 from bills.models import Bill, Notification
+from bills.pagination import InvalidCursor, paginate_keyset
 
 
 def is_admin(user):
@@ -97,7 +98,7 @@ def admin_user_list(request):
     except Exception as e:
         import logging
         logger = logging.getLogger(__name__)
-        logger.error(f"Error in admin_user_list: {str(e)}")
+        logger.exception('Error in admin_user_list')
         messages.error(request, f"An error occurred: {str(e)}")
         return redirect('admin_dashboard')
 
@@ -107,7 +108,13 @@ def admin_user_list(request):
 def admin_user_detail(request, pk):
     """View user details"""
     user = get_object_or_404(CustomUser, pk=pk)
-    bills = Bill.objects.filter(user=user).order_by('-due_date')[:10]
+    
+    # Newest first, paged by (due_date, id) cursors
+    bills = Bill.objects.filter(user=user)
+    try:
+        bills = paginate_keyset(bills, '-due_date', request.GET.get('cursor'), 10)
+    except InvalidCursor:
+        bills = paginate_keyset(bills, '-due_date', None, 10)
     
     context = {
         'user_obj': user,
@@ -194,3 +201,86 @@ def admin_user_delete(request, pk):
         'user_obj': user,
     }
     return render(request, 'security_management/admin/user_delete.html', context)
+
+
+@login_required
+@user_passes_test(is_admin, login_url='dashboard')
+def admin_cache_stats(request):
+    """Hit/miss counters of the per-user response cache; POST resets them"""
+    from django.conf import settings
+    from django.http import JsonResponse
+    from bills.caching import cache_stats, reset_cache_stats
+    
+    if request.method == 'POST':
+        reset_cache_stats()
+    return JsonResponse({
+        'backend': settings.CACHES['default']['BACKEND'],
+        'caches': cache_stats(),
+    })
+
+
+@login_required
+@user_passes_test(is_admin, login_url='dashboard')
+def admin_query_stats(request):
+    """Query count and latency percentiles per URL name in this process; POST resets them"""
+    from django.http import JsonResponse
+    from bills.instrumentation import SAMPLE_SIZE, query_stats, reset_query_stats
+    
+    if request.method == 'POST':
+        reset_query_stats()
+    return JsonResponse({
+        'sample_size': SAMPLE_SIZE,
+        'views': query_stats(),
+    })
+
+
+@login_required
+@user_passes_test(is_admin, login_url='dashboard')
+def admin_profile_runs(request):
+    """Profiled requests; POST issues a profiling token for a user (yourself by default)"""
+    from bills.models import ProfileRun
+    from bills.profiling import HEADER, QUERY_PARAMETER, issue_token
+    
+    token = target = None
+    if request.method == 'POST':
+        username = request.POST.get('username', '').strip()
+        target = request.user
+        if username:
+            target = CustomUser.objects.filter(Q(username=username) | Q(email=username)).first()
+        if target is None:
+            messages.error(request, f'No user "{username}".')
+        else:
+            token = issue_token(request.user, target)
+    
+    paginator = Paginator(ProfileRun.objects.select_related('user', 'requested_by').defer('stats', 'raw_stats', 'queries'), 20)
+    context = {
+        'runs': paginator.get_page(request.GET.get('page', 1)),
+        'token': token,
+        'target': target,
+        'query_parameter': QUERY_PARAMETER,
+        'header': HEADER,
+    }
+    return render(request, 'security_management/admin/profile_runs.html', context)
+
+
+@login_required
+@user_passes_test(is_admin, login_url='dashboard')
+def admin_profile_run_detail(request, pk):
+    """cProfile report and captured SQL of one profiled request"""
+    from bills.models import ProfileRun
+    
+    run = get_object_or_404(ProfileRun.objects.select_related('user', 'requested_by').defer('raw_stats'), pk=pk)
+    return render(request, 'security_management/admin/profile_run_detail.html', {'run': run})
+
+
+@login_required
+@user_passes_test(is_admin, login_url='dashboard')
+def admin_profile_run_download(request, pk):
+    """Raw stats of a profiled request as a .prof file (pstats / snakeviz)"""
+    from django.http import HttpResponse
+    from bills.models import ProfileRun
+    
+    run = get_object_or_404(ProfileRun.objects.only('raw_stats'), pk=pk)
+    response = HttpResponse(bytes(run.raw_stats), content_type='application/octet-stream')
+    response['Content-Disposition'] = f'attachment; filename="profile-{run.pk}.prof"'
+    return response
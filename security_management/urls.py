@@ -17,6 +17,12 @@ urlpatterns = [
     path('admin-panel/users/<int:pk>/edit/', admin_views.admin_user_edit, name='admin_user_edit'),
     path('admin-panel/users/<int:pk>/toggle/', admin_views.admin_user_toggle_active, name='admin_user_toggle'),
     path('admin-panel/users/<int:pk>/delete/', admin_views.admin_user_delete, name='admin_user_delete'),
+    path('admin-panel/cache-stats/', admin_views.admin_cache_stats, name='admin_cache_stats'),
+    path('admin-panel/query-stats/', admin_views.admin_query_stats, name='admin_query_stats'),
+    path('admin-panel/profiles/', admin_views.admin_profile_runs, name='admin_profile_runs'),
+    path('admin-panel/profiles/<int:pk>/', admin_views.admin_profile_run_detail, name='admin_profile_run_detail'),
+    path('admin-panel/profiles/<int:pk>/download/', admin_views.admin_profile_run_download,
+         name='admin_profile_run_download'),
     
     # Password Reset URLs
     path('password-reset/', 